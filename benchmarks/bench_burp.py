@@ -0,0 +1,85 @@
+"""
+Measure burp import throughput on synthetic burp xml exports with one and many jobs and with deduplication.
+
+    python benchmarks/bench_burp.py
+"""
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import common  # noqa: F401 adds the repository to sys.path
+from common import result
+
+from rapic.tools.generate import write_burp_request_files  # noqa: E402
+
+BURP_HEADER = '<?xml version="1.0"?>\n<items burpVersion="2022.1" exportTime="Mon Jan 10 10:00:00 UTC 2022">\n'
+BURP_ITEM = """  <item>
+    <time>Mon Jan 10 10:00:00 UTC 2022</time>
+    <url><![CDATA[https://example.com{path}]]></url>
+    <host ip="93.184.216.34">example.com</host>
+    <port>443</port>
+    <protocol>https</protocol>
+    <method><![CDATA[{method}]]></method>
+    <path><![CDATA[{path}]]></path>
+    <extension>null</extension>
+    <request base64="true"><![CDATA[{request}]]></request>
+    <status>200</status>
+    <responselength>2</responselength>
+    <mimetype>JSON</mimetype>
+    <response base64="false"><![CDATA[{{}}]]></response>
+    <comment></comment>
+  </item>
+"""
+
+
+def create_burp_file(path, total_items):
+    """Write a burp export alternating form posts and gets of paths with ids"""
+    with open(path, 'w') as f:
+        f.write(BURP_HEADER)
+        for number in range(total_items):
+            if number % 2:
+                method, request_path = 'GET', '/api/users/%s/notes?verbose=1' % number
+                body = ''
+            else:
+                method, request_path = 'POST', '/api/users/%s/update' % number
+                body = 'name=user_%s&email=user_%s%%40example.com&active=1' % (number, number)
+            request = '%s %s HTTP/1.1\r\nHost: example.com\r\nAccept: application/json\r\nUser-Agent: rapic\r\n' \
+                      'Content-Type: application/x-www-form-urlencoded\r\n\r\n%s' % (method, request_path, body)
+            f.write(BURP_ITEM.format(path=request_path, method=method,
+                                     request=base64.b64encode(request.encode('utf8')).decode('ascii')))
+        f.write('</items>\n')
+
+
+def main(quick=False):
+    total_items = 2000 if quick else 20000
+    results = []
+    directory = tempfile.mkdtemp()
+    try:
+        files = []
+        for page in range(4):
+            path = os.path.join(directory, 'page_%s.xml' % page)
+            create_burp_file(path, total_items // 4)
+            files.append(path)
+        for case, options in (('jobs_1', {'jobs': 1}), ('jobs_4', {'jobs': 4}), ('dedup', {'dedup': True})):
+            started, cpu_started = time.perf_counter(), time.process_time()
+            writer = write_burp_request_files('bench', files, io.StringIO(), **options)
+            elapsed = time.perf_counter() - started
+            # With many jobs only the cpu time of the main process is not spread on the cores
+            results.append(result('burp_import', case, items=writer.total_source_requests,
+                                  seconds=round(elapsed, 4),
+                                  items_per_second=round(writer.total_source_requests / elapsed, 1),
+                                  main_cpu_seconds=round(time.process_time() - cpu_started, 4),
+                                  cpus=len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity')
+                                  else os.cpu_count()))
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+if __name__ == '__main__':
+    for item in main():
+        print(json.dumps(item))
@@ -0,0 +1,82 @@
+"""
+Measure the per request cost of running hooks, all 7 hook stages are run for every request.
+The previous implementation that searched the hook store on every stage is kept here as reference.
+
+    python benchmarks/bench_hooks.py
+"""
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from rapic.hook import APIClientHook  # noqa: E402
+
+HOOK_TYPES = (APIClientHook.HEADER_HOOK_TYPE, APIClientHook.URL_QUERY_HOOK_TYPE, APIClientHook.URL_HOOK_TYPE,
+              APIClientHook.POST_DATA_HOOK_TYPE, APIClientHook.REQUEST_HOOK_TYPE,
+              APIClientHook.REQUESTS_OBJ_HOOK_TYPE, APIClientHook.RESPONSE_OBJ_HOOK_TYPE)
+
+
+def legacy_run_hook_func(self, request_name, data, hook_type):
+    """Hook lookup done before hook dispatch tables"""
+    if hook_type not in self.HOOK_STORE or self.name not in self.HOOK_STORE[hook_type]:
+        return data
+    hook_type_store = self.HOOK_STORE[hook_type][self.name]
+
+    if request_name not in hook_type_store and '*' not in hook_type_store:
+        return data
+    hook_funcs = hook_type_store.get(request_name, None) or hook_type_store.get('*')
+    for func, excluded_requests in hook_funcs:
+        if request_name in excluded_requests:
+            continue
+        elif '*' in excluded_requests and request_name not in hook_type_store:
+            continue
+        data = func(self, data, request_name=request_name, client_name=self.name, hook_type=hook_type)
+    return data
+
+
+def hook(self, data, **kwargs):
+    return data
+
+
+def register_hooks(client_name, excluded):
+    for hook_type in (APIClientHook.HEADER_HOOK_TYPE, APIClientHook.URL_QUERY_HOOK_TYPE,
+                      APIClientHook.RESPONSE_OBJ_HOOK_TYPE):
+        APIClientHook.register_client_hooks(hook_type, ['*'], client_name, hook, exclude_requests=excluded)
+        APIClientHook.register_client_hooks(hook_type, ['request_1'], client_name, hook)
+
+
+def run_request(client, run_hook_func, request_name):
+    data = {}
+    for hook_type in HOOK_TYPES:
+        data = run_hook_func(client, request_name, data, hook_type)
+
+
+def bench(client, run_hook_func, request_name, number):
+    seconds = min(timeit.repeat(lambda: run_request(client, run_hook_func, request_name), number=number, repeat=5))
+    return seconds / number * 1e9
+
+
+def main(number=20000, quick=False):
+    if quick:
+        number //= 10
+    results = []
+    register_hooks('bench_hooks', ['request_%s' % i for i in range(2, 200)])
+    cases = [
+        ('no_hooks', APIClientHook('bench_no_hooks'), 'request_1'),
+        ('specific_hooks', APIClientHook('bench_hooks'), 'request_1'),
+        ('wildcard_hooks', APIClientHook('bench_hooks'), 'request_500'),
+        ('excluded_request', APIClientHook('bench_hooks'), 'request_199'),
+    ]
+    for name, client, request_name in cases:
+        before = bench(client, legacy_run_hook_func, request_name, number)
+        after = bench(client, APIClientHook._run_hook_func, request_name, number)
+        results.append({'benchmark': 'hooks_per_request', 'case': name, 'before_ns': round(before),
+                        'after_ns': round(after), 'speedup': round(before / after, 2)})
+    return results
+
+
+if __name__ == '__main__':
+    for result in main():
+        print(json.dumps(result))
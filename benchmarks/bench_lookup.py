@@ -0,0 +1,101 @@
+"""
+Measure client load time for plain json files and loads_nested ones expanded in auto mode, for declared fields and
+from the nested cache, and get_request_data cost as the number of requests of a client grows, requests are spread
+over pages of 100 requests like burp generated clients.
+
+    python benchmarks/bench_lookup.py
+"""
+import json
+import os
+import shutil
+import tempfile
+import timeit
+
+import common  # noqa: F401 adds the repository to sys.path
+from common import measure_seconds, result
+
+from rapic.client import APIClient  # noqa: E402
+from rapic.exceptions import RapicException  # noqa: E402
+
+PAGE_SIZE = 100
+
+
+def create_request(number, nested):
+    data = {'user_id': number, 'fields': ['name', 'email'], 'options': {'verbose': True}}
+    return {
+        'path': '/api/v1/resource_%s/{item_id}' % number,
+        'host': 'localhost',
+        'scheme': 'http',
+        'method': 'POST',
+        'headers': {'Accept': 'application/json', 'X-Request': str(number)},
+        'url_query': {'page': '1'},
+        # Burp exports keep json bodies as strings which loads_nested expands
+        'data': json.dumps(data) if nested else data,
+        'is_json': True,
+    }
+
+
+def create_client_file(path, total_requests, nested=False):
+    client = {'host': 'localhost', 'scheme': 'http', 'pages': []}
+    for number in range(1, total_requests + 1):
+        page = 'page_%s' % ((number - 1) // PAGE_SIZE + 1)
+        if page not in client:
+            client['pages'].append(page)
+            client[page] = {}
+        client[page]['request_%s' % number] = create_request(number, nested)
+    with open(path, 'w') as f:
+        json.dump({'bench': client}, f)
+
+
+def time_lookup(api, request_name, number):
+    return min(timeit.repeat(lambda: api.get_request_data(request_name), number=number, repeat=3)) / number
+
+
+def time_missing_lookup(api, number):
+    def lookup():
+        try:
+            api.get_request_data('missing_request')
+        except RapicException:
+            pass
+    return min(timeit.repeat(lookup, number=number, repeat=3)) / number
+
+
+def main(quick=False):
+    sizes = (10, 1000, 10000) if quick else (10, 1000, 10000, 100000)
+    results = []
+    directory = tempfile.mkdtemp()
+    try:
+        for size in sizes:
+            case = '%s_requests' % size
+            plain_file = os.path.join(directory, 'plain_%s.json' % size)
+            nested_file = os.path.join(directory, 'nested_%s.json' % size)
+            create_client_file(plain_file, size)
+            create_client_file(nested_file, size, nested=True)
+            cache_dir = os.path.join(directory, 'cache_%s' % size)
+            # The first load fills the cache, measured loads only read the expanded file
+            APIClient('bench', nested_file, loads_nested=['data'], nested_cache=cache_dir)
+            results.append(result('client_load', case, plain_seconds=round(
+                measure_seconds(lambda: APIClient('bench', plain_file)), 6), loads_nested_seconds=round(
+                measure_seconds(lambda: APIClient('bench', nested_file, loads_nested=True)), 6),
+                nested_fields_seconds=round(
+                measure_seconds(lambda: APIClient('bench', nested_file, loads_nested=['data'])), 6),
+                nested_cached_seconds=round(measure_seconds(
+                    lambda: APIClient('bench', nested_file, loads_nested=['data'], nested_cache=cache_dir)), 6)))
+
+            api = APIClient('bench', plain_file)
+            last_request = 'request_%s' % size
+            started = timeit.default_timer()
+            api.get_request_data(last_request)
+            first_ns = (timeit.default_timer() - started) * 1e9
+            number = 200 if size > 10000 else 2000
+            results.append(result('get_request_data', case, first_lookup_ns=round(first_ns),
+                                  lookup_ns=round(time_lookup(api, last_request, number) * 1e9),
+                                  missing_lookup_ns=round(time_missing_lookup(api, 20 if size > 10000 else 200) * 1e9)))
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+if __name__ == '__main__':
+    for item in main():
+        print(json.dumps(item))
@@ -0,0 +1,74 @@
+"""
+Measure protobuf encode and decode throughput of blackboxprotobuf typedefs interpreted for every message
+and compiled once by rapic.tools.proto, for a flat message and a message like mobile app API bodies.
+
+    python benchmarks/bench_protobuf.py
+"""
+import json
+import timeit
+
+import common  # noqa: F401 adds the repository to sys.path
+from common import result
+
+import blackboxprotobuf  # noqa: E402
+from rapic.tools.proto import CompiledTypedef  # noqa: E402
+
+
+def create_flat_message(fields):
+    typedef = {str(number): {'type': 'int' if number % 2 else 'bytes', 'name': 'field_%s' % number}
+               for number in range(1, fields + 1)}
+    data = {'field_%s' % number: number * 1000 if number % 2 else 'value %s' % number for number in range(1, fields + 1)}
+    return typedef, data
+
+
+def create_nested_message(items):
+    item_typedef = {
+        '1': {'type': 'int', 'name': 'id'},
+        '2': {'type': 'bytes', 'name': 'title'},
+        '3': {'type': 'double', 'name': 'price'},
+        '4': {'type': 'packed_int', 'name': 'tags'},
+        '5': {'type': 'message', 'name': 'seller', 'message_typedef': {
+            '1': {'type': 'int', 'name': 'id'},
+            '2': {'type': 'bytes', 'name': 'name'},
+        }},
+    }
+    typedef = {
+        '1': {'type': 'bytes', 'name': 'session'},
+        '2': {'type': 'int', 'name': 'version'},
+        '3': {'type': 'message', 'name': 'items', 'message_typedef': item_typedef},
+    }
+    data = {'session': 'a' * 32, 'version': 7, 'items': [
+        {'id': number, 'title': 'item %s' % number, 'price': number * 1.5, 'tags': [1, 2, number],
+         'seller': {'id': number % 10, 'name': 'seller %s' % (number % 10)}} for number in range(items)]}
+    return typedef, data
+
+
+def per_second(func, number):
+    return round(number / min(timeit.repeat(func, number=number, repeat=3)), 1)
+
+
+def main(quick=False):
+    number = 200 if quick else 2000
+    cases = (('flat_20_fields', create_flat_message(20)), ('nested_50_items', create_nested_message(50)))
+    results = []
+    for case, (typedef, data) in cases:
+        compiled = CompiledTypedef(typedef)
+        message = bytes(compiled.encode(data))
+        # blackboxprotobuf can not decode named repeated fields with their typedef, it decodes them untyped
+        decode_typedef = blackboxprotobuf.decode_message(message)[1]
+        compiled_decode = CompiledTypedef(decode_typedef)
+        encode_blackbox = per_second(lambda: blackboxprotobuf.encode_message(data, typedef), number)
+        encode_compiled = per_second(lambda: compiled.encode(data), number)
+        decode_blackbox = per_second(lambda: blackboxprotobuf.decode_message(message, decode_typedef), number)
+        decode_compiled = per_second(lambda: compiled_decode.decode(message), number)
+        results.append(result('protobuf', case, message_bytes=len(message),
+                              encode_blackbox_per_second=encode_blackbox, encode_compiled_per_second=encode_compiled,
+                              encode_speedup=round(encode_compiled / encode_blackbox, 2),
+                              decode_blackbox_per_second=decode_blackbox, decode_compiled_per_second=decode_compiled,
+                              decode_speedup=round(decode_compiled / decode_blackbox, 2)))
+    return results
+
+
+if __name__ == '__main__':
+    for item in main():
+        print(json.dumps(item))
@@ -0,0 +1,64 @@
+"""
+Measure perform_request throughput and latency against a local stub server with and without hooks,
+and the cost of preparing a request with dry_run.
+
+    python benchmarks/bench_requests.py
+"""
+import json
+import os
+
+import common  # noqa: F401 adds the repository to sys.path
+from common import measure_latencies, result
+
+from rapic.client import APIClient  # noqa: E402
+from rapic.hook import APIClientHook  # noqa: E402
+from rapic.tests.server import LocalServer  # noqa: E402
+
+LOCAL_CLIENT_FILE = os.path.join(common.ROOT, 'rapic', 'tests', 'local.json')
+
+
+def sign_headers(self, headers, **kwargs):
+    headers['X-Signature'] = 'signature'
+    return headers
+
+
+def add_query(self, url_query, **kwargs):
+    url_query['timestamp'] = '1'
+    return url_query
+
+
+def read_response(self, response, **kwargs):
+    response.json()
+    return response
+
+
+def register_hooks(client_name):
+    APIClientHook.register_client_hooks(APIClientHook.HEADER_HOOK_TYPE, ['*'], client_name, sign_headers)
+    APIClientHook.register_client_hooks(APIClientHook.URL_QUERY_HOOK_TYPE, ['*'], client_name, add_query)
+    APIClientHook.register_client_hooks(APIClientHook.RESPONSE_OBJ_HOOK_TYPE, ['*'], client_name, read_response)
+
+
+def get_client(client_name, host):
+    api = APIClient(client_name, LOCAL_CLIENT_FILE)
+    api.client['host'] = host
+    return api
+
+
+def main(quick=False):
+    number = 200 if quick else 2000
+    results = []
+    register_hooks('bench_requests_hooks')
+    with LocalServer() as server:
+        for case, client_name in (('no_hooks', 'bench_requests'), ('hooks', 'bench_requests_hooks')):
+            api = get_client(client_name, server.host)
+            values = measure_latencies(lambda: api.get_anything(url_data={'item_id': 1}), number)
+            results.append(result('perform_request', case, **values))
+            values = measure_latencies(lambda: api.get_anything(url_data={'item_id': 1}, dry_run=True), number * 5)
+            results.append(result('dry_run', case, **values))
+            api.close()
+    return results
+
+
+if __name__ == '__main__':
+    for item in main():
+        print(json.dumps(item))
@@ -0,0 +1,48 @@
+"""Helpers shared by the benchmarks, every benchmark main() returns a list of result dicts"""
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+# Result values where a higher value is better, every other number is a duration where lower is better
+HIGHER_IS_BETTER = ('rps', 'per_second', 'speedup')
+
+
+def percentile(values, q):
+    """q percentile of values using the nearest rank"""
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(q / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def measure_latencies(func, number, warmup=10):
+    """Call func number times and get requests per second and latency percentiles in milliseconds"""
+    for _ in range(warmup):
+        func()
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(number):
+        call_started = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+    return {'rps': round(number / elapsed, 1), 'p50_ms': round(percentile(latencies, 50) * 1e3, 4),
+            'p99_ms': round(percentile(latencies, 99) * 1e3, 4), 'calls': number}
+
+
+def measure_seconds(func, repeat=3):
+    """Best wall time of func over repeat runs"""
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def result(benchmark, case, **values):
+    return dict({'benchmark': benchmark, 'case': case}, **values)
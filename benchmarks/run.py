@@ -0,0 +1,94 @@
+"""
+Run every benchmark and write the results as json, optionally comparing them with a previous run
+to catch regressions of the request pipeline.
+
+    python benchmarks/run.py --output results.json
+    python benchmarks/run.py --quick --compare results.json --tolerance 0.25
+
+Exits with status 1 when a value is worse than the baseline by more than the tolerance.
+"""
+import argparse
+import json
+import platform
+import sys
+
+import common
+import bench_burp
+import bench_hooks
+import bench_lookup
+import bench_protobuf
+import bench_requests
+
+BENCHMARKS = {
+    'hooks': bench_hooks,
+    'requests': bench_requests,
+    'lookup': bench_lookup,
+    'burp': bench_burp,
+    'protobuf': bench_protobuf,
+}
+
+
+def is_higher_better(key):
+    return any(name in key for name in common.HIGHER_IS_BETTER)
+
+
+def compare(results, baseline, tolerance):
+    """
+    Compare numeric values of results with the baseline ones of the same benchmark and case
+    :return: list of regression dicts
+    """
+    baseline_values = {(item['benchmark'], item['case']): item for item in baseline}
+    regressions = []
+    for item in results:
+        previous = baseline_values.get((item['benchmark'], item['case']))
+        if previous is None:
+            continue
+        for key, value in item.items():
+            previous_value = previous.get(key)
+            if key in ('calls', 'cpus') or not isinstance(value, (int, float)) or \
+                    not isinstance(previous_value, (int, float)):
+                continue
+            if not previous_value:
+                continue
+            if is_higher_better(key):
+                change = (previous_value - value) / previous_value
+            else:
+                change = (value - previous_value) / previous_value
+            if change > tolerance:
+                regressions.append({'benchmark': item['benchmark'], 'case': item['case'], 'value': key,
+                                    'baseline': previous_value, 'current': value, 'worse_by': round(change, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run rapic benchmarks')
+    parser.add_argument('--quick', action='store_true', help='Smaller sizes and fewer calls')
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='Benchmarks to run')
+    parser.add_argument('--output', help='Json file results are written to')
+    parser.add_argument('--compare', help='Json file of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Fraction a value can be worse than the baseline before it is a regression')
+    args = parser.parse_args(argv)
+
+    results = []
+    for name in args.only or sorted(BENCHMARKS):
+        for item in BENCHMARKS[name].main(quick=args.quick):
+            print(json.dumps(item))
+            results.append(item)
+    report = {'python': platform.python_version(), 'platform': platform.platform(), 'quick': args.quick,
+              'results': results}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f)['results'], args.tolerance)
+        for regression in regressions:
+            print(json.dumps(dict(regression, regression=True)), file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
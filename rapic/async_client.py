@@ -0,0 +1,313 @@
+import asyncio
+import itertools
+from collections import deque
+from rapic.client import APIClient
+from rapic.connection.body import close_body, is_rewindable_body
+from rapic.connection.async_request import AsyncRapicRequestClient
+from rapic.dependencies import check_dependency_response, extract_outputs
+from rapic.tools.compiled import CompiledClient
+from rapic.tools.stream import AsyncRecordStream, get_stream_options
+
+
+class AsyncAPIClient(APIClient):
+    """
+        Asyncio version of APIClient, it uses the same rapic json file and hooks but every request
+        is a coroutine so hundreds of requests can be in flight from one process
+
+        api = AsyncAPIClient(client_name='httpbin', request_file='httpbin.json')
+        response = await api.get_my_ip()
+        or
+        responses = await asyncio.gather(*[api.get_user(url_data={'user_id': i}) for i in range(100)])
+
+        Hooks can be normal functions or coroutine functions (async def), coroutine hooks are awaited.
+        connection_pool configuration sets the aiohttp connection limits, max_per_host * max_hosts connections in total
+     """
+
+    request_client_class = AsyncRapicRequestClient
+
+    def __init__(self, client_name, request_file, **kwargs):
+        super(AsyncAPIClient, self).__init__(client_name, request_file, **kwargs)
+        self.output_tasks = {}
+
+    async def perform_request(self, request_name, do_extra_requests=None, do_implicit_requests=None, **kwargs):
+        """
+        Perform the actual http request specified by request_name in rapic json file, same arguments as
+        APIClient.perform_request
+        :param request_name:
+        :param do_extra_requests: Perform the extra_request_names of the request before it
+        :param do_implicit_requests: Perform the implicit_requests of the page and client before the request
+        :param kwargs:
+        :return:
+        """
+        if not kwargs.get('dry_run'):
+            graph = self.get_request_graph(request_name, do_extra_requests, do_implicit_requests)
+            if graph.has_dependencies:
+                return await self.perform_request_graph(graph, kwargs)
+        return await self._perform_request(request_name, **kwargs)
+
+    async def _perform_request(self, request_name, **kwargs):
+        request_data = self.get_request_plan(request_name).new_request_data()
+
+        request_data['request_name'] = request_name
+
+        return await self.execute_request(request_data, **kwargs)
+
+    async def perform_request_graph(self, graph, kwargs):
+        """Same as APIClient.perform_request_graph, dependencies that do not depend on each other are gathered"""
+        outputs = {}
+        started = set()
+        pending = {}
+        try:
+            while len(outputs) < len(graph.order) - 1:
+                for name in graph.get_ready(outputs, started):
+                    started.add(name)
+                    task = asyncio.ensure_future(self.perform_dependency(name, graph.get_values(name, outputs)))
+                    pending[task] = name
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    outputs[pending.pop(task)] = task.result()
+        finally:
+            for task in pending:
+                task.cancel()
+        values = graph.get_values(graph.request_name, outputs)
+        return await self._perform_request(graph.request_name,
+                                           **self.get_input_kwargs(graph.request_name, values, kwargs))
+
+    async def perform_dependency(self, request_name, values):
+        """Same as APIClient.perform_dependency, coroutines needing the same outputs wait for one request"""
+        ttl = self.get_output_ttl(request_name)
+        if not ttl:
+            return await self._perform_dependency(request_name, values)
+        outputs = self.output_cache.get(request_name)
+        if outputs is not None:
+            return outputs
+        task = self.output_tasks.get(request_name)
+        if task is None:
+            task = asyncio.ensure_future(self._perform_dependency(request_name, values, ttl))
+            self.output_tasks[request_name] = task
+            task.add_done_callback(lambda _: self.output_tasks.pop(request_name, None))
+        return await asyncio.shield(task)
+
+    async def _perform_dependency(self, request_name, values, ttl=None):
+        response = await self._perform_request(request_name, **self.get_input_kwargs(request_name, values, {}))
+        check_dependency_response(request_name, response)
+        outputs = extract_outputs(response, self.find_request_data(request_name).get('outputs'))
+        if ttl:
+            self.output_cache.set(request_name, outputs, ttl)
+        return outputs
+
+    async def perform_many(self, request_name, calls_kwargs, concurrency=10, ordered=True, capture_errors=False):
+        """
+        Perform the same request many times concurrently, same arguments as APIClient.perform_many
+
+        async for index, response in api.perform_many('get_user_info', ({'url_data': {'user_id': i}} for i in ids)):
+            ...
+        """
+        calls = enumerate(calls_kwargs)
+
+        async def call(index, call_kwargs):
+            try:
+                return index, await self.perform_request(request_name, **call_kwargs)
+            except Exception as e:
+                if not capture_errors:
+                    raise
+                return index, e
+
+        pending = set(asyncio.ensure_future(call(*c)) for c in itertools.islice(calls, concurrency))
+        finished = {}
+        next_index = 0
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index, response = task.result()
+                    if not ordered:
+                        yield index, response
+                    else:
+                        finished[index] = response
+                while next_index in finished:
+                    yield next_index, finished.pop(next_index)
+                    next_index += 1
+                # In order mode results waiting for an older call also count so the buffer stays bounded
+                free = concurrency - len(pending)
+                if ordered:
+                    free = min(free, concurrency * 2 - len(pending) - len(finished))
+                pending.update(asyncio.ensure_future(call(*c)) for c in itertools.islice(calls, max(free, 0)))
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def iterate(self, request_name, prefetch=None, max_pages=None, pagination=None, **kwargs):
+        """
+        Yield the items of every page of a paginated request, same arguments as APIClient.iterate
+
+        async for user in api.iterate('list_users'):
+            ...
+        """
+        async for response, items in self.iterate_pages(request_name, prefetch, max_pages, pagination, **kwargs):
+            for item in items:
+                yield item
+
+    async def iterate_pages(self, request_name, prefetch=None, max_pages=None, pagination=None, **kwargs):
+        """Same as iterate but yield (response, items) for every page"""
+        paginator = self.get_paginator(request_name, pagination)
+        prefetch = paginator.prefetch if prefetch is None else prefetch
+        max_pages = max_pages or paginator.max_pages
+
+        async def fetch(call_kwargs):
+            response = await self.perform_request(request_name, **call_kwargs)
+            return response, paginator.get_items(response)
+
+        def submit(call_kwargs):
+            # Without prefetch pages are requested when the caller asks for them
+            return asyncio.ensure_future(fetch(call_kwargs)) if prefetch else None
+
+        call_kwargs = paginator.first_call(kwargs)
+        pending = deque([(call_kwargs, submit(call_kwargs))])
+        requested = 1
+        try:
+            while pending:
+                page_kwargs, task = pending.popleft()
+                response, items = await task if task is not None else await fetch(page_kwargs)
+                next_kwargs = paginator.next_call(page_kwargs, response, items)
+                if next_kwargs is not None and not pending and (not max_pages or requested < max_pages):
+                    call_kwargs = next_kwargs
+                    pending.append((call_kwargs, submit(call_kwargs)))
+                    requested += 1
+                while next_kwargs is not None and len(pending) < prefetch and (not max_pages or requested < max_pages):
+                    predicted_kwargs = paginator.predict_call(call_kwargs, response)
+                    if predicted_kwargs is None:
+                        break
+                    call_kwargs = predicted_kwargs
+                    pending.append((call_kwargs, submit(call_kwargs)))
+                    requested += 1
+                yield response, items
+                if next_kwargs is None:
+                    break
+        finally:
+            for _, task in pending:
+                if task is not None:
+                    task.cancel()
+
+    async def execute_request(self, request_data, headers=None, url_data=None, data=None, files=None, auth=None,
+                              json=None, url_query=None, dry_run=False, body=None, chunked=False, **kwargs):
+        """
+        Takes a request and execute the request using the aiohttp session from AsyncRapicRequestClient
+        Same arguments as APIClient.execute_request
+        :return: Response Object
+        """
+        if self.metrics is None:
+            return await self._execute_request(request_data, headers, url_data, data, files, auth, json, url_query,
+                                               dry_run, body, chunked, **kwargs)
+        trace = self.metrics.start_trace(self.name, request_data['request_name'])
+        error = None
+        try:
+            return await self._execute_request(request_data, headers, url_data, data, files, auth, json, url_query,
+                                               dry_run, body, chunked, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            trace.finish(error)
+
+    async def _execute_request(self, request_data, headers, url_data, data, files, auth, json, url_query, dry_run,
+                               body=None, chunked=False, **kwargs):
+        request_data = await self.build_request_data(request_data, data or json, url_data, headers, url_query)
+        if self.metrics is not None:
+            self.metrics.mark('build_request_data')
+        is_json = bool(json)
+        if dry_run:
+            new_req_obj = await self._prepare_request(request_data, is_json, files, auth=auth, body=body,
+                                                      chunked=chunked)
+            return self.request.prepare_call(new_req_obj, **self.get_send_kwargs(request_data, kwargs))
+        retry_policy = self.get_retry_policy(request_data)
+        prep_req_obj = self._new_prepared_request(request_data, is_json, files, auth=auth, body=body, chunked=chunked)
+        try:
+            if retry_policy is not None and is_rewindable_body(prep_req_obj.body):
+                return await self.run_with_retry(retry_policy, request_data, prep_req_obj, **kwargs)
+            new_req_obj = await self._hook_prepared_request(request_data['request_name'], prep_req_obj)
+            return await self.run(request_data, new_req_obj, **kwargs)
+        finally:
+            close_body(prep_req_obj.body)
+
+    async def run(self, request_data, req_ob, **kwargs):
+        response = await self.send(request_data, req_ob, **kwargs)
+        return await self._handle_response(request_data, response, kwargs)
+
+    async def _handle_response(self, request_data, response, kwargs):
+        request_name = request_data['request_name']
+        stream = self.get_stream(request_data, kwargs)
+        response = self.wrap_response(request_data, response)
+        response = await self._arun_hook_func(request_name, response, self.RESPONSE_OBJ_HOOK_TYPE)
+        if self.metrics is not None:
+            self.metrics.mark('response')
+        if stream:
+            return self.stream_records(request_name, response, stream)
+        return response
+
+    def stream_records(self, request_name, response, stream):
+        """Get an AsyncRecordStream of a response sent with stream=True, read it with async for"""
+        stream_format, chunk_size = get_stream_options(stream)
+        has_hooks = bool(self._get_hook_funcs(request_name, self.STREAM_RECORD_HOOK_TYPE))
+
+        async def transform(record):
+            return await self._arun_hook_func(request_name, record, self.STREAM_RECORD_HOOK_TYPE)
+
+        return AsyncRecordStream(response, stream_format, chunk_size, transform if has_hooks else None)
+
+    async def run_with_retry(self, retry_policy, request_data, prep_req_obj, **kwargs):
+        """Same as APIClient.run_with_retry, waiting between attempts does not block the event loop"""
+        request_name = request_data['request_name']
+        delays = []
+        while True:
+            req_ob = await self._hook_prepared_request(request_name, prep_req_obj.copy())
+            response, exception = None, None
+            try:
+                response = await self.send(request_data, req_ob, **kwargs)
+            except retry_policy.exceptions as e:
+                exception = e
+            delay = retry_policy.next_delay(len(delays) + 1, req_ob.method, response, exception)
+            if delay is None:
+                break
+            delays.append(delay)
+            if response is not None:
+                response.close()
+            await asyncio.sleep(delay)
+        result = exception if exception is not None else response
+        result.rapic_retries = len(delays)
+        result.rapic_retry_delays = delays
+        if exception is not None:
+            raise exception
+        return await self._handle_response(request_data, response, kwargs)
+
+    async def send(self, request_data, req_ob, **kwargs):
+        return await self.request.run(req_ob, **self.get_send_kwargs(request_data, kwargs))
+
+    async def _hook_prepared_request(self, request_name, prep_req_obj):
+        return await self._arun_hook_func(request_name, prep_req_obj, self.REQUESTS_OBJ_HOOK_TYPE)
+
+    async def _prepare_request(self, request_data, is_json, files=None, auth=None, body=None, chunked=False):
+        prep_req_obj = self._new_prepared_request(request_data, is_json, files, auth=auth, body=body, chunked=chunked)
+        return await self._hook_prepared_request(request_data['request_name'], prep_req_obj)
+
+    async def build_request_data(self, request_data, data, url_data, headers, user_url_query):
+        request_name = request_data['request_name']
+        steps = self._build_request_data_steps(request_data, data, url_data, headers, user_url_query)
+        try:
+            hook_type, hook_data = next(steps)
+            while True:
+                hook_data = await self._arun_hook_func(request_name, hook_data, hook_type)
+                hook_type, hook_data = steps.send(hook_data)
+        except StopIteration as e:
+            return e.value
+
+    async def close(self):
+        await self.request.close()
+        if isinstance(self.client, CompiledClient):
+            self.client.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
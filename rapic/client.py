@@ -1,10 +1,25 @@
 import json as lib_json
 import copy
+import itertools
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from urllib.parse import urlencode, urlunparse, ParseResult
 from rapic.hook import APIClientHook
+from rapic.index import RequestIndex, RequestsView
 from rapic.base import BaseClient
+from rapic.dependencies import (DEPENDENCY_WORKERS, OutputCache, RequestGraph, check_dependency_response,
+                                extract_outputs, render_inputs)
+from rapic.connection.body import close_body, is_rewindable_body
 from rapic.connection.request import RapicRequestClient
-from rapic.tools import dict_merge, json_loads_nested
+from rapic.connection.retry import RetryPolicy
+from rapic.metrics import Metrics
+from rapic.pagination import get_paginator
+from rapic.plan import RequestPlan
+from rapic.response import RapicResponse
+from rapic.tools import dict_merge, get_nested_fields, is_request_data, load_json_nested_file, shutdown_executor
+from rapic.tools.compiled import CompiledClient, is_compiled_client_file
+from rapic.tools.stream import RecordStream, get_stream_options
 from rapic.exceptions import RapicException, RapicMissingUrlData
 
 
@@ -27,41 +42,302 @@ class APIClient(APIClientHook, BaseClient):
         It also exposes hooks from parent class you can use to perform extra cleaning or processing of request such as
          request signing, authentication, timestamp generation before making the actual request.
 
+        A client can be shared by threads: they send requests over the same session and connection pool, every call
+        works on its own copy of the request data and prepared request and the request lookup caches only ever add
+        complete entries so they are read without locks. Hooks must not change shared state of the client without
+        their own locking, and hooks should be registered before threads start using the client.
+
      """
 
     CLIENT_REQUESTS = {}
+    request_client_class = RapicRequestClient
 
     def __init__(self, client_name, request_file, **kwargs):
         self.file_location = request_file
         self.name = client_name
         load_nested = kwargs.pop('loads_nested', None)
-        self.request = RapicRequestClient(client_name, **kwargs)
-        with open(request_file, 'r') as j:
+        nested_cache = kwargs.pop('nested_cache', None)
+        if is_compiled_client_file(request_file):
+            # Compiled clients are already expanded when compiling and decode requests on access
+            self.client = CompiledClient(request_file)
+        else:
             if load_nested:
-                client_file = json_loads_nested(j.read())
+                client_file = load_json_nested_file(request_file, get_nested_fields(load_nested), nested_cache)
             else:
-                client_file = lib_json.loads(j.read())
+                with open(request_file, 'r') as j:
+                    client_file = lib_json.loads(j.read())
             self.client = client_file.get(client_name) or client_file
-            self.request_data_list = {}
-            APIClient.CLIENT_REQUESTS[client_name] = self.request_data_list
-            super(APIClient, self).__init__(client_name, **kwargs)
-
-    def perform_request(self, request_name, do_extra_requests=False, do_implicit_requests=False, **kwargs):
+        self.request_index = RequestIndex(self.client)
+        self.request_data_list = {}
+        self.request_pages = {}
+        self.request_plans = {}
+        self.request_graphs = {}
+        self.output_cache = OutputCache()
+        APIClient.CLIENT_REQUESTS[client_name] = self.request_data_list
+        connection_pool = dict_merge(self.client.get('connection_pool', {}), kwargs.pop('connection_pool', None) or {})
+        # Client rate limit given to the constructor replaces the one from the json file
+        self.rate_limit = kwargs.pop('rate_limit', None) or self.client.get('rate_limit')
+        self.retry = kwargs.pop('retry', None) or self.client.get('retry')
+        self.retry_policy = RetryPolicy.from_config(self.retry)
+        metrics = kwargs.pop('metrics', None)
+        self.metrics = Metrics() if metrics is True else metrics
+        self.request = self.request_client_class(client_name, connection_pool=connection_pool or None, **kwargs)
+        self.request.metrics = self.metrics
+        self.rate_limit_buckets = self.request.rate_limiter.get_buckets(
+            [(('client',), self.rate_limit)] if self.rate_limit else [])
+        super(APIClient, self).__init__(client_name, **kwargs)
+
+    def perform_request(self, request_name, do_extra_requests=None, do_implicit_requests=None, **kwargs):
         """
         Perform the actual http request specified by request_name in rapic json file
         :param request_name:
-        :param do_extra_requests: Todo
-        :param do_implicit_requests: Todo
+        :param do_extra_requests: Perform the extra_request_names of the request before it, the request
+                                  do_extra_requests is used when it is None
+        :param do_implicit_requests: Perform the implicit_requests of the page and client before the request, the
+                                     request do_implicit_requests is used when it is None
         :param kwargs:
         :return:
         """
-        request_data = self.get_request_data(request_name)
+        if not kwargs.get('dry_run'):
+            graph = self.get_request_graph(request_name, do_extra_requests, do_implicit_requests)
+            if graph.has_dependencies:
+                return self.perform_request_graph(graph, kwargs)
+        return self._perform_request(request_name, **kwargs)
+
+    def _perform_request(self, request_name, **kwargs):
+        request_data = self.get_request_plan(request_name).new_request_data()
 
         request_data['request_name'] = request_name
 
         return self.execute_request(request_data, **kwargs)
 
+    def perform_request_graph(self, graph, kwargs):
+        """
+        Perform the dependencies of a request then the request with their outputs, dependencies that do not depend
+        on each other are performed concurrently
+        """
+        outputs = {}
+        started = set()
+        pending = {}
+        executor = None
+        try:
+            while len(outputs) < len(graph.order) - 1:
+                ready = graph.get_ready(outputs, started)
+                started.update(ready)
+                if len(ready) == 1 and not pending:
+                    # A chain of requests is performed in the calling thread
+                    outputs[ready[0]] = self.perform_dependency(ready[0], graph.get_values(ready[0], outputs))
+                    continue
+                if executor is None:
+                    executor = ThreadPoolExecutor(max_workers=DEPENDENCY_WORKERS)
+                for name in ready:
+                    pending[executor.submit(self.perform_dependency, name, graph.get_values(name, outputs))] = name
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    outputs[pending.pop(future)] = future.result()
+        finally:
+            if executor is not None:
+                shutdown_executor(executor, pending)
+        values = graph.get_values(graph.request_name, outputs)
+        return self._perform_request(graph.request_name, **self.get_input_kwargs(graph.request_name, values, kwargs))
+
+    def perform_dependency(self, request_name, values):
+        """
+        Perform a request needed by another one and get its outputs, outputs of requests with an output_ttl are
+        reused until they expire and threads needing them at the same time perform the request once
+        """
+        ttl = self.get_output_ttl(request_name)
+        if not ttl:
+            return self._perform_dependency(request_name, values)
+        outputs = self.output_cache.get(request_name)
+        if outputs is None:
+            with self.output_cache.get_lock(request_name):
+                outputs = self.output_cache.get(request_name)
+                if outputs is None:
+                    outputs = self._perform_dependency(request_name, values)
+                    self.output_cache.set(request_name, outputs, ttl)
+        return outputs
+
+    def _perform_dependency(self, request_name, values):
+        response = self._perform_request(request_name, **self.get_input_kwargs(request_name, values, {}))
+        check_dependency_response(request_name, response)
+        return extract_outputs(response, self.find_request_data(request_name).get('outputs'))
+
+    def get_input_kwargs(self, request_name, values, kwargs):
+        """perform_request arguments from the request inputs filled with values, kwargs given to the call win"""
+        inputs = self.find_request_data(request_name).get('inputs')
+        if not inputs:
+            return kwargs
+        return dict_merge(render_inputs(inputs, values, request_name), kwargs)
+
+    def get_output_ttl(self, request_name):
+        ttl = self.find_request_data(request_name).get('output_ttl')
+        return self.client.get('output_ttl') if ttl is None else ttl
+
+    def clear_outputs(self, request_name=None):
+        """Forget the kept outputs of a request or of every request e.g when an auth token is revoked"""
+        self.output_cache.clear(request_name)
+
+    def get_request_graph(self, request_name, do_extra_requests=None, do_implicit_requests=None):
+        """Get the graph of the requests performed before a request, graphs are built once"""
+        key = (request_name, do_extra_requests, do_implicit_requests)
+        graph = self.request_graphs.get(key)
+        if graph is None:
+            graph = RequestGraph.build(request_name, self.get_request_dependencies, do_extra_requests,
+                                       do_implicit_requests)
+            graph = self.request_graphs.setdefault(key, graph)
+        return graph
+
+    def get_request_dependencies(self, request_name, do_extra_requests=None, do_implicit_requests=None):
+        """Names of the requests a request depends on directly, implicit requests come first"""
+        request_data = self.find_request_data(request_name)
+        if do_extra_requests is None:
+            do_extra_requests = request_data.get('do_extra_requests', False)
+        if do_implicit_requests is None:
+            do_implicit_requests = request_data.get('do_implicit_requests', False)
+        names = []
+        if do_implicit_requests:
+            implicit_requests = self.get_implicit_requests(request_name)
+            # Implicit requests do not depend on each other
+            if request_name not in implicit_requests:
+                names.extend(implicit_requests)
+        if do_extra_requests:
+            names.extend(request_data.get('extra_request_names') or [])
+        return tuple(dict.fromkeys(names))
+
+    def get_implicit_requests(self, request_name):
+        """Implicit requests of the page of a request followed by the client ones"""
+        self.find_request_data(request_name)
+        page = self.request_pages.get(request_name)
+        names = list(self.client[page].get('implicit_requests') or []) if page is not None else []
+        return names + list(self.client.get('implicit_requests') or [])
+
+    def perform_many(self, request_name, calls_kwargs, concurrency=10, ordered=True, capture_errors=False):
+        """
+        Perform the same request many times concurrently over the client session, every call goes through
+        perform_request so all hooks are run for it.
+
+        for index, response in api.perform_many('get_user_info', ({'url_data': {'user_id': i}} for i in ids)):
+            ...
+
+        :param request_name: The request to perform
+        :param calls_kwargs: Iterable of kwargs dict passed to perform_request for each call, it is consumed lazily
+        :param concurrency: Maximum number of calls in flight at the same time, connection_pool max_per_host
+                            should be at least this value so connections are reused
+        :param ordered: Yield results in input order, if False results are yielded as soon as they complete
+        :param capture_errors: Yield the exception raised by a call as its result instead of stopping the batch
+        :return: generator of (index of call kwargs, response)
+        """
+        calls = enumerate(calls_kwargs)
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+        pending = ()
+
+        def submit(index, call_kwargs):
+            future = executor.submit(self.perform_request, request_name, **call_kwargs)
+            future.index = index
+            return future
+
+        def result(future):
+            try:
+                return future.index, future.result()
+            except Exception as e:
+                if not capture_errors:
+                    raise
+                return future.index, e
+
+        try:
+            if ordered:
+                # Keep a window of calls in flight ahead of the oldest one which must be yielded first
+                pending = deque(submit(*call) for call in itertools.islice(calls, concurrency * 2))
+                while pending:
+                    future = pending.popleft()
+                    yield result(future)
+                    for call in itertools.islice(calls, 1):
+                        pending.append(submit(*call))
+            else:
+                pending = set(submit(*call) for call in itertools.islice(calls, concurrency))
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield result(future)
+                    pending.update(submit(*call) for call in itertools.islice(calls, len(done)))
+        finally:
+            shutdown_executor(executor, pending)
+
+    def get_paginator(self, request_name, pagination=None):
+        """Get the paginator of a request from its pagination block or the pagination dict given"""
+        config = pagination or self.find_request_data(request_name).get('pagination')
+        if not config:
+            raise RapicException('Request %s has no pagination block' % request_name)
+        return get_paginator(config)
+
+    def iterate(self, request_name, prefetch=None, max_pages=None, pagination=None, **kwargs):
+        """
+        Yield the items of every page of a paginated request, pages are requested lazily
+
+        for user in api.iterate('list_users', url_query={'active': 1}):
+            ...
+
+        :param prefetch: Number of pages requested ahead while the current page items are consumed. Only pages known
+                         to exist are requested: the next one, and with offset and page pagination every page before
+                         the total of the last response
+        :param max_pages: Stop after this number of pages
+        :param pagination: Pagination dict used instead of the request pagination block
+        :param kwargs: perform_request arguments used for every page
+        """
+        for response, items in self.iterate_pages(request_name, prefetch, max_pages, pagination, **kwargs):
+            yield from items
+
+    def iterate_pages(self, request_name, prefetch=None, max_pages=None, pagination=None, **kwargs):
+        """Same as iterate but yield (response, items) for every page"""
+        paginator = self.get_paginator(request_name, pagination)
+        prefetch = paginator.prefetch if prefetch is None else prefetch
+        max_pages = max_pages or paginator.max_pages
+        executor = ThreadPoolExecutor(max_workers=prefetch) if prefetch else None
+
+        def fetch(call_kwargs):
+            response = self.perform_request(request_name, **call_kwargs)
+            return response, paginator.get_items(response)
+
+        def submit(call_kwargs):
+            # Without prefetch pages are requested when the caller asks for them
+            return executor.submit(fetch, call_kwargs) if executor is not None else None
+
+        call_kwargs = paginator.first_call(kwargs)
+        pending = deque([(call_kwargs, submit(call_kwargs))])
+        requested = 1
+        try:
+            while pending:
+                page_kwargs, future = pending.popleft()
+                response, items = future.result() if future is not None else fetch(page_kwargs)
+                next_kwargs = paginator.next_call(page_kwargs, response, items)
+                if next_kwargs is not None and not pending and (not max_pages or requested < max_pages):
+                    # The next page is requested once the current page is received, in the background with prefetch
+                    call_kwargs = next_kwargs
+                    pending.append((call_kwargs, submit(call_kwargs)))
+                    requested += 1
+                # Pages the response shows to exist (before its total) are requested prefetch pages ahead
+                while next_kwargs is not None and len(pending) < prefetch and (not max_pages or requested < max_pages):
+                    predicted_kwargs = paginator.predict_call(call_kwargs, response)
+                    if predicted_kwargs is None:
+                        break
+                    call_kwargs = predicted_kwargs
+                    pending.append((call_kwargs, submit(call_kwargs)))
+                    requested += 1
+                yield response, items
+                if next_kwargs is None:
+                    break
+        finally:
+            for _, future in pending:
+                if future is not None:
+                    future.cancel()
+            if executor is not None:
+                executor.shutdown(wait=False)
+
     def get_headers(self, user_headers, request):
+        plan = getattr(request, 'plan', None)
+        if plan is not None:
+            return plan.get_headers(user_headers)
         headers = {}
         headers = dict_merge(headers, self.client.get("default_headers", {}))
         headers = dict_merge(headers, request.get("headers", {}))
@@ -69,6 +345,9 @@ class APIClient(APIClientHook, BaseClient):
         return headers
 
     def get_url_query(self, user_url_query, request):
+        plan = getattr(request, 'plan', None)
+        if plan is not None:
+            return plan.get_url_query(user_url_query)
         url_query_data = {}
         url_query_data = dict_merge(url_query_data, self.client.get("default_url_query", {}))
         url_query_data = dict_merge(url_query_data, request.get("url_query", {}))
@@ -76,6 +355,9 @@ class APIClient(APIClientHook, BaseClient):
         return url_query_data
 
     def get_body_data(self, user_body_data, request):
+        plan = getattr(request, 'plan', None)
+        if plan is not None:
+            return plan.get_body_data(user_body_data)
         if user_body_data and not isinstance(user_body_data, dict):
             #If user passed data and its not a dict it means user wants to replace all data totally
             return user_body_data or {}
@@ -86,8 +368,14 @@ class APIClient(APIClientHook, BaseClient):
         return body_data
 
     def build_url(self, request_data, url_query, url_data):
-        url_data = url_data or {}
-        url = request_data.get('url')
+        # Saved url data of a request (ids of templated requests) are defaults replaced by the call ones
+        saved_url_data = request_data.get('url_data')
+        url_data = dict(saved_url_data, **url_data) if saved_url_data and url_data else url_data or saved_url_data or {}
+        plan = getattr(request_data, 'plan', None)
+        if plan is not None:
+            url = plan.get_url(url_query)
+        else:
+            url = request_data.get('url')
         if not url:
             host = request_data.get('host') or self.client.get('host')
             scheme = request_data.get('scheme') or self.client.get('scheme')
@@ -106,7 +394,7 @@ class APIClient(APIClientHook, BaseClient):
         return url
 
     def execute_request(self, request_data, headers=None, url_data=None, data=None, files=None, auth=None, json=None, url_query=None,
-                        dry_run=False, **kwargs):
+                        dry_run=False, body=None, chunked=False, **kwargs):
         """
          Takes a request and execute the request using created session from RequestClient
          you can also pass headers, url data,  post data directly to override headers saved in the rapic json file.
@@ -120,33 +408,152 @@ class APIClient(APIClientHook, BaseClient):
         :param url_query: you can update external field not recorded in the json file url part using append_url dict
                            E.G append_url = {'load_false':1} -> url   = url + ?load_false=1
         :param dry_run : Do not perform actual requests and returns the prepared request to be sent to server
+        :param files: Files to upload in a multipart body streamed with data as form fields, a file can be a file
+                      object, bytes or a pathlib.Path
+        :param body: Body sent as it is instead of data, a file path, file object, bytes, memoryview or iterable of
+                     bytes. Files are memory mapped and sent without being read in memory
+        :param chunked: Send body with Transfer-Encoding: chunked instead of Content-Length
         :return: Response Object
         """
-
+        if self.metrics is None:
+            return self._execute_request(request_data, headers, url_data, data, files, auth, json, url_query, dry_run,
+                                         body, chunked, **kwargs)
+        trace = self.metrics.start_trace(self.name, request_data['request_name'])
+        error = None
+        try:
+            return self._execute_request(request_data, headers, url_data, data, files, auth, json, url_query, dry_run,
+                                         body, chunked, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            trace.finish(error)
+
+    def _execute_request(self, request_data, headers, url_data, data, files, auth, json, url_query, dry_run, body=None,
+                         chunked=False, **kwargs):
         request_data = self.build_request_data(request_data, data or json, url_data, headers, url_query)
+        if self.metrics is not None:
+            self.metrics.mark('build_request_data')
         is_json = bool(json)
-        new_req_obj = self._prepare_request(request_data, is_json, files, auth=auth)
         if dry_run:
-            req = copy.deepcopy(self.request)
-            req.set_prepared_request(new_req_obj, **kwargs)
-            return req
-
-        response = self.run(request_data, new_req_obj, **kwargs)
-        return response
+            new_req_obj = self._prepare_request(request_data, is_json, files, auth=auth, body=body, chunked=chunked)
+            return self.request.prepare_call(new_req_obj, **self.get_send_kwargs(request_data, kwargs))
+        retry_policy = self.get_retry_policy(request_data)
+        prep_req_obj = self._new_prepared_request(request_data, is_json, files, auth=auth, body=body, chunked=chunked)
+        try:
+            # Bodies read from iterators or unseekable streams can only be sent once so they are not retried
+            if retry_policy is not None and is_rewindable_body(prep_req_obj.body):
+                return self.run_with_retry(retry_policy, request_data, prep_req_obj, **kwargs)
+            new_req_obj = self._hook_prepared_request(request_data['request_name'], prep_req_obj)
+            return self.run(request_data, new_req_obj, **kwargs)
+        finally:
+            # Memory maps of file bodies are closed once the request and its retries are sent
+            close_body(prep_req_obj.body)
 
     def run(self, request_data, req_ob, **kwargs):
+        response = self.send(request_data, req_ob, **kwargs)
+        return self._handle_response(request_data, response, kwargs)
+
+    def _handle_response(self, request_data, response, kwargs):
+        """Run response hooks and return the records of the response when it is streamed"""
         request_name = request_data['request_name']
-        response = self.request.run(req_ob, **kwargs)
+        stream = self.get_stream(request_data, kwargs)
+        response = self.wrap_response(request_data, response)
         response = self._run_hook_func(request_name, response, self.RESPONSE_OBJ_HOOK_TYPE)
+        if self.metrics is not None:
+            self.metrics.mark('response')
+        if stream:
+            return self.stream_records(request_name, response, stream)
         return response
 
-    def _prepare_request(self, request_data, is_json, files=None, auth=None):
-        is_json = is_json or request_data.get('is_json')
+    @staticmethod
+    def wrap_response(request_data, response):
+        """
+        Get the RapicResponse of a response, its json, text, proto and extracted views are decoded when first used.
+        Protobuf bodies are decoded with the compiled response_typedef of the request, or its typedef when the
+        response has no typedef of its own. Fields missing from the typedef are guessed
+        """
+        typedef = request_data.get('response_typedef') or request_data.get('typedef')
+        return RapicResponse.from_response(response, typedef, request_data.get('extract'))
+
+    @staticmethod
+    def get_stream(request_data, kwargs):
+        """Stream option of a call, stream given to the call replaces the one of the request"""
+        if 'stream' in kwargs:
+            return kwargs['stream']
+        return request_data.get('stream')
+
+    def stream_records(self, request_name, response, stream):
+        """
+        Get a RecordStream decoding the records of a response sent with stream=True one at a time,
+        stream record hooks are run on every record
+        """
+        stream_format, chunk_size = get_stream_options(stream)
+        has_hooks = bool(self._get_hook_funcs(request_name, self.STREAM_RECORD_HOOK_TYPE))
+
+        def transform(record):
+            return self._run_hook_func(request_name, record, self.STREAM_RECORD_HOOK_TYPE)
+
+        return RecordStream(response, stream_format, chunk_size, transform if has_hooks else None)
+
+    def run_with_retry(self, retry_policy, request_data, prep_req_obj, **kwargs):
+        """
+        Send a request until it succeeds or the retry policy gives up, prepared request hooks run again on a copy of
+        the prepared request for every attempt so they can sign it again. Response hooks run once on the last response
+        which gets rapic_retries, the number of retries, and rapic_retry_delays, the seconds waited before each of them.
+        When the last attempt raised an exception it is raised with the same attributes.
+        :param retry_policy: <RetryPolicy>
+        :param prep_req_obj: Prepared request before prepared request hooks are run
+        """
         request_name = request_data['request_name']
-        prep_req_obj = self.request.prepare_requests_request(request_data, is_json, files=files, auth=auth)
+        delays = []
+        while True:
+            req_ob = self._hook_prepared_request(request_name, prep_req_obj.copy())
+            response, exception = None, None
+            try:
+                response = self.send(request_data, req_ob, **kwargs)
+            except retry_policy.exceptions as e:
+                exception = e
+            delay = retry_policy.next_delay(len(delays) + 1, req_ob.method, response, exception)
+            if delay is None:
+                break
+            delays.append(delay)
+            if response is not None:
+                # Releases the connection of a streamed response that will not be read
+                response.close()
+            time.sleep(delay)
+        result = exception if exception is not None else response
+        result.rapic_retries = len(delays)
+        result.rapic_retry_delays = delays
+        if exception is not None:
+            raise exception
+        return self._handle_response(request_data, response, kwargs)
+
+    def send(self, request_data, req_ob, **kwargs):
+        """Send a prepared request with the cache options and rate limits of the request, response hooks are not run"""
+        return self.request.run(req_ob, **self.get_send_kwargs(request_data, kwargs))
+
+    def get_send_kwargs(self, request_data, kwargs):
+        """Add the cache options and rate limit buckets of the request to the kwargs a request is sent with"""
+        if self.get_stream(request_data, kwargs):
+            # Streamed responses are read by the caller so they are never cached
+            kwargs['stream'] = True
+            kwargs['cache'] = None
+        kwargs.setdefault('cache', request_data.get('cache'))
+        kwargs.setdefault('rate_limit_buckets', self.get_rate_limit_buckets(request_data))
+        return kwargs
+
+    def _new_prepared_request(self, request_data, is_json, files=None, auth=None, body=None, chunked=False):
+        is_json = is_json or request_data.get('is_json')
+        return self.request.prepare_requests_request(request_data, is_json, files=files, auth=auth, body=body,
+                                                     chunked=chunked)
+
+    def _hook_prepared_request(self, request_name, prep_req_obj):
+        return self._run_hook_func(request_name, prep_req_obj, self.REQUESTS_OBJ_HOOK_TYPE)
 
-        new_req_obj = self._run_hook_func(request_name, prep_req_obj, self.REQUESTS_OBJ_HOOK_TYPE)
-        return new_req_obj
+    def _prepare_request(self, request_data, is_json, files=None, auth=None, body=None, chunked=False):
+        prep_req_obj = self._new_prepared_request(request_data, is_json, files, auth=auth, body=body, chunked=chunked)
+        return self._hook_prepared_request(request_data['request_name'], prep_req_obj)
 
     def build_request_data(self, request_data, data, url_data, headers, user_url_query):
 
@@ -156,45 +563,108 @@ class APIClient(APIClientHook, BaseClient):
         # They can do whatever they want with it and must return it back as this will be set as the new
         # data for each of them respectively before the request is being done
         request_name = request_data['request_name']
+        steps = self._build_request_data_steps(request_data, data, url_data, headers, user_url_query)
+        try:
+            hook_type, hook_data = next(steps)
+            while True:
+                hook_type, hook_data = steps.send(self._run_hook_func(request_name, hook_data, hook_type))
+        except StopIteration as e:
+            return e.value
+
+    def _build_request_data_steps(self, request_data, data, url_data, headers, user_url_query):
+        """
+        Generator that builds the final request data, it yields (hook_type, data) every time user hooks
+        must run and expects the hooked data to be sent back, so sync and asyncio clients
+        can share the same building steps while running hooks differently.
+        """
         built_headers = self.get_headers(headers, request_data)
-        new_header = self._run_hook_func(request_name, built_headers, self.HEADER_HOOK_TYPE)
+        new_header = yield self.HEADER_HOOK_TYPE, built_headers
 
         url_query = self.get_url_query(user_url_query, request_data)
-        new_url_query = self._run_hook_func(request_name, url_query, self.URL_QUERY_HOOK_TYPE)
+        new_url_query = yield self.URL_QUERY_HOOK_TYPE, url_query
 
         url = self.build_url(request_data, new_url_query, url_data)
-        new_url = self._run_hook_func(request_name, url, self.URL_HOOK_TYPE)
+        new_url = yield self.URL_HOOK_TYPE, url
 
         body_data = self.get_body_data(data, request_data)
-        new_post_data = self._run_hook_func(request_name, body_data, self.POST_DATA_HOOK_TYPE)
+        new_post_data = yield self.POST_DATA_HOOK_TYPE, body_data
 
         request_data['url'] = new_url
         request_data['headers'] = new_header
         request_data['url_query'] = url_query
         request_data['data'] = new_post_data
 
-        request_data = self._run_hook_func(request_name, request_data, self.REQUEST_HOOK_TYPE)
+        request_data = yield self.REQUEST_HOOK_TYPE, request_data
 
         return request_data
 
     def get_request_data(self, request_name):
         """Get a particular request data copy by name from all requests this api client can perform"""
-        request_data = self.request_data_list.get(request_name) or self.client.get(request_name)
-        if not request_data:
-            pages = self.client.get('pages', [])
-            for page_name in pages:
-                page = self.client[page_name]
-                if request_name in page:
-                    request_data = page[request_name]
-                    break
-            if not request_data:
+        return copy.deepcopy(self.find_request_data(request_name))
+
+    def find_request_data(self, request_name):
+        """Get the stored request data by name from the request index, it must not be changed"""
+        request_data = self.request_data_list.get(request_name)
+        if request_data is not None:
+            return request_data
+        found = self.request_index.get(self.client, request_name)
+        if found is None and self.request_index.is_stale(self.client):
+            self.request_index = RequestIndex(self.client)
+            found = self.request_index.get(self.client, request_name)
+        if found is None:
+            # Requests added at the top of the client after it was loaded
+            request_data = self.client.get(request_name)
+            if not is_request_data(request_data):
                 raise RapicException(
                     'Are you sure request %s exist in json file. Sorry cannot execute request' % request_name)
-            self.request_data_list[request_name] = request_data
-        return copy.deepcopy(request_data)
+            found = None, request_data
+        page, request_data = found
+        if page is not None:
+            self.request_pages[request_name] = page
+        self.request_data_list[request_name] = request_data
+        return request_data
+
+    def get_request_plan(self, request_name):
+        """Get the compiled plan of a request, requests are compiled once on first use"""
+        plan = self.request_plans.get(request_name)
+        if plan is None:
+            request_data = self.find_request_data(request_name)
+            plan = RequestPlan(self.client, request_name, request_data, page=self.request_pages.get(request_name),
+                               rate_limit=self.rate_limit)
+            plan.rate_limit_buckets = self.request.rate_limiter.get_buckets(plan.rate_limits)
+            plan.retry_policy = self.get_request_retry_policy(request_data)
+            # Threads compiling the same request together all use the first plan stored
+            plan = self.request_plans.setdefault(request_name, plan)
+        return plan
+
+    def get_request_retry_policy(self, request_data):
+        """
+        Retry policy of a stored request, its retry dict is merged over the client one, "retry": true uses the
+        client policy, or the default one, and "retry": false disables retries for it
+        """
+        retry = request_data.get('retry')
+        if retry is None or (retry is True and self.retry_policy is not None):
+            return self.retry_policy
+        if isinstance(retry, dict) and isinstance(self.retry, dict):
+            retry = dict_merge(self.retry, retry)
+        return RetryPolicy.from_config(retry)
+
+    def get_retry_policy(self, request_data):
+        """Retry policy used to send a request, the client one for requests without a plan"""
+        plan = getattr(request_data, 'plan', None)
+        if plan is not None:
+            return plan.retry_policy
+        return self.retry_policy
+
+    def get_rate_limit_buckets(self, request_data):
+        """Token buckets a request waits for before being sent, the client ones for requests without a plan"""
+        plan = getattr(request_data, 'plan', None)
+        if plan is not None:
+            return plan.rate_limit_buckets
+        return self.rate_limit_buckets
 
     def get_total_requests_number(self):
-        return len(self.request_data_list)
+        return len(self.request_index)
 
     def get_pages_number(self):
         return len(self.client.get('pages', 0))
@@ -204,8 +674,20 @@ class APIClient(APIClientHook, BaseClient):
             raise RapicException('This api client does not have pages implemented')
         return self.client['pages']
 
+    def get_cache_stats(self):
+        """Number of cache hits, misses and stale responses revalidated with the server"""
+        return self.request.get_cache_stats()
+
+    def get_pool_stats(self):
+        """Number of connections opened, reused from the pool and discarded because the pool was full"""
+        return self.request.get_pool_stats()
+
     def get_requests(self):
-        return self.request_data_list
+        """
+        All requests of the client by name as a read only dict, requests are looked up when they are accessed so
+        compiled clients only decode the requests used
+        """
+        return RequestsView(self)
 
     def info(self):
         req_data = dict()
@@ -213,7 +695,11 @@ class APIClient(APIClientHook, BaseClient):
         req_data['total_pages'] = self.get_pages_number()
         req_data['total_requests'] = self.get_total_requests_number()
         req_data['requests'] = self.get_requests()
+        req_data['request_names'] = list(self.request_index)
+        req_data['duplicate_requests'] = self.request_index.duplicates
         return req_data
 
     def close(self):
         self.request.close()
+        if isinstance(self.client, CompiledClient):
+            self.client.close()
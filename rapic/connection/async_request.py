@@ -0,0 +1,202 @@
+import asyncio
+import copy
+import datetime
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+from rapic.connection.body import is_streamed_body, iter_body
+from rapic.connection.cache import ResponseCache
+from rapic.connection.request import RapicRequestClient
+from rapic.exceptions import RapicException
+
+try:
+    import aiohttp
+    import yarl
+except ImportError:  # pragma: no cover
+    aiohttp = None
+
+
+def read_chunk(chunks):
+    """Next chunk of a body or None, memoryview chunks of memory maps are copied so their pages are read here"""
+    chunk = next(chunks, None)
+    return bytes(chunk) if isinstance(chunk, memoryview) else chunk
+
+
+class AsyncRapicRequestClient(RapicRequestClient):
+    """ Prepares requests with Python-Requests exactly like RapicRequestClient but sends them using aiohttp
+        so many requests can be in flight from a single asyncio event loop.
+        Responses are converted back to Python-Requests <Response> so response hooks behave the same way.
+    """
+
+    def __init__(self, name, **kwargs):
+        if aiohttp is None:
+            raise RapicException('aiohttp is required for asyncio clients, install it with pip install rapic[async]')
+        connection_pool = kwargs.get('connection_pool')
+        super(AsyncRapicRequestClient, self).__init__(name, **kwargs)
+        # aiohttp limits the total number of connections, without a pool configuration its defaults are kept
+        if connection_pool:
+            self.connection_limit_per_host = self.connection_pool['max_per_host']
+            self.connection_limit = self.connection_pool['max_per_host'] * self.connection_pool['max_hosts']
+        else:
+            self.connection_limit, self.connection_limit_per_host = 100, 0
+        self.async_session = None
+
+    def get_async_session(self):
+        """aiohttp session must be created inside a running event loop so it is created on first use"""
+        if self.async_session is None or self.async_session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connection_limit,
+                                             limit_per_host=self.connection_limit_per_host,
+                                             force_close=not self.connection_pool['keep_alive'])
+            # Cookies are kept in the Python-Requests session so they are applied while preparing requests
+            self.async_session = aiohttp.ClientSession(connector=connector, cookie_jar=aiohttp.DummyCookieJar(),
+                                                       trace_configs=[self.get_pool_trace_config()])
+        return self.async_session
+
+    def get_pool_trace_config(self):
+        """Record aiohttp connections opened and reused in the client pool stats"""
+        stats = self.pool_stats
+
+        async def on_connection_create_end(session, context, params):
+            stats.increment('opened')
+
+        async def on_connection_reuseconn(session, context, params):
+            stats.increment('reused')
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(on_connection_create_end)
+        trace_config.on_connection_reuseconn.append(on_connection_reuseconn)
+        return trace_config
+
+    async def run(self, prepped_req=None, cache=None, rate_limit_buckets=(), **kwargs):
+        """
+        Take prepared request from client and do actual sending by using aiohttp session
+        :param prepped_req:   <PreparedRequest>
+        :param cache: Cache options dict {'ttl': seconds, 'vary_headers': ['Authorization']} to cache the response
+        :param rate_limit_buckets: Token buckets of the request, waiting for them does not block the event loop
+        :return:  <Response>, with stream=True its body is not read and raw is the aiohttp response
+        """
+        if prepped_req is None:
+            return await self.run(self.prepared_request,
+                                  **self.get_prepared_request_kwargs(cache, rate_limit_buckets, kwargs))
+        if self.is_cache_blocking(cache):
+            cached = await self.run_blocking(self.get_cached_response, prepped_req, cache)
+        else:
+            cached = self.get_cached_response(prepped_req, cache)
+        cached_response, cache_key, cache_entry = cached
+        if cached_response is not None:
+            return cached_response
+        prepped_req = ResponseCache.conditional_request(prepped_req, cache_entry)
+        sending_data = self.request_kwargs.copy()
+        if kwargs:
+            sending_data.update(kwargs)
+        proxies = sending_data.get('proxies') or self.session.proxies
+        scheme = prepped_req.url.split(':', 1)[0]
+        headers = dict(prepped_req.headers)
+        body = prepped_req.body
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        elif is_streamed_body(body):
+            # aiohttp sends async iterables chunked and sets Transfer-Encoding itself
+            headers.pop('Transfer-Encoding', None)
+            body = self.stream_body(body)
+
+        delay = self.rate_limiter.reserve(rate_limit_buckets, prepped_req.url)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        if self.metrics is not None:
+            self.metrics.mark('rate_limit')
+        start = datetime.datetime.now()
+        # aiohttp errors are raised as their Python-Requests counterpart so callers handle both clients the same way
+        try:
+            resp = await self.get_async_session().request(
+                prepped_req.method, yarl.URL(prepped_req.url, encoded=True),
+                headers=headers, data=body,
+                proxy=proxies.get(scheme) if proxies else None,
+                timeout=self.get_timeout(sending_data.get('timeout')),
+                allow_redirects=sending_data.get('allow_redirects', True),
+                ssl=None if sending_data.get('verify', True) else False)
+            if sending_data.get('stream'):
+                response = self.build_response(prepped_req, resp, None)
+            else:
+                try:
+                    content = await resp.read()
+                finally:
+                    resp.release()
+                response = self.build_response(prepped_req, resp, content)
+        except asyncio.TimeoutError as e:
+            raise requests.exceptions.Timeout(e, request=prepped_req)
+        except aiohttp.ClientConnectionError as e:
+            raise requests.exceptions.ConnectionError(e, request=prepped_req)
+        response.elapsed = datetime.datetime.now() - start
+        if self.metrics is not None:
+            self.metrics.mark('network')
+        self.rate_limiter.update(rate_limit_buckets, prepped_req.url, response)
+        if self.is_cache_blocking(cache):
+            response = await self.run_blocking(self.cache.update, cache_key, cache_entry, response, cache)
+        elif cache:
+            response = self.cache.update(cache_key, cache_entry, response, cache)
+        return response
+
+    def is_cache_blocking(self, cache):
+        """Check if the cache store of a request does I/O (disk cache) and must not be used from the event loop"""
+        return bool(cache) and self.cache is not None and getattr(self.cache.store, 'blocking', True)
+
+    @staticmethod
+    async def run_blocking(func, *args):
+        """Run a function reading or writing files in the default executor so other requests are not stalled"""
+        return await asyncio.get_event_loop().run_in_executor(None, func, *args)
+
+    @classmethod
+    async def stream_body(cls, body):
+        """Chunks of a streamed body, files and memory maps are read in the default executor"""
+        chunks = iter_body(body)
+        while True:
+            chunk = await cls.run_blocking(read_chunk, chunks)
+            if chunk is None:
+                break
+            yield chunk
+
+    @staticmethod
+    def get_timeout(timeout):
+        """Convert Python-Requests timeout (total or (connect, read) tuple) to aiohttp timeout"""
+        if timeout is None:
+            return aiohttp.ClientTimeout(total=None)
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            return aiohttp.ClientTimeout(sock_connect=connect, sock_read=read)
+        return aiohttp.ClientTimeout(total=timeout)
+
+    def build_response(self, prepped_req, resp, content):
+        """Convert an aiohttp response to a Python-Requests response, content is None when the body is streamed"""
+        response = requests.Response()
+        response.status_code = resp.status
+        response.reason = resp.reason
+        response.headers = CaseInsensitiveDict(resp.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.url = str(resp.url)
+        response.request = prepped_req
+        if content is None:
+            # Streamed body is read from the aiohttp response by AsyncRecordStream
+            response.raw = resp
+            response._content = False
+        else:
+            response._content = content
+            response._content_consumed = True
+        for name, morsel in resp.cookies.items():
+            response.cookies.set(name, morsel.value, domain=morsel['domain'] or resp.url.host,
+                                 path=morsel['path'] or '/')
+        self.session.cookies.update(response.cookies)
+        return response
+
+    def __deepcopy__(self, memo):
+        # aiohttp session is bound to an event loop and cannot be copied, the copy creates its own on first use
+        new = self.__class__.__new__(self.__class__)
+        memo[id(self)] = new
+        for key, value in self.__dict__.items():
+            setattr(new, key, None if key == 'async_session' else copy.deepcopy(value, memo))
+        return new
+
+    async def close(self):
+        self.session.close()
+        if self.async_session is not None:
+            await self.async_session.close()
@@ -0,0 +1,345 @@
+"""
+Request bodies sent from their source instead of being read in memory first
+
+    api.upload_artifact(body='/data/build.tar')                     # memory mapped, sent without a copy
+    api.upload_artifact(body=open('/data/build.tar', 'rb'))
+    api.upload_artifact(body=memoryview(buffer))
+    api.upload_artifact(body=generate_chunks(), chunked=True)        # length unknown, sent chunked
+    api.upload_form(files={'artifact': ('build.tar', pathlib.Path('/data/build.tar'), 'application/x-tar')})
+
+Files are memory mapped and sent as memoryviews of the map so the socket reads the page cache directly, other
+streams are read in chunks while they are sent. Multipart bodies are encoded part by part as they are sent.
+Bodies can be sent again (retries, PreparedCall.run) except iterators and unseekable streams which can only be read
+once, requests with such bodies are never retried. Memory maps are closed by the client once the call is done, or by
+PreparedCall.close for dry runs.
+"""
+import io
+import mimetypes
+import mmap
+import os
+import stat
+import uuid
+from rapic.exceptions import RapicException
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+# Chunks of memory mapped files are views of the map, they are not copied so they can be larger
+MAPPED_CHUNK_SIZE = 1024 * 1024
+
+
+def map_file(fp):
+    """
+    Memory map a file object from its current position in a MappedBody, None when it is not a regular file (pipes,
+    sockets, in memory files) and b'' when there is nothing left to read
+    """
+    try:
+        fileno = fp.fileno()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    file_stat = os.fstat(fileno)
+    if not stat.S_ISREG(file_stat.st_mode):
+        return None
+    position = fp.tell() if fp.seekable() else 0
+    if position >= file_stat.st_size:
+        return b''
+    # The map holds its own file descriptor so the file can be closed while the map is used
+    return MappedBody(mmap.mmap(fileno, 0, access=mmap.ACCESS_READ), position)
+
+
+def open_body(body):
+    """
+    Get what is sent for a body: bytes or a memoryview when the body is in memory, a MappedBody for files, a
+    ReadableBody for other file objects and the body itself for iterables of bytes
+    :param body: Path of a file (str or os.PathLike), file object, bytes, bytearray, memoryview or iterable of bytes
+    """
+    if isinstance(body, (bytes, bytearray, MappedBody, ReadableBody, MultipartBody, ChunkedBody)):
+        return body
+    if isinstance(body, memoryview):
+        return body if body.ndim == 1 and body.format == 'B' else body.cast('B')
+    if isinstance(body, (str, os.PathLike)):
+        f = open(body, 'rb')
+        try:
+            mapped = map_file(f)
+        except BaseException:
+            f.close()
+            raise
+        if mapped is None:
+            # Pipes and devices can not be mapped, they are read while they are sent and closed with the body
+            return ReadableBody(f, close_file=True)
+        f.close()
+        return mapped
+    if isinstance(body, io.BytesIO):
+        return body.getbuffer()[body.tell():]
+    if hasattr(body, 'read'):
+        mapped = map_file(body)
+        return mapped if mapped is not None else ReadableBody(body)
+    if hasattr(body, '__iter__'):
+        return body
+    raise RapicException('Request body must be a path, file object, bytes or iterable of bytes, not %s'
+                         % type(body).__name__)
+
+
+def get_body_length(body):
+    """Number of bytes of a body returned by open_body, None when it is only known once it is read"""
+    if isinstance(body, (bytes, bytearray)):
+        return len(body)
+    if isinstance(body, memoryview):
+        return body.nbytes
+    return getattr(body, 'len', None)
+
+
+def set_request_body(prepped, body, chunked=False):
+    """
+    Set the body of a prepared request with its Content-Length, or Transfer-Encoding: chunked when chunked is True
+    or the length of the body is unknown
+    """
+    body = open_body(body)
+    length = get_body_length(body)
+    if chunked or length is None:
+        body = ChunkedBody(body)
+        prepped.headers.pop('Content-Length', None)
+        prepped.headers['Transfer-Encoding'] = 'chunked'
+    else:
+        prepped.headers.pop('Transfer-Encoding', None)
+        prepped.headers['Content-Length'] = str(length)
+    prepped.body = body
+    return prepped
+
+
+def is_rewindable_body(body):
+    """Check if a body returned by open_body can be sent again, iterators and unseekable streams are read once"""
+    if body is None or isinstance(body, (str, bytes, bytearray, memoryview, MappedBody)):
+        return True
+    if isinstance(body, ReadableBody):
+        return body.start is not None
+    if isinstance(body, ChunkedBody):
+        return is_rewindable_body(body.body)
+    if isinstance(body, MultipartBody):
+        return all(is_rewindable_body(part) for part in body.parts)
+    return iter(body) is not body
+
+
+def close_body(body):
+    """
+    Close the memory maps and the files opened from a path of a body returned by open_body, other bodies and file
+    objects are left open
+    """
+    if isinstance(body, (MappedBody, ReadableBody)):
+        body.close()
+    elif isinstance(body, ChunkedBody):
+        close_body(body.body)
+    elif isinstance(body, MultipartBody):
+        for part in body.parts:
+            close_body(part)
+
+
+def is_streamed_body(body):
+    """Check if a prepared request body is sent in chunks instead of at once"""
+    return body is not None and not isinstance(body, (str, bytes, bytearray, memoryview))
+
+
+def iter_body(body, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Chunks of a body returned by open_body"""
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        for start in range(0, len(body), chunk_size):
+            yield body[start:start + chunk_size]
+    else:
+        for chunk in body:
+            yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+
+class MappedBody:
+    """
+    Memory map of a file sent from a position in chunks that are views of the map, so the file is never copied.
+    The map is closed by close or when used as a context manager, views still used elsewhere keep it open until they
+    are garbage collected
+    """
+
+    def __init__(self, file_map, start=0, chunk_size=MAPPED_CHUNK_SIZE):
+        self.map = file_map
+        self.start = start
+        self.chunk_size = chunk_size
+        self.len = len(file_map) - start
+
+    def __iter__(self):
+        with memoryview(self.map) as view:
+            for start in range(self.start, len(view), self.chunk_size):
+                # Every chunk is released once it is sent so the map can be closed
+                with view[start:start + self.chunk_size] as chunk:
+                    yield chunk
+
+    @property
+    def closed(self):
+        return self.map.closed
+
+    def close(self):
+        try:
+            self.map.close()
+        except BufferError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class ChunkedBody:
+    """Body sent with Transfer-Encoding: chunked, large chunks are split as every chunk is copied in its frame"""
+
+    len = None
+
+    def __init__(self, body, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.body = body
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        for chunk in iter_body(self.body, self.chunk_size):
+            if len(chunk) > self.chunk_size:
+                yield from iter_body(chunk, self.chunk_size)
+            else:
+                yield chunk
+
+
+class ReadableBody:
+    """
+    File object that can not be memory mapped read in chunks while it is sent, from its start position every time
+    :param close_file: Close the file with the body, for files opened by open_body
+    """
+
+    def __init__(self, fp, chunk_size=DEFAULT_CHUNK_SIZE, close_file=False):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.close_file = close_file
+        self.start = None
+        self.len = None
+        try:
+            if fp.seekable():
+                self.start = fp.tell()
+                self.len = fp.seek(0, os.SEEK_END) - self.start
+                fp.seek(self.start)
+        except (AttributeError, OSError):
+            pass
+
+    def __iter__(self):
+        if self.start is not None:
+            self.fp.seek(self.start)
+        while True:
+            chunk = self.fp.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+
+    def close(self):
+        if self.close_file:
+            self.fp.close()
+
+
+def format_header_param(value):
+    """Quote a Content-Disposition parameter like browsers and urllib3 do"""
+    return '"%s"' % value.replace('\\', '\\\\').replace('"', '%22').replace('\r', '%0D').replace('\n', '%0A')
+
+
+def value_at(values, index):
+    return values[index] if len(values) > index else None
+
+
+def get_file_name(fp):
+    name = getattr(fp, 'name', None)
+    if isinstance(fp, (str, os.PathLike)):
+        name = os.fspath(fp)
+    if isinstance(name, bytes):
+        name = name.decode('utf-8', 'replace')
+    if isinstance(name, str) and name and name[0] != '<' and name[-1] != '>':
+        return os.path.basename(name)
+    return None
+
+
+class MultipartBody:
+    """
+    multipart/form-data body encoded part by part while it is sent, file parts are sent from their source with
+    open_body so large files are never read in memory
+
+    :param fields: Dict or list of (name, value) of form fields, list values are sent as many parts
+    :param files: Dict or list of (name, file) like Python-Requests files, file is a value or a tuple
+                  (filename, value), (filename, value, content type) or (filename, value, content type, headers).
+                  value is a file object, bytes, memoryview or a pathlib.Path of a file to send, a str is sent
+                  as the content of the file
+    """
+
+    def __init__(self, fields=None, files=None, boundary=None, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.boundary = boundary or uuid.uuid4().hex
+        self.content_type = 'multipart/form-data; boundary=%s' % self.boundary
+        self.chunk_size = chunk_size
+        self.parts = []
+        self.pending = bytearray()
+        for name, values in self.get_items(fields):
+            for value in (values if isinstance(values, list) else [values]):
+                if value is None:
+                    continue
+                if not isinstance(value, (bytes, bytearray)):
+                    value = str(value).encode('utf-8')
+                self.add_bytes(self.get_part_header(name))
+                self.add_bytes(value)
+                self.add_bytes(b'\r\n')
+        for name, value in self.get_items(files):
+            filename, content_type, headers = None, None, {}
+            if isinstance(value, (tuple, list)):
+                filename, content_type, headers = value[0], value_at(value, 2), value_at(value, 3) or {}
+                value = value[1]
+            else:
+                filename = get_file_name(value) or name
+            if isinstance(value, str):
+                value = value.encode('utf-8')
+            if content_type is None and filename:
+                content_type = mimetypes.guess_type(filename)[0]
+            self.add_bytes(self.get_part_header(name, filename, content_type, headers))
+            self.add_source(open_body(value))
+            self.add_bytes(b'\r\n')
+        self.add_bytes(('--%s--\r\n' % self.boundary).encode('utf-8'))
+        self.flush()
+        lengths = [get_body_length(part) for part in self.parts]
+        self.len = None if None in lengths else sum(lengths)
+
+    @staticmethod
+    def get_items(values):
+        if not values:
+            return []
+        return list(values.items()) if isinstance(values, dict) else list(values)
+
+    def get_part_header(self, name, filename=None, content_type=None, headers=None):
+        disposition = 'form-data; name=%s' % format_header_param(str(name))
+        if filename:
+            disposition = '%s; filename=%s' % (disposition, format_header_param(str(filename)))
+        lines = ['--%s' % self.boundary, 'Content-Disposition: %s' % disposition]
+        if content_type:
+            lines.append('Content-Type: %s' % content_type)
+        lines.extend('%s: %s' % (key, value) for key, value in (headers or {}).items())
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('utf-8')
+
+    def add_bytes(self, value):
+        # Headers and small fields next to each other are sent together
+        self.pending += value
+
+    def add_source(self, source):
+        if isinstance(source, MappedBody) and source.len < self.chunk_size:
+            with source:
+                source = b''.join(source)
+        if isinstance(source, (bytes, bytearray, memoryview)) and get_body_length(source) < self.chunk_size:
+            self.add_bytes(source)
+            return
+        self.flush()
+        self.parts.append(source)
+
+    def flush(self):
+        if self.pending:
+            self.parts.append(bytes(self.pending))
+            self.pending = bytearray()
+
+    def __iter__(self):
+        for part in self.parts:
+            if isinstance(part, (bytes, bytearray, memoryview)):
+                # Files in memory are sent at once without being copied
+                yield part
+            else:
+                yield from iter_body(part, self.chunk_size)
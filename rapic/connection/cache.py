@@ -0,0 +1,242 @@
+import copy
+import hashlib
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+# Only responses of these methods are cached
+CACHEABLE_METHODS = ('GET', 'HEAD')
+# Headers that make a different response when they change, used when a request does not set vary_headers
+DEFAULT_VARY_HEADERS = ('Authorization', 'Cookie')
+
+
+class CacheStats:
+    """Thread safe counters of cache hits, misses and responses revalidated with the server"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+
+    def increment(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def as_dict(self):
+        with self.lock:
+            return {'hits': self.hits, 'misses': self.misses, 'revalidated': self.revalidated}
+
+
+class CacheEntry:
+    """A cached response with the time it stops being fresh and its validator"""
+
+    def __init__(self, response, expires):
+        self.response = copy.copy(response)
+        self.response.headers = response.headers.copy()
+        self.expires = expires
+        self.etag = response.headers.get('ETag')
+
+    def is_fresh(self):
+        return time.time() < self.expires
+
+    def get_response(self):
+        """Copy of the response so hooks can not change the cached one"""
+        response = copy.copy(self.response)
+        response.headers = self.response.headers.copy()
+        response.from_cache = True
+        return response
+
+
+class MemoryCacheStore:
+    """Keep cache entries in memory, the least recently used entry is removed when max_entries is reached"""
+
+    # Stores that do no I/O are used directly from the event loop of asyncio clients
+    blocking = False
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def __deepcopy__(self, memo):
+        return self
+
+
+class DiskCacheStore:
+    """Keep cache entries as pickle files in a directory so they are shared between processes and restarts,
+        the least recently used files are removed when max_entries is reached
+    """
+
+    # Files are read and written in the default executor by asyncio clients
+    blocking = True
+
+    def __init__(self, directory, max_entries=10000):
+        self.directory = directory
+        self.max_entries = max_entries
+        os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, key):
+        return os.path.join(self.directory, key + '.cache')
+
+    def get(self, key):
+        path = self.get_path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            # Evicted by another client since it was read
+            pass
+        return entry
+
+    def set(self, key, entry):
+        path = self.get_path(key)
+        tmp_path = '%s.%s.tmp' % (path, threading.get_ident())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def evict(self):
+        files = [os.path.join(self.directory, f) for f in os.listdir(self.directory) if f.endswith('.cache')]
+        if len(files) <= self.max_entries:
+            return
+        files.sort(key=lambda f: os.stat(f).st_mtime)
+        for path in files[:len(files) - self.max_entries]:
+            self.remove(path)
+
+    def delete(self, key):
+        self.remove(self.get_path(key))
+
+    def clear(self):
+        for f in os.listdir(self.directory):
+            if f.endswith('.cache'):
+                self.remove(os.path.join(self.directory, f))
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+class ResponseCache:
+    """
+    Cache responses of prepared requests in a store, responses are keyed on method, url and the request
+    headers that are listed in vary_headers. Cache-Control no-store and no-cache are honoured and
+    stale responses with an ETag are revalidated with If-None-Match
+    :param store: MemoryCacheStore, DiskCacheStore or any object with get, set and delete. asyncio clients use
+                  stores in the default executor unless their blocking attribute is False
+    """
+
+    def __init__(self, store=None):
+        self.store = store if store is not None else MemoryCacheStore()
+        self.stats = CacheStats()
+
+    @staticmethod
+    def get_key(prepped_req, vary_headers=None):
+        if vary_headers is None:
+            vary_headers = DEFAULT_VARY_HEADERS
+        key = [prepped_req.method, prepped_req.url]
+        for header in sorted(vary_headers):
+            key.append('%s:%s' % (header.lower(), prepped_req.headers.get(header, '')))
+        return hashlib.sha256('\n'.join(key).encode('utf8')).hexdigest()
+
+    @staticmethod
+    def get_ttl(response, ttl=None):
+        """Seconds a response stays fresh, None if it must not be stored"""
+        cache_control = [d.strip().lower() for d in response.headers.get('Cache-Control', '').split(',')]
+        if 'no-store' in cache_control:
+            return None
+        if 'no-cache' in cache_control:
+            return 0
+        if ttl is not None:
+            return ttl
+        for directive in cache_control:
+            if directive.startswith('max-age='):
+                try:
+                    return int(directive.split('=', 1)[1])
+                except ValueError:
+                    return 0
+        return 0
+
+    def lookup(self, prepped_req, options):
+        """
+        Get a fresh cached response for the request, a stale entry is returned so the request can be sent with
+        conditional_request and the server can answer 304 Not Modified
+        :return: (response or None, key, stale entry or None)
+        """
+        if prepped_req.method not in CACHEABLE_METHODS:
+            return None, None, None
+        key = self.get_key(prepped_req, options.get('vary_headers'))
+        entry = self.store.get(key)
+        if entry is None:
+            return None, key, None
+        if entry.is_fresh():
+            self.stats.increment('hits')
+            return entry.get_response(), key, entry
+        return None, key, entry
+
+    @staticmethod
+    def conditional_request(prepped_req, entry):
+        """
+        Get a copy of the request with the If-None-Match header of a stale entry, the request itself is not changed
+        so it never sends the ETag of an entry that was evicted since
+        """
+        if entry is None or not entry.etag:
+            return prepped_req
+        prepped_req = prepped_req.copy()
+        prepped_req.headers['If-None-Match'] = entry.etag
+        return prepped_req
+
+    def update(self, key, entry, response, options):
+        """Save a new response for key, a 304 response refreshes the stale entry and its response is returned"""
+        if key is None:
+            return response
+        if response.status_code == 304 and entry is not None:
+            self.stats.increment('revalidated')
+            entry.expires = time.time() + (self.get_ttl(response, options.get('ttl')) or 0)
+            self.store.set(key, entry)
+            return entry.get_response()
+        self.stats.increment('misses')
+        if response.status_code != 200:
+            return response
+        ttl = self.get_ttl(response, options.get('ttl'))
+        if ttl is None or (not ttl and not response.headers.get('ETag')):
+            self.store.delete(key)
+            return response
+        response.content  # read the body so the response can be kept after the connection is released
+        self.store.set(key, CacheEntry(response, time.time() + ttl))
+        return response
@@ -0,0 +1,106 @@
+import threading
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+DEFAULT_CONNECTION_POOL = {
+    'max_per_host': 10,  # connections kept alive per host
+    'max_hosts': 10,  # number of hosts connection pools are kept for
+    'block': False,  # wait for a free connection instead of opening one that is discarded later
+    'keep_alive': True,  # reuse connections, send Connection: close when False
+}
+
+
+class PoolStats:
+    """Thread safe counters of connections opened, reused from the pool and discarded because the pool was full"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
+        self.discarded = 0
+
+    def increment(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def __deepcopy__(self, memo):
+        # Copies of a client share its connection pools so they share the counters too
+        return self
+
+    def __getstate__(self):
+        return self.as_dict()
+
+    def __setstate__(self, state):
+        self.lock = threading.Lock()
+        self.__dict__.update(state)
+
+    def as_dict(self):
+        with self.lock:
+            return {'opened': self.opened, 'reused': self.reused, 'discarded': self.discarded}
+
+
+def counting_pool_class(pool_class, connection_class, stats):
+    """Create a urllib3 connection pool class that records its connection usage in stats"""
+
+    class CountingConnection(connection_class):
+
+        def connect(self):
+            stats.increment('opened')
+            return super(CountingConnection, self).connect()
+
+    class CountingPool(pool_class):
+        ConnectionCls = CountingConnection
+
+        def _get_conn(self, timeout=None):
+            conn = super(CountingPool, self)._get_conn(timeout=timeout)
+            if getattr(conn, 'sock', None) is not None:
+                stats.increment('reused')
+            return conn
+
+        def _put_conn(self, conn):
+            if conn is not None and self.pool is not None and self.pool.full():
+                stats.increment('discarded')
+            return super(CountingPool, self)._put_conn(conn)
+
+    return CountingPool
+
+
+class RapicHTTPAdapter(HTTPAdapter):
+    """
+    Python-Requests adapter with configurable pool sizes that records pool usage in a PoolStats
+    :param stats: PoolStats shared by all adapters of a client
+    :param max_per_host: Number of connections kept alive per host, this should be at least the number
+            of threads sending requests at the same time
+    :param max_hosts: Number of hosts connection pools are kept for
+    :param block: Wait for a connection to be free instead of opening extra connections when max_per_host is reached
+    """
+
+    __attrs__ = HTTPAdapter.__attrs__ + ['stats']
+
+    def __init__(self, stats, max_per_host=10, max_hosts=10, block=False, **kwargs):
+        self.stats = stats
+        self.pool_classes = self.create_pool_classes(stats)
+        super(RapicHTTPAdapter, self).__init__(pool_connections=max_hosts, pool_maxsize=max_per_host,
+                                               pool_block=block, **kwargs)
+
+    @staticmethod
+    def create_pool_classes(stats):
+        return {
+            'http': counting_pool_class(HTTPConnectionPool, HTTPConnection, stats),
+            'https': counting_pool_class(HTTPSConnectionPool, HTTPSConnection, stats),
+        }
+
+    def init_poolmanager(self, *args, **kwargs):
+        super(RapicHTTPAdapter, self).init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = self.pool_classes
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        manager = super(RapicHTTPAdapter, self).proxy_manager_for(proxy, **proxy_kwargs)
+        if hasattr(manager, 'pool_classes_by_scheme'):
+            manager.pool_classes_by_scheme = self.pool_classes
+        return manager
+
+    def __setstate__(self, state):
+        self.pool_classes = self.create_pool_classes(state['stats'])
+        super(RapicHTTPAdapter, self).__setstate__(state)
@@ -0,0 +1,126 @@
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+
+# Rate of a bucket is divided by this after a 429 response and it grows back by MIN_RATE_FACTOR of its
+# configured rate for every successful response
+BACKOFF_FACTOR = 2.0
+MIN_RATE_FACTOR = 0.05
+# Seconds a host is paused after a 429 response without Retry-After header
+DEFAULT_RETRY_AFTER = 1.0
+
+
+def get_retry_after(response):
+    """Seconds to wait from the Retry-After header of a response, it can be a number of seconds or a date"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Thread safe token bucket allowing rps requests per second with bursts of up to burst requests.
+    Callers reserve a token and get back the seconds they must wait before sending so waiting never
+    happens while holding the lock and the same bucket can be used by threads and asyncio tasks
+    """
+
+    def __init__(self, rps, burst=None):
+        self.max_rate = float(rps)
+        self.rate = self.max_rate
+        self.capacity = float(burst or max(1.0, self.max_rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def reserve(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= 1
+            delay = -self.tokens / self.rate if self.tokens < 0 else 0.0
+            return max(delay, self.blocked_until - now)
+
+    def slow_down(self, retry_after=None):
+        with self.lock:
+            self.rate = max(self.max_rate * MIN_RATE_FACTOR, self.rate / BACKOFF_FACTOR)
+            if retry_after is not None:
+                self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+
+    def speed_up(self):
+        if self.rate < self.max_rate:
+            with self.lock:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * MIN_RATE_FACTOR)
+
+
+class RateLimiter:
+    """
+    Schedule requests of a client so they respect the rate limits declared in the rapic json file
+    at client, page and request level ("rate_limit": {"rps": 5, "burst": 10}).
+    A 429 response slows down the buckets of the request and pauses its host for Retry-After seconds,
+    rates grow back to their configured value as requests succeed
+    """
+
+    def __init__(self):
+        self.buckets = {}
+        self.blocked_hosts = {}
+        self.lock = threading.Lock()
+
+    def get_buckets(self, rate_limits):
+        """
+        Get the buckets of a request
+        :param rate_limits: list of (key, {'rps': 5, 'burst': 10}) e.g [(('request', 'get_user'), {'rps': 1})]
+        :return: tuple of TokenBucket
+        """
+        buckets = []
+        for key, config in rate_limits:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                with self.lock:
+                    bucket = self.buckets.setdefault(key, TokenBucket(config['rps'], config.get('burst')))
+            buckets.append(bucket)
+        return tuple(buckets)
+
+    def reserve(self, buckets, url):
+        """Reserve a token in every bucket and return the seconds to wait before sending the request"""
+        delay = 0.0
+        if self.blocked_hosts:
+            blocked_until = self.blocked_hosts.get(urlparse(url).netloc)
+            if blocked_until:
+                delay = blocked_until - time.monotonic()
+        for bucket in buckets:
+            delay = max(delay, bucket.reserve())
+        return delay
+
+    def acquire(self, buckets, url):
+        delay = self.reserve(buckets, url)
+        if delay > 0:
+            time.sleep(delay)
+
+    def update(self, buckets, url, response):
+        """Adapt rates to the response, a 429 response slows down and a successful one speeds up"""
+        if response.status_code == 429:
+            retry_after = get_retry_after(response)
+            host = urlparse(url).netloc
+            with self.lock:
+                self.blocked_hosts[host] = max(self.blocked_hosts.get(host, 0.0),
+                                               time.monotonic() + (retry_after or DEFAULT_RETRY_AFTER))
+            for bucket in buckets:
+                bucket.slow_down(retry_after)
+        elif response.status_code < 400:
+            for bucket in buckets:
+                bucket.speed_up()
+
+    def __deepcopy__(self, memo):
+        # Copies of a client send to the same hosts so they share its limits
+        return self
@@ -1,22 +1,96 @@
+import threading
 import requests
-import blackboxprotobuf
+from urllib.parse import parse_qsl
+from rapic.connection.body import MultipartBody, close_body, set_request_body
+from rapic.connection.cache import ResponseCache
+from rapic.connection.pool import DEFAULT_CONNECTION_POOL, PoolStats, RapicHTTPAdapter
+from rapic.connection.ratelimit import RateLimiter
+from rapic.exceptions import RapicException
+from rapic.tools.proto import compile_typedef
+
+class PreparedCall:
+    """
+    Prepared request of one call with the kwargs it is sent with, returned by dry_run. It shares the session and
+    connection pool of its client and never changes the client so calls can be prepared and sent from many threads.
+    Other attributes are the client ones
+
+        req = api.get_my_ip(dry_run=True)
+        req.prepared_request.headers['Signature'] = sign(req.prepared_request.body)
+        response = req.run()
+
+    It can be run many times, memory mapped file bodies stay open until close is called or the with block ends
+
+        with api.upload_artifact(body='/data/build.tar', dry_run=True) as req:
+            response = req.run()
+    """
+
+    __slots__ = ('client', 'prepared_request', 'request_kwargs')
+
+    def __init__(self, client, prepared_request, **kwargs):
+        self.client = client
+        self.prepared_request = prepared_request
+        self.request_kwargs = kwargs
+
+    def run(self, **kwargs):
+        """Send the prepared request with the client, kwargs are added to the ones given to the call"""
+        if kwargs:
+            kwargs = dict(self.request_kwargs, **kwargs)
+        else:
+            kwargs = self.request_kwargs
+        return self.client.run(self.prepared_request, **kwargs)
+
+    def close(self):
+        """Close the memory maps of the body"""
+        close_body(self.prepared_request.body)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def __getattr__(self, name):
+        if name in PreparedCall.__slots__:
+            raise AttributeError(name)
+        return getattr(self.client, name)
+
 
 class RapicRequestClient:
     """ This is very straight-forward using Python-Requests to make actual requests """
 
+    # rapic.metrics.Metrics of the api client, stages are not timed when it is None
+    metrics = None
+
     def __init__(self, name, **kwargs):
         self.name = name
-        self.session = kwargs.pop('session', None) or requests.Session()
+        session = kwargs.pop('session', None)
+        connection_pool = kwargs.pop('connection_pool', None)
+        self.session = session or requests.Session()
         self.session.proxies = kwargs.pop('proxies', {})
+        self.pool_stats = PoolStats()
+        self.connection_pool = dict(DEFAULT_CONNECTION_POOL, **(connection_pool or {}))
+        # A session supplied by the user keeps its own adapters unless a pool configuration is given
+        if not session or connection_pool:
+            self.mount_pool_adapters()
+        cache_store = kwargs.pop('cache_store', None)
+        self.cache = ResponseCache(cache_store) if cache_store is not None else None
+        self.cache_lock = threading.Lock()
+        self.rate_limiter = RateLimiter()
         self.request_kwargs = kwargs
         self.prepared_request = None
+        self.prepared_request_kwargs = {}
 
-    def prepare_requests_request(self, request_data, is_json=False, files=None, auth=None):
+    def prepare_requests_request(self, request_data, is_json=False, files=None, auth=None, body=None,
+                                 chunked=False):
         """
         Prepares a request from an api client before sending it.
         A client can change anything in the prepared request before sending it
         :param request_data: crafted api request data from json file
         :param is_json : decide if request is going to be sent in json format
+        :param files: Files sent in a streamed multipart body with the request data as form fields
+        :param body: Body sent instead of the request data: a file path, file object, bytes, memoryview or iterable
+                     of bytes, files are memory mapped and nothing is read in memory
+        :param chunked: Send the body with Transfer-Encoding: chunked, bodies with an unknown length always are
         :return: <PreparedRequest>
         """
         method = request_data['method']
@@ -25,34 +99,126 @@ class RapicRequestClient:
         data = request_data['data']
         typedef = request_data.get('typedef')
         if typedef:
-            data = blackboxprotobuf.encode_message(data, typedef)
-        if is_json:
-            req = requests.Request(method, url, json=data, files=files, auth=auth, headers=headers)
+            data = compile_typedef(typedef).encode(data)
+            if self.metrics is not None:
+                self.metrics.mark('encode')
+        if body is not None or files:
+            # Python-Requests would read bodies and encode files in memory, they are set on the prepared request
+            req = requests.Request(method, url, auth=auth, headers=headers)
+            prepped = self.session.prepare_request(req)
+            if body is None:
+                body = MultipartBody(None if is_json else self.get_form_fields(data), files)
+                prepped.headers['Content-Type'] = body.content_type
+            set_request_body(prepped, body, chunked)
         else:
-            req = requests.Request(method, url, data=data, files=files, auth=auth, headers=headers)
-
-        prepped = self.session.prepare_request(req)
+            if is_json:
+                req = requests.Request(method, url, json=data, auth=auth, headers=headers)
+            else:
+                req = requests.Request(method, url, data=data, auth=auth, headers=headers)
+            prepped = self.session.prepare_request(req)
+        if self.metrics is not None:
+            self.metrics.mark('prepare')
         return prepped
 
+    @staticmethod
+    def get_form_fields(data):
+        """Form fields of request data sent along files, saved form bodies are url encoded strings"""
+        if isinstance(data, bytes):
+            data = data.decode('utf-8')
+        if isinstance(data, str):
+            return parse_qsl(data, keep_blank_values=True)
+        return data if isinstance(data, (dict, list)) else None
+
+    def mount_pool_adapters(self):
+        """
+        Mount http and https adapters using the client connection pool configuration
+        connection_pool = {'max_per_host': 10, 'max_hosts': 10, 'block': False, 'keep_alive': True}
+        """
+        pool = self.connection_pool
+        for scheme in ('http://', 'https://'):
+            self.session.mount(scheme, RapicHTTPAdapter(self.pool_stats, max_per_host=pool['max_per_host'],
+                                                        max_hosts=pool['max_hosts'], block=pool['block']))
+        if not pool['keep_alive']:
+            self.session.headers['Connection'] = 'close'
+
+    def get_pool_stats(self):
+        """Number of connections opened, reused from the pool and discarded because the pool was full"""
+        return self.pool_stats.as_dict()
+
+    def prepare_call(self, prepped_req, **kwargs):
+        """Get a PreparedCall sending prepped_req with kwargs, the client is not changed"""
+        return PreparedCall(self, prepped_req, **kwargs)
+
     def set_prepared_request(self, prepped_req, **kwargs):
-        if kwargs:
-            self.request_kwargs.update(kwargs)
+        """
+        Set the request sent by run() when it is called without one, kwargs are only used to send it.
+        The client is changed so it must not be shared by threads, prepare_call does the same without changing it
+        """
         self.prepared_request = prepped_req
+        self.prepared_request_kwargs = kwargs
 
-    def run(self, prepped_req=None, **kwargs):
+    def run(self, prepped_req=None, cache=None, rate_limit_buckets=(), **kwargs):
         """
         Take prepared request from client and do actual sending by  using request session
         :param prepped_req:   <PreparedRequest>
+        :param cache: Cache options dict {'ttl': seconds, 'vary_headers': ['Authorization']} to cache the response
+        :param rate_limit_buckets: Token buckets of the request from rate_limiter.get_buckets, the request waits
+                                   for all of them before being sent. Cached responses do not wait
         :return:  <Response>
         """
+        if prepped_req is None:
+            return self.run(self.prepared_request, **self.get_prepared_request_kwargs(cache, rate_limit_buckets, kwargs))
+        response, cache_key, cache_entry = self.get_cached_response(prepped_req, cache)
+        if response is not None:
+            return response
+        prepped_req = ResponseCache.conditional_request(prepped_req, cache_entry)
         sending_data = self.request_kwargs.copy()
         if kwargs:
             sending_data.update(kwargs)
-        resp = self.session.send(prepped_req or self.prepared_request,
+        self.rate_limiter.acquire(rate_limit_buckets, prepped_req.url)
+        if self.metrics is not None:
+            self.metrics.mark('rate_limit')
+        resp = self.session.send(prepped_req,
                                  **sending_data
                                  )
+        if self.metrics is not None:
+            self.metrics.mark('network')
+        self.rate_limiter.update(rate_limit_buckets, prepped_req.url, resp)
+        if cache:
+            resp = self.cache.update(cache_key, cache_entry, resp, cache)
         return resp
 
+    def get_prepared_request_kwargs(self, cache, rate_limit_buckets, kwargs):
+        """kwargs of run() sending the request set with set_prepared_request"""
+        if self.prepared_request is None:
+            raise RapicException('There is no prepared request to send, use set_prepared_request first')
+        run_kwargs = dict(self.prepared_request_kwargs)
+        if cache is not None:
+            run_kwargs['cache'] = cache
+        if rate_limit_buckets:
+            run_kwargs['rate_limit_buckets'] = rate_limit_buckets
+        run_kwargs.update(kwargs)
+        return run_kwargs
+
+    def get_cached_response(self, prepped_req, cache):
+        """
+        Get a cached response when cache options are set for the request
+        :return: (response or None, cache key, cached entry)
+        """
+        if not cache:
+            return None, None, None
+        if self.cache is None:
+            with self.cache_lock:
+                if self.cache is None:
+                    self.cache = ResponseCache()
+        return self.cache.lookup(prepped_req, cache)
+
+    def get_cache_stats(self):
+        """Number of cache hits, misses and stale responses revalidated with the server"""
+        if self.cache is None:
+            return {'hits': 0, 'misses': 0, 'revalidated': 0}
+        return self.cache.stats.as_dict()
+
     @staticmethod
     def clean_headers(headers):
         return {x.strip(): str(y).strip() for x, y in headers.items()}
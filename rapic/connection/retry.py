@@ -0,0 +1,103 @@
+import importlib
+import random
+import requests
+from rapic.connection.ratelimit import get_retry_after
+from rapic.exceptions import RapicException
+
+# Methods that can be sent again without changing the result on the server
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE')
+DEFAULT_RETRY = {
+    'max_attempts': 3,
+    'status_codes': [429, 500, 502, 503, 504],
+    'exceptions': ['ConnectionError', 'Timeout'],
+    'backoff': 0.5,
+    'max_backoff': 30,
+    'jitter': True,
+    'methods': list(IDEMPOTENT_METHODS),
+}
+
+
+def get_exception_class(name):
+    """Get an exception class from its name in requests.exceptions or its dotted path e.g 'socket.timeout'"""
+    if not isinstance(name, str):
+        return name
+    if '.' not in name:
+        exception_class = getattr(requests.exceptions, name, None)
+        if exception_class is None:
+            raise RapicException('Unknown retry exception %s' % name)
+        return exception_class
+    module_name, class_name = name.rsplit('.', 1)
+    try:
+        return getattr(importlib.import_module(module_name), class_name)
+    except (ImportError, AttributeError):
+        raise RapicException('Unknown retry exception %s' % name)
+
+
+class RetryPolicy:
+    """
+    Decide if a request must be sent again and how long to wait before it, set with retry in the rapic json file
+    at client or request level or given to the client constructor
+
+        "retry": {"max_attempts": 3, "status_codes": [429, 500, 502, 503, 504], "exceptions": ["ConnectionError"],
+                  "backoff": 0.5, "max_backoff": 30, "jitter": true, "methods": ["GET", "PUT"]}
+
+    Attempt n waits backoff * 2 ** (n - 1) seconds capped to max_backoff, with jitter the wait is a random value up
+    to it. Retry-After header of the response is waited for when it is longer. Only methods listed are retried,
+    idempotent methods by default, use "methods": "*" to retry every method
+    """
+
+    def __init__(self, max_attempts=3, status_codes=None, exceptions=None, backoff=0.5, max_backoff=30, jitter=True,
+                 methods=None):
+        self.max_attempts = max_attempts
+        self.status_codes = frozenset(DEFAULT_RETRY['status_codes'] if status_codes is None else status_codes)
+        self.exceptions = tuple(get_exception_class(name) for name in
+                                (DEFAULT_RETRY['exceptions'] if exceptions is None else exceptions))
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        methods = IDEMPOTENT_METHODS if methods is None else methods
+        self.methods = None if methods == '*' else frozenset(method.upper() for method in methods)
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        Create a policy from a retry dict, true uses the default policy, a policy is returned as it is and a false
+        value disables retries
+        """
+        if not config:
+            return None
+        if isinstance(config, cls):
+            return config
+        if config is True:
+            return cls()
+        if not isinstance(config, dict):
+            raise RapicException('retry must be a dict, true or false, not %r' % (config,))
+        return cls(**config)
+
+    def is_retryable_method(self, method):
+        return self.methods is None or method.upper() in self.methods
+
+    def get_delay(self, attempt, response=None):
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0, delay)
+        retry_after = get_retry_after(response) if response is not None else None
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+
+    def next_delay(self, attempt, method, response=None, exception=None):
+        """
+        Seconds to wait before sending the request again or None when it must not be retried
+        :param attempt: Number of the attempt that just completed, starting at 1
+        :param response: Response of the attempt
+        :param exception: Exception raised by the attempt
+        """
+        if attempt >= self.max_attempts or not self.is_retryable_method(method):
+            return None
+        if exception is not None:
+            if not isinstance(exception, self.exceptions):
+                return None
+        elif response.status_code not in self.status_codes:
+            return None
+        return self.get_delay(attempt, response)
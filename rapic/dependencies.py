@@ -0,0 +1,158 @@
+"""
+Requests performed before a request to get the values it needs, described in the rapic json file
+
+    "implicit_requests": ["login"],
+    "login": {"path": "/login", "method": "POST", "outputs": {"token": "json.access_token"}, "output_ttl": 3600},
+    "get_me": {"path": "/me", "method": "GET", "do_implicit_requests": true,
+               "outputs": {"user_id": "json.id"}, "inputs": {"headers": {"Authorization": "Bearer {token}"}}},
+    "get_orders": {"path": "/users/{user_id}/orders", "method": "GET", "do_implicit_requests": true,
+                   "do_extra_requests": true, "extra_request_names": ["get_me"],
+                   "inputs": {"headers": {"Authorization": "Bearer {token}"}, "url_data": {"user_id": "{user_id}"}}}
+
+    api.get_orders() performs login, then get_me, then get_orders
+
+A request depends on the implicit requests of its page and client when do_implicit_requests is set and on its
+extra_request_names when do_extra_requests is set, both flags can also be given to perform_request. Dependencies
+have their own dependencies, requests that do not depend on each other are performed concurrently and a request
+needed by several others is performed once.
+outputs are json paths read from {"json": response body, "headers": response headers, "status_code": status}.
+inputs are perform_request arguments, "{name}" in their strings is replaced by the outputs of the requests the
+request depends on ("{name}" alone keeps the type of the output) and arguments given to the call replace them.
+Outputs of a request with an output_ttl (seconds, a client output_ttl is used for every request) are kept and
+reused by later calls until they expire. Dry runs prepare the request alone without its dependencies.
+"""
+import threading
+import time
+from rapic.exceptions import RapicException
+from rapic.tools import get_json_path
+
+# Maximum number of dependencies of a request performed at the same time
+DEPENDENCY_WORKERS = 8
+
+
+class RequestGraph:
+    """Requests a request depends on, dependencies come before the requests needing them in order"""
+
+    def __init__(self, request_name, dependencies, order):
+        self.request_name = request_name
+        self.dependencies = dependencies
+        self.order = order
+        self.ancestors = {}
+        for name in order:
+            ancestors = {}
+            for dependency in dependencies[name]:
+                ancestors.update(dict.fromkeys(self.ancestors[dependency]))
+                ancestors[dependency] = None
+            self.ancestors[name] = tuple(ancestors)
+
+    @classmethod
+    def build(cls, request_name, get_dependencies, do_extra_requests=None, do_implicit_requests=None):
+        """
+        Build the graph of a request from get_dependencies(name, do_extra_requests, do_implicit_requests), the flags
+        are only used for request_name, its dependencies use the flags of their definition
+        """
+        dependencies = {}
+        order = []
+        visiting = []
+
+        def visit(name, extra, implicit):
+            if name in dependencies:
+                return
+            if name in visiting:
+                cycle = visiting[visiting.index(name):] + [name]
+                raise RapicException('Requests depend on each other: %s' % ' -> '.join(cycle))
+            visiting.append(name)
+            names = get_dependencies(name, extra, implicit)
+            for dependency in names:
+                visit(dependency, None, None)
+            visiting.pop()
+            dependencies[name] = names
+            order.append(name)
+
+        visit(request_name, do_extra_requests, do_implicit_requests)
+        return cls(request_name, dependencies, order)
+
+    @property
+    def has_dependencies(self):
+        return len(self.order) > 1
+
+    def get_ready(self, done, started):
+        """Dependencies of the request not started yet whose own dependencies are done"""
+        return [name for name in self.order[:-1]
+                if name not in started and all(dependency in done for dependency in self.dependencies[name])]
+
+    def get_values(self, name, outputs):
+        """Outputs of every request name depends on, later requests replace values of earlier ones"""
+        values = {}
+        for ancestor in self.ancestors[name]:
+            values.update(outputs[ancestor])
+        return values
+
+
+def extract_outputs(response, outputs):
+    """Get the outputs of a request from its response, outputs is a dict of name -> json path"""
+    if not outputs:
+        return {}
+    try:
+        body = response.json()
+    except ValueError:
+        body = None
+    document = {'json': body, 'headers': response.headers, 'status_code': response.status_code}
+    return {name: get_json_path(document, path) for name, path in outputs.items()}
+
+
+def render_inputs(inputs, values, request_name=None):
+    """Replace {name} in the strings of inputs by values, a string that is only {name} is replaced by the value"""
+    if isinstance(inputs, dict):
+        return {key: render_inputs(value, values, request_name) for key, value in inputs.items()}
+    if isinstance(inputs, list):
+        return [render_inputs(value, values, request_name) for value in inputs]
+    if not isinstance(inputs, str) or '{' not in inputs:
+        return inputs
+    try:
+        if inputs.startswith('{') and inputs.endswith('}') and inputs[1:-1] in values:
+            return values[inputs[1:-1]]
+        return inputs.format_map(values)
+    except (KeyError, IndexError, ValueError) as e:
+        raise RapicException('Request %s inputs need output %s that no request it depends on has' % (request_name, e))
+
+
+def check_dependency_response(request_name, response):
+    if response.status_code >= 400:
+        raise RapicException('Dependency request %s failed with status %s' % (request_name, response.status_code))
+
+
+class OutputCache:
+    """Outputs of requests kept until their ttl expires, shared by every thread using the client"""
+
+    def __init__(self):
+        self.outputs = {}
+        self.locks = {}
+        self.lock = threading.Lock()
+
+    def get(self, request_name):
+        entry = self.outputs.get(request_name)
+        if entry is None:
+            return None
+        expires, outputs = entry
+        if expires <= time.monotonic():
+            self.outputs.pop(request_name, None)
+            return None
+        return outputs
+
+    def set(self, request_name, outputs, ttl):
+        self.outputs[request_name] = (time.monotonic() + ttl, outputs)
+
+    def get_lock(self, request_name):
+        """Lock held while a request is performed so threads needing its outputs together perform it once"""
+        lock = self.locks.get(request_name)
+        if lock is None:
+            with self.lock:
+                lock = self.locks.setdefault(request_name, threading.Lock())
+        return lock
+
+    def clear(self, request_name=None):
+        if request_name is None:
+            self.outputs.clear()
+        else:
+            self.outputs.pop(request_name, None)
@@ -1,3 +1,8 @@
+import inspect
+import time
+import weakref
+
+
 class APIClientHook:
     """Allow access to necessary requests data by giving a client the ability to hook
         request and response data before it is sent to or returned from a server.
@@ -9,8 +14,13 @@ class APIClientHook:
          POST_DATA_HOOK_TYPE : Body data as dict
          REQUESTS_OBJ_HOOK_TYPE : Python-Requests prepared request obj
          RESPONSE_OBJ_HOOK_TYPE : Python-Requests response obj
+         STREAM_RECORD_HOOK_TYPE : Every record decoded from a streamed response
     """
     HOOK_STORE = {}
+    # Clients whose hook dispatch tables must be rebuilt when hooks are registered
+    HOOK_CLIENTS = weakref.WeakSet()
+    # rapic.metrics.Metrics timing every hook function, hooks are not timed when it is None
+    metrics = None
 
     REQUEST_HOOK_TYPE = 1
     HEADER_HOOK_TYPE = 2
@@ -19,10 +29,14 @@ class APIClientHook:
     REQUESTS_OBJ_HOOK_TYPE = 5
     RESPONSE_OBJ_HOOK_TYPE = 6
     URL_QUERY_HOOK_TYPE = 7
+    STREAM_RECORD_HOOK_TYPE = 8
 
     def __init__(self, name, **kwargs):
 
         self.name = name
+        # request_name -> {hook_type: tuple of hook functions}
+        self.hook_dispatch = {}
+        APIClientHook.HOOK_CLIENTS.add(self)
 
     @classmethod
     def create_type_hooks_store(cls, hook_type):
@@ -59,6 +73,9 @@ class APIClientHook:
             return
         if exclude_requests is None:
             exclude_requests = []
+        elif not isinstance(exclude_requests, (list, tuple, set, frozenset)):
+            exclude_requests = [exclude_requests]
+        exclude_requests = frozenset(exclude_requests)
         if hook_type not in cls.HOOK_STORE:
             cls.create_type_hooks_store(hook_type)
         if client_name not in cls.HOOK_STORE[hook_type]:
@@ -73,6 +90,8 @@ class APIClientHook:
                 cls.HOOK_STORE[hook_type][client_name][request] = [(func, exclude_requests)]
             else:
                 cls.HOOK_STORE[hook_type][client_name][request].append((func, exclude_requests))
+        for client in list(cls.HOOK_CLIENTS):
+            client.hook_dispatch.clear()
 
         def action_arg(*args, **kwargs):
             func(*args, **kwargs)
@@ -111,6 +130,22 @@ class APIClientHook:
 
         return request_func
 
+    @classmethod
+    def hook_client_stream_record(cls, client, requests, exclude_requests=None):
+        """
+        This gives the ability to hook every record decoded from a streamed response (stream=True) one at a time,
+        the hook must return the record or None to drop it
+        :param client: the client to perform the hook for
+        :param requests: list of request
+        :return: decorated func
+        """
+
+        def request_func(func):
+            cls.register_client_hooks(hook_type=cls.STREAM_RECORD_HOOK_TYPE, requests=requests, client_name=client,
+                                      func=func, exclude_requests=exclude_requests)
+
+        return request_func
+
     @classmethod
     def hook_client_request_data(cls, client, requests, exclude_requests=None):
         """
@@ -194,6 +229,44 @@ class APIClientHook:
 
         return req_func
 
+    def _get_hook_funcs(self, request_name, hook_type):
+        """
+        Get the functions registered by this client for hook_type that should run for request_name
+        :param request_name:  the current request_name hook is running for
+        :param hook_type: The hook type store
+        :return: tuple of hook functions in the order they were registered
+        """
+        dispatch = self.hook_dispatch.get(request_name)
+        if dispatch is None:
+            dispatch = self._build_hook_dispatch(request_name)
+        return dispatch.get(hook_type, ())
+
+    def _build_hook_dispatch(self, request_name):
+        """
+        Find the hook functions of every hook type for a request once, hooks registered for request_name
+        are used instead of the ones registered for all requests with '*'
+        :return: dict of hook_type to tuple of hook functions, hook types without functions are left out
+        """
+        dispatch = {}
+        for hook_type, client_stores in self.HOOK_STORE.items():
+            hook_type_store = client_stores.get(self.name)
+            if not hook_type_store:
+                continue
+            hook_funcs = hook_type_store.get(request_name, None) or hook_type_store.get('*')
+            if not hook_funcs:
+                continue
+            funcs = []
+            for func, excluded_requests in hook_funcs:
+                if request_name in excluded_requests:
+                    continue
+                elif '*' in excluded_requests and request_name not in hook_type_store:
+                    continue
+                funcs.append(func)
+            if funcs:
+                dispatch[hook_type] = tuple(funcs)
+        self.hook_dispatch[request_name] = dispatch
+        return dispatch
+
     def _run_hook_func(self, request_name, data, hook_type):
         """
         All hooks are registered from child  api client in format
@@ -203,18 +276,33 @@ class APIClientHook:
         :param data: data that will be sent for hooking [headers,post data, url data, req obj, resp obj]
         :return: reformed data sent back
         """
-
-        if hook_type not in self.HOOK_STORE or self.name not in self.HOOK_STORE[hook_type]:
-            return data
-        hook_type_store = self.HOOK_STORE[hook_type][self.name]
-
-        if request_name not in hook_type_store and '*' not in hook_type_store:
+        dispatch = self.hook_dispatch.get(request_name)
+        if dispatch is None:
+            dispatch = self._build_hook_dispatch(request_name)
+        funcs = dispatch.get(hook_type)
+        if not funcs:
             return data
-        hook_funcs = hook_type_store.get(request_name, None) or hook_type_store.get('*')
-        for func, excluded_requests in hook_funcs:
-            if request_name in excluded_requests:
-                continue
-            elif '*' in excluded_requests and request_name not in hook_type_store:
-                continue
+        if self.metrics is not None:
+            return self.metrics.run_hooks(self, funcs, request_name, data, hook_type)
+        for func in funcs:
             data = func(self,  data, request_name=request_name, client_name=self.name, hook_type=hook_type)
         return data
+
+    async def _arun_hook_func(self, request_name, data, hook_type):
+        """
+        Same as _run_hook_func but for asyncio clients, hooks can either be normal functions
+        or coroutine functions (async def) which will be awaited
+        :param request_name:  the current request_name hook is running for
+        :param data: data that will be sent for hooking [headers,post data, url data, req obj, resp obj]
+        :return: reformed data sent back
+        """
+        metrics = self.metrics
+        trace = metrics.get_trace() if metrics is not None else None
+        for func in self._get_hook_funcs(request_name, hook_type):
+            started = time.perf_counter()
+            data = func(self, data, request_name=request_name, client_name=self.name, hook_type=hook_type)
+            if inspect.isawaitable(data):
+                data = await data
+            if metrics is not None:
+                metrics.record_hook(trace, self.name, request_name, hook_type, func, started)
+        return data
@@ -0,0 +1,88 @@
+from collections.abc import Mapping
+from rapic.tools import is_request_data
+from rapic.tools.compiled import CompiledContainer
+
+
+class RequestIndex:
+    """
+    Index of the requests of a client by name built once when the client is loaded: name -> page (None for requests
+    at the top of the client). Looking up a request is a dict access whatever the number of pages and names that do not
+    exist are rejected without scanning pages. Definitions are read from their page when they are looked up so
+    requests replaced in the client are used, compiled clients are indexed from their header index without
+    decoding any request.
+
+    A name found in more than one place keeps the first definition in lookup order (top of the client then pages in
+    order) and every place it was found is listed in duplicates.
+    """
+
+    def __init__(self, client):
+        self.pages = client.get('pages', [])
+        self.pages_number = len(self.pages)
+        self.requests = {}
+        self.duplicates = {}
+        self.add_requests(client, None)
+        for page in self.pages:
+            if page in client:
+                self.add_requests(client[page], page)
+
+    def add_requests(self, container, page):
+        if isinstance(container, CompiledContainer):
+            names = list(container.index)
+        else:
+            names = [name for name, value in container.items() if is_request_data(value)]
+        for name in names:
+            if name not in self.requests:
+                self.requests[name] = page
+            elif name in self.duplicates:
+                self.duplicates[name].append(page)
+            else:
+                self.duplicates[name] = [self.requests[name], page]
+
+    def get(self, client, request_name):
+        """Get (page, request definition) of a request or None when it is not in the index"""
+        if request_name not in self.requests:
+            return None
+        page = self.requests[request_name]
+        container = client if page is None else client[page]
+        return page, container[request_name]
+
+    def is_stale(self, client):
+        """Check if pages were added to the client after it was indexed"""
+        pages = client.get('pages', [])
+        return pages is not self.pages or len(pages) != self.pages_number
+
+    def __contains__(self, request_name):
+        return request_name in self.requests
+
+    def __iter__(self):
+        return iter(self.requests)
+
+    def __len__(self):
+        return len(self.requests)
+
+
+class RequestsView(Mapping):
+    """
+    Read only dict of the requests of a client by name built from its index, a request is only looked up, and
+    decoded for compiled clients, when it is accessed
+    """
+
+    def __init__(self, api_client):
+        self.api_client = api_client
+
+    def __getitem__(self, request_name):
+        if request_name not in self.api_client.request_index:
+            raise KeyError(request_name)
+        return self.api_client.find_request_data(request_name)
+
+    def __iter__(self):
+        return iter(self.api_client.request_index)
+
+    def __len__(self):
+        return len(self.api_client.request_index)
+
+    def __contains__(self, request_name):
+        return request_name in self.api_client.request_index
+
+    def __repr__(self):
+        return '<RequestsView %s>' % list(self)
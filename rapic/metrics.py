@@ -0,0 +1,393 @@
+"""
+Time every stage of rapic requests and every hook function, per client and request name.
+
+    from rapic.metrics import Metrics, OTLPSpanExporter
+    api = APIClient('httpbin', 'httpbin.json', metrics=Metrics(exporter=OTLPSpanExporter()))
+    api.get_my_ip()
+    api.metrics.registry.get('rapic_stage_seconds', client='httpbin', request='get_my_ip', stage='network').count
+    print(api.metrics.to_prometheus())
+
+Stages are timed without the hooks that run inside them, hooks are timed on their own in rapic_hook_seconds
+and their total per request is the hooks stage. Clients without metrics do not time anything.
+"""
+import bisect
+import contextvars
+import os
+import queue
+import threading
+import time
+import requests
+
+DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+STAGE_METRIC = 'rapic_stage_seconds'
+HOOK_METRIC = 'rapic_hook_seconds'
+METRIC_HELP = {
+    STAGE_METRIC: 'Time spent in every stage of rapic requests without the hooks run inside them',
+    HOOK_METRIC: 'Time spent in every rapic hook function',
+}
+HOOK_TYPE_NAMES = {1: 'request', 2: 'header', 3: 'url', 4: 'post_data', 5: 'prepared_request', 6: 'response',
+                   7: 'url_query', 8: 'stream_record'}
+
+# Queued after the spans to send by OTLPSpanExporter.close to stop its background thread
+STOP_EXPORT = object()
+# Trace of the request being performed in the current thread or asyncio task
+CURRENT_TRACE = contextvars.ContextVar('rapic_current_trace', default=None)
+
+
+def get_hook_name(func):
+    return '%s.%s' % (getattr(func, '__module__', ''), getattr(func, '__qualname__', repr(func)))
+
+
+class Histogram:
+    """Thread safe histogram of observed values with cumulative buckets like Prometheus histograms"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def get_buckets(self):
+        """[(upper bound, number of values lower or equal)], the last bound is inf"""
+        cumulative = 0
+        buckets = []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            cumulative += count
+            buckets.append((bound, cumulative))
+        return buckets
+
+    def quantile(self, q):
+        """Estimate the q quantile (0.99 for p99) with the upper bound of the bucket it falls in"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, cumulative in self.get_buckets():
+            if cumulative >= rank:
+                return bound if bound != float('inf') else self.buckets[-1]
+
+    def as_dict(self):
+        return {'count': self.count, 'sum': self.sum, 'p50': self.quantile(0.5), 'p99': self.quantile(0.99)}
+
+
+class MetricsRegistry:
+    """In process store of histograms by metric name and labels"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.histograms = {}
+        self.lock = threading.Lock()
+
+    def histogram(self, name, labels):
+        """
+        :param labels: tuple of (label, value) e.g (('client', 'httpbin'), ('stage', 'network'))
+        """
+        key = (name, labels)
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            with self.lock:
+                histogram = self.histograms.setdefault(key, Histogram(self.buckets))
+        return histogram
+
+    def observe(self, name, value, labels):
+        self.histogram(name, labels).observe(value)
+
+    def get(self, name, **labels):
+        """Get a histogram by name and all its labels or None when nothing was observed for it"""
+        for (histogram_name, histogram_labels), histogram in list(self.histograms.items()):
+            if histogram_name == name and dict(histogram_labels) == labels:
+                return histogram
+        return None
+
+    def collect(self, name=None):
+        """Yield (metric name, labels dict, histogram) sorted by name and labels"""
+        for (histogram_name, labels), histogram in sorted(self.histograms.items(), key=lambda item: item[0]):
+            if name is None or histogram_name == name:
+                yield histogram_name, dict(labels), histogram
+
+    def to_prometheus(self):
+        """All histograms in Prometheus text exposition format"""
+        lines = []
+        current = None
+        for name, labels, histogram in self.collect():
+            if name != current:
+                current = name
+                lines.append('# HELP %s %s' % (name, METRIC_HELP.get(name, name)))
+                lines.append('# TYPE %s histogram' % name)
+            label_text = ','.join('%s="%s"' % (key, escape_label(value)) for key, value in labels.items())
+            for bound, cumulative in histogram.get_buckets():
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append('%s_bucket{%s,le="%s"} %s' % (name, label_text, le, cumulative))
+            lines.append('%s_sum{%s} %r' % (name, label_text, histogram.sum))
+            lines.append('%s_count{%s} %s' % (name, label_text, histogram.count))
+        return '\n'.join(lines) + '\n'
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Span:
+    """A timed operation of a request trace, times are unix epoch nanoseconds"""
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start_ns', 'end_ns', 'attributes', 'error')
+
+    def __init__(self, name, trace_id, parent_id, start_ns, end_ns, attributes=None, error=None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = start_ns
+        self.end_ns = end_ns
+        self.attributes = attributes or {}
+        self.error = error
+
+    def to_otlp(self):
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 3 if self.parent_id is None else 1,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': [{'key': key, 'value': {'stringValue': str(value)}}
+                           for key, value in self.attributes.items()],
+            'status': {'code': 2, 'message': self.error} if self.error else {'code': 1},
+        }
+        if self.parent_id is not None:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+
+class Trace:
+    """
+    Timings of one request, stages are marked in the order they complete so a stage lasts from the previous
+    mark to its own minus the time spent in hooks in between
+    """
+
+    def __init__(self, metrics, client_name, request_name):
+        self.metrics = metrics
+        self.labels = (('client', client_name), ('request', request_name))
+        self.start = self.last = time.perf_counter()
+        self.start_ns = time.time_ns()
+        self.hooks_time = 0.0
+        self.total_hooks_time = 0.0
+        self.spans = [] if metrics.exporter is not None else None
+        self.trace_id = os.urandom(16).hex() if self.spans is not None else None
+        self.token = CURRENT_TRACE.set(self)
+
+    def get_ns(self, perf_time):
+        return self.start_ns + int((perf_time - self.start) * 1e9)
+
+    def add_span(self, name, started, ended, **attributes):
+        self.spans.append(Span(name, self.trace_id, None, self.get_ns(started), self.get_ns(ended),
+                               dict(self.labels, **attributes)))
+
+    def mark(self, stage):
+        now = time.perf_counter()
+        elapsed = now - self.last - self.hooks_time
+        self.metrics.registry.observe(STAGE_METRIC, elapsed, self.labels + (('stage', stage),))
+        if self.spans is not None:
+            self.add_span('rapic.%s' % stage, self.last, now, stage=stage)
+        self.last = now
+        self.hooks_time = 0.0
+
+    def record_hook(self, hook_type, func, started, ended):
+        elapsed = ended - started
+        self.hooks_time += elapsed
+        self.total_hooks_time += elapsed
+        hook_type_name = HOOK_TYPE_NAMES.get(hook_type, str(hook_type))
+        hook_name = get_hook_name(func)
+        self.metrics.registry.observe(HOOK_METRIC, elapsed,
+                                      self.labels + (('hook_type', hook_type_name), ('hook', hook_name)))
+        if self.spans is not None:
+            self.add_span('rapic.hook', started, ended, hook_type=hook_type_name, hook=hook_name)
+
+    def finish(self, error=None):
+        CURRENT_TRACE.reset(self.token)
+        now = time.perf_counter()
+        registry = self.metrics.registry
+        registry.observe(STAGE_METRIC, self.total_hooks_time, self.labels + (('stage', 'hooks'),))
+        registry.observe(STAGE_METRIC, now - self.start, self.labels + (('stage', 'total'),))
+        if self.spans is not None:
+            root = Span('rapic.request', self.trace_id, None, self.start_ns, self.get_ns(now), dict(self.labels),
+                        error=repr(error) if error is not None else None)
+            for span in self.spans:
+                span.parent_id = root.span_id
+            self.metrics.exporter.export([root] + self.spans)
+
+
+class Metrics:
+    """
+    Instrumentation of a client, pass it to the client as metrics
+    :param registry: MetricsRegistry where timings are stored, a new one by default
+    :param exporter: Span exporter called with the spans of every request e.g OTLPSpanExporter
+    """
+
+    def __init__(self, registry=None, exporter=None):
+        self.registry = registry or MetricsRegistry()
+        self.exporter = exporter
+
+    def start_trace(self, client_name, request_name):
+        return Trace(self, client_name, request_name)
+
+    @staticmethod
+    def get_trace():
+        """Trace of the request being performed in the current thread or asyncio task"""
+        return CURRENT_TRACE.get()
+
+    def run_hooks(self, client, funcs, request_name, data, hook_type):
+        """Run hook functions like APIClientHook._run_hook_func and time each of them"""
+        trace = CURRENT_TRACE.get()
+        for func in funcs:
+            started = time.perf_counter()
+            data = func(client, data, request_name=request_name, client_name=client.name, hook_type=hook_type)
+            self.record_hook(trace, client.name, request_name, hook_type, func, started)
+        return data
+
+    def record_hook(self, trace, client_name, request_name, hook_type, func, started):
+        ended = time.perf_counter()
+        if trace is not None:
+            trace.record_hook(hook_type, func, started, ended)
+        else:
+            # Hooks run outside execute_request e.g by a user calling build_request_data
+            labels = (('client', client_name), ('request', request_name),
+                      ('hook_type', HOOK_TYPE_NAMES.get(hook_type, str(hook_type))), ('hook', get_hook_name(func)))
+            self.registry.observe(HOOK_METRIC, ended - started, labels)
+
+    def mark(self, stage):
+        """Mark the end of a stage of the request being performed in the current context"""
+        trace = CURRENT_TRACE.get()
+        if trace is not None:
+            trace.mark(stage)
+
+    def to_prometheus(self):
+        return self.registry.to_prometheus()
+
+    def __deepcopy__(self, memo):
+        # Copies of a client record their timings in the same registry
+        return self
+
+
+class InMemorySpanExporter:
+    """Keep exported spans in a list, used for tests and debugging"""
+
+    def __init__(self):
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def export(self, spans):
+        with self.lock:
+            self.spans.extend(spans)
+
+    def close(self):
+        pass
+
+
+class OTLPSpanExporter:
+    """
+    Send spans in batches to an OpenTelemetry collector with OTLP/HTTP json from a background thread so requests
+    never wait for the collector. Spans are queued and sent once batch_size are queued or schedule_delay seconds
+    after the first span of the batch, spans that do not fit in the queue or cannot be sent are dropped and counted
+    in dropped so metrics never fail requests
+    :param endpoint: Collector traces url
+    :param batch_size: Number of spans sent at once, call flush or close to send the queued ones
+    :param max_queue_size: Number of spans waiting to be sent before new spans are dropped
+    :param schedule_delay: Seconds spans wait at most in the queue
+    """
+
+    def __init__(self, endpoint='http://localhost:4318/v1/traces', service_name='rapic', batch_size=100, timeout=2,
+                 max_queue_size=2048, schedule_delay=5):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.schedule_delay = schedule_delay
+        self.session = requests.Session()
+        self.queue = queue.Queue(max_queue_size)
+        self.dropped = 0
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def start(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='rapic-otlp-exporter', daemon=True)
+                self.thread.start()
+
+    def export(self, spans):
+        if self.thread is None:
+            self.start()
+        for span in spans:
+            try:
+                self.queue.put_nowait(span)
+            except queue.Full:
+                self.count_dropped(1)
+
+    def run(self):
+        """Send queued spans until close, flush and close requests are events and STOP_EXPORT markers in the queue"""
+        batch = []
+        # The batch is sent schedule_delay seconds after its first span whatever the rate spans are queued at
+        deadline = None
+        while True:
+            try:
+                if deadline is None:
+                    item = self.queue.get()
+                else:
+                    item = self.queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                item = None
+            if isinstance(item, Span):
+                batch.append(item)
+                if deadline is None:
+                    deadline = time.monotonic() + self.schedule_delay
+                if len(batch) < self.batch_size and time.monotonic() < deadline:
+                    continue
+            if batch:
+                self.send(batch)
+                batch, deadline = [], None
+            if isinstance(item, threading.Event):
+                item.set()
+            elif item is STOP_EXPORT:
+                return
+
+    def flush(self):
+        """Wait until the spans queued before the call are sent"""
+        if self.thread is None:
+            return
+        flushed = threading.Event()
+        self.queue.put(flushed)
+        flushed.wait()
+
+    def count_dropped(self, number):
+        with self.lock:
+            self.dropped += number
+
+    def get_payload(self, spans):
+        return {'resourceSpans': [{
+            'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': self.service_name}}]},
+            'scopeSpans': [{'scope': {'name': 'rapic'}, 'spans': [span.to_otlp() for span in spans]}],
+        }]}
+
+    def send(self, spans):
+        # Any error drops the batch instead of stopping the thread, flush would wait for it forever
+        try:
+            self.session.post(self.endpoint, json=self.get_payload(spans), timeout=self.timeout).raise_for_status()
+        except Exception:
+            self.count_dropped(len(spans))
+
+    def close(self):
+        """Send the queued spans and stop the background thread"""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is not None:
+            self.queue.put(STOP_EXPORT)
+            thread.join()
+        self.session.close()
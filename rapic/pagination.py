@@ -0,0 +1,187 @@
+"""
+Pagination of list requests described by a pagination block in the rapic json file
+
+    "list_users": {"path": "/users", "method": "GET",
+                   "pagination": {"type": "cursor", "items": "data.users", "next": "meta.next_cursor", "param": "cursor"}}
+
+    for user in api.iterate('list_users'):
+        ...
+
+type is one of:
+    cursor: the next page token is read from the response at the next path and sent as param
+    offset: param (offset) grows by limit sent as limit_param (limit), it stops on a short page or at the total path
+    page: param (page) grows by one from start (1), it stops on an empty page, a page shorter than limit or after
+          the last page given by the total_pages path or the total (number of items) path
+    link: the next page query is read from the Link response header
+Every type reads the page items at the items path (the whole response when it is not set) and stops on an
+empty page. Values are sent in url_query unless "in" is "data". max_pages and prefetch (number of pages fetched
+ahead while the current one is consumed, 1 by default) can be set in the block or given to iterate. Only pages a
+response shows to exist are fetched ahead: the next page, and with offset and page pagination every page before the
+total, so no page past the last one is ever requested.
+"""
+import math
+from abc import ABCMeta, abstractmethod
+from urllib.parse import urlparse, parse_qsl
+from rapic.exceptions import RapicException
+from rapic.tools import get_json_path
+
+
+class Paginator(metaclass=ABCMeta):
+    """Get the items of a page and the arguments of the call for the next page"""
+
+    def __init__(self, config):
+        self.items_path = config.get('items')
+        self.location = config.get('in', 'url_query')
+        self.param = config.get('param')
+        self.max_pages = config.get('max_pages')
+        self.prefetch = config.get('prefetch', 1)
+
+    def get_items(self, response):
+        data = response.json()
+        items = get_json_path(data, self.items_path) if self.items_path else data
+        return items if isinstance(items, list) else []
+
+    def set_values(self, call_kwargs, **values):
+        """Copy of call kwargs with values added to the url query or body data of the call"""
+        call_kwargs = dict(call_kwargs)
+        call_kwargs[self.location] = dict(call_kwargs.get(self.location) or {}, **values)
+        return call_kwargs
+
+    def first_call(self, call_kwargs):
+        return call_kwargs
+
+    @abstractmethod
+    def next_call(self, call_kwargs, response, items):
+        """Arguments of the call for the next page or None when this page is the last one"""
+
+    def predict_call(self, call_kwargs, response):
+        """
+        Arguments of the call for the page after call_kwargs one when response, of an earlier page, shows that it
+        exists so it can be requested before the page of call_kwargs is received. None when it is not known
+        """
+        return None
+
+    @staticmethod
+    def get_total(response, path):
+        total = get_json_path(response.json(), path) if path else None
+        return int(total) if total is not None else None
+
+
+class CursorPaginator(Paginator):
+
+    def __init__(self, config):
+        super(CursorPaginator, self).__init__(config)
+        self.param = self.param or 'cursor'
+        self.next_path = config.get('next')
+        if not self.next_path:
+            raise RapicException('Cursor pagination requires the next cursor json path in next')
+
+    def next_call(self, call_kwargs, response, items):
+        cursor = get_json_path(response.json(), self.next_path)
+        if not items or cursor in (None, ''):
+            return None
+        return self.set_values(call_kwargs, **{self.param: cursor})
+
+
+class OffsetPaginator(Paginator):
+
+    def __init__(self, config):
+        super(OffsetPaginator, self).__init__(config)
+        self.param = self.param or 'offset'
+        self.limit_param = config.get('limit_param', 'limit')
+        self.limit = config.get('limit', 100)
+        self.start = config.get('start', 0)
+        self.total_path = config.get('total')
+
+    def first_call(self, call_kwargs):
+        return self.set_values(call_kwargs, **{self.param: self.start, self.limit_param: self.limit})
+
+    def get_following_call(self, call_kwargs, response):
+        """Call of the page after call_kwargs one, None when it starts at or after the total of response"""
+        offset = call_kwargs[self.location][self.param] + self.limit
+        total = self.get_total(response, self.total_path)
+        if total is not None and offset >= total:
+            return None
+        return self.set_values(call_kwargs, **{self.param: offset})
+
+    def predict_call(self, call_kwargs, response):
+        if self.get_total(response, self.total_path) is None:
+            return None
+        return self.get_following_call(call_kwargs, response)
+
+    def next_call(self, call_kwargs, response, items):
+        if len(items) < self.limit:
+            return None
+        return self.get_following_call(call_kwargs, response)
+
+
+class PagePaginator(Paginator):
+
+    def __init__(self, config):
+        super(PagePaginator, self).__init__(config)
+        self.param = self.param or 'page'
+        self.start = config.get('start', 1)
+        self.limit_param = config.get('limit_param')
+        self.limit = config.get('limit')
+        self.total_pages_path = config.get('total_pages')
+        self.total_path = config.get('total') if self.limit else None
+
+    def first_call(self, call_kwargs):
+        values = {self.param: self.start}
+        if self.limit_param and self.limit:
+            values[self.limit_param] = self.limit
+        return self.set_values(call_kwargs, **values)
+
+    def get_last_page(self, response):
+        """Number of the last page from the total pages or total items of response, None when it is not known"""
+        total_pages = self.get_total(response, self.total_pages_path)
+        if total_pages is None:
+            total = self.get_total(response, self.total_path)
+            if total is None:
+                return None
+            total_pages = math.ceil(total / self.limit)
+        return self.start + total_pages - 1
+
+    def predict_call(self, call_kwargs, response):
+        page = call_kwargs[self.location][self.param] + 1
+        last_page = self.get_last_page(response)
+        if last_page is None or page > last_page:
+            return None
+        return self.set_values(call_kwargs, **{self.param: page})
+
+    def next_call(self, call_kwargs, response, items):
+        if not items or (self.limit and len(items) < self.limit):
+            return None
+        page = call_kwargs[self.location][self.param] + 1
+        last_page = self.get_last_page(response)
+        if last_page is not None and page > last_page:
+            return None
+        return self.set_values(call_kwargs, **{self.param: page})
+
+
+class LinkPaginator(Paginator):
+    """Follow the next url of the Link header, its query args replace the url query of the call"""
+
+    def next_call(self, call_kwargs, response, items):
+        next_url = response.links.get('next', {}).get('url')
+        if not items or not next_url:
+            return None
+        call_kwargs = dict(call_kwargs)
+        call_kwargs['url_query'] = dict(call_kwargs.get('url_query') or {},
+                                        **dict(parse_qsl(urlparse(next_url).query, keep_blank_values=True)))
+        return call_kwargs
+
+
+PAGINATORS = {
+    'cursor': CursorPaginator,
+    'offset': OffsetPaginator,
+    'page': PagePaginator,
+    'link': LinkPaginator,
+}
+
+
+def get_paginator(config):
+    paginator_class = PAGINATORS.get(config.get('type'))
+    if paginator_class is None:
+        raise RapicException('Unknown pagination type %s, use one of %s' % (config.get('type'), ', '.join(PAGINATORS)))
+    return paginator_class(config)
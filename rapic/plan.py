@@ -0,0 +1,143 @@
+import copy
+from urllib.parse import urlencode, urlunparse
+from rapic.connection.request import RapicRequestClient
+from rapic.exceptions import RapicException
+from rapic.tools import dict_merge
+
+# Request keys merged with client defaults once by the plan and rebuilt for every call by build_request_data
+PLANNED_KEYS = ('headers', 'url_query', 'data')
+# Request keys shared by every call instead of copied, protobuf typedefs are compiled once for their object,
+# extract paths and saved url data are read only
+SHARED_KEYS = ('typedef', 'response_typedef', 'extract', 'url_data')
+
+
+def has_nested_values(value):
+    """Check if a shallow copy of value would still share mutable data"""
+    if isinstance(value, dict):
+        return any(isinstance(v, (dict, list)) for v in value.values())
+    return isinstance(value, list)
+
+
+class PlannedRequestData(dict):
+    """Request data created from a RequestPlan, build_request_data uses the plan's pre-merged
+        headers, url query and body data instead of merging client defaults again
+    """
+
+    def __init__(self, plan, *args, **kwargs):
+        super(PlannedRequestData, self).__init__(*args, **kwargs)
+        self.plan = plan
+
+    def __copy__(self):
+        return PlannedRequestData(self.plan, self)
+
+    def __deepcopy__(self, memo):
+        return PlannedRequestData(self.plan, copy.deepcopy(dict(self), memo))
+
+
+class RequestPlan:
+    """
+    A request from the rapic json file compiled once with everything that does not change between calls:
+    client default headers, url query and body data merged with the request ones, cleaned headers and
+    the url without its query part and the rate limits of the client, page and request.
+    Every call only overlays user supplied values on copies of the plan so hooks can never change
+    the stored request definition.
+    """
+
+    __slots__ = ('request_name', 'request', 'headers', 'url_query', 'data', 'url', 'url_fragment',
+                 'is_full_url', 'copy_keys', 'nested_url_query', 'nested_data', 'page', 'rate_limits',
+                 'rate_limit_buckets', 'retry_policy')
+
+    def __init__(self, client, request_name, request, page=None, rate_limit=None):
+        self.request_name = request_name
+        self.request = request
+        self.page = page
+        self.rate_limits = self.get_rate_limits(client, rate_limit)
+        self.rate_limit_buckets = ()
+        self.retry_policy = None
+
+        headers = dict_merge(client.get('default_headers', {}), request.get('headers', {}))
+        self.headers = RapicRequestClient.clean_headers(headers)
+        self.url_query = dict_merge(client.get('default_url_query', {}), request.get('url_query', {}))
+        self.nested_url_query = has_nested_values(self.url_query)
+        request_body = request.get('data', {})
+        if isinstance(request_body, dict):
+            self.data = dict_merge(client.get('default_data', {}), request_body)
+        else:
+            self.data = request_body
+        self.nested_data = has_nested_values(self.data)
+
+        self.url_fragment = ''
+        self.is_full_url = bool(request.get('url'))
+        if self.is_full_url:
+            self.url = request['url']
+        else:
+            host = request.get('host') or client.get('host')
+            scheme = request.get('scheme') or client.get('scheme')
+            params = request.get('url_params') or client.get('default_url_params', '')
+            fragment = request.get('url_fragment') or client.get('default_url_fragment', '')
+            if not scheme or not host:
+                raise RapicException('Missing host or scheme value for request ', request_data=request)
+            self.url = urlunparse((scheme, host, request['path'], urlencode(params), '', ''))
+            if fragment:
+                self.url_fragment = '#' + fragment
+        self.copy_keys = frozenset(key for key, value in request.items()
+                                   if key not in PLANNED_KEYS and key not in SHARED_KEYS
+                                   and isinstance(value, (dict, list)))
+
+    def get_rate_limits(self, client, rate_limit=None):
+        """
+        Rate limits applying to the request as (bucket key, {'rps': 5, 'burst': 10}) from the client to the request
+        :param rate_limit: Client rate limit used instead of the json file one
+        """
+        rate_limits = []
+        rate_limit = rate_limit or client.get('rate_limit')
+        if rate_limit:
+            rate_limits.append((('client',), rate_limit))
+        if self.page is not None:
+            page_rate_limit = client[self.page].get('rate_limit')
+            if page_rate_limit:
+                rate_limits.append((('page', self.page), page_rate_limit))
+        if self.request.get('rate_limit'):
+            rate_limits.append((('request', self.request_name), self.request['rate_limit']))
+        return rate_limits
+
+    def new_request_data(self):
+        """
+        Get a copy of the request that can be changed by hooks. Headers, url query and body data are
+        added by build_request_data from the plan, so changes to them must be done through execute_request
+        arguments or hooks
+        """
+        copy_keys = self.copy_keys
+        return PlannedRequestData(self, {key: copy.deepcopy(value) if key in copy_keys else value
+                                         for key, value in self.request.items() if key not in PLANNED_KEYS})
+
+    def get_headers(self, user_headers):
+        if user_headers:
+            return dict_merge(self.headers, user_headers)
+        return self.headers.copy()
+
+    def get_url_query(self, user_url_query):
+        url_query = copy.deepcopy(self.url_query) if self.nested_url_query else self.url_query
+        if user_url_query:
+            return dict_merge(url_query, user_url_query)
+        return url_query.copy()
+
+    def get_body_data(self, user_body_data):
+        if user_body_data and not isinstance(user_body_data, dict):
+            # If user passed data and its not a dict it means user wants to replace all data totally
+            return user_body_data
+        if not isinstance(self.data, dict):
+            return self.data
+        data = copy.deepcopy(self.data) if self.nested_data else self.data
+        if user_body_data:
+            return dict_merge(data, user_body_data)
+        return data.copy()
+
+    def get_url(self, url_query):
+        """Url without the formatted url data, the query is not added when a full url is saved for the request"""
+        if self.is_full_url:
+            return self.url
+        query = urlencode(url_query)
+        if query:
+            return self.url + '?' + query + self.url_fragment
+        return self.url + self.url_fragment
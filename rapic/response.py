@@ -0,0 +1,138 @@
+"""
+Responses returned by rapic clients. Their body views are decoded the first time they are used and the result is
+kept, so response hooks, pagination, dependency outputs and the caller share a single parse of the body
+
+    response.json()      # parsed once, with orjson or ujson when one is installed
+    response.text
+    response.proto       # protobuf body decoded with the request response_typedef or typedef
+    response.extracted   # values at the "extract" json paths of the request
+
+    "get_feed": {"path": "/feed", "method": "GET", "extract": {"next": "meta.next_cursor", "ids": "items[*].id"}}
+"""
+import json
+import requests
+from rapic.tools import extract_json_path
+from rapic.tools.proto import EMPTY_TYPEDEF, compile_typedef, is_protobuf_response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import ujson
+except ImportError:  # pragma: no cover
+    ujson = None
+
+# Bodies in these encodings are given as bytes to the json backend, others are decoded by Python-Requests first
+JSON_BYTES_ENCODINGS = (None, 'utf-8', 'utf8')
+
+
+def get_json_backend():
+    """Name and loads function of the fastest json library installed, orjson then ujson then json"""
+    if orjson is not None:
+        return 'orjson', orjson.loads
+    if ujson is not None:
+        return 'ujson', ujson.loads
+    return 'json', json.loads
+
+
+JSON_BACKEND, json_loads = get_json_backend()
+
+
+class RapicResponse(requests.Response):
+    """
+    Python-Requests response with lazily decoded and cached json, text, proto and extracted views.
+    Values returned by the views are shared, a hook changing them changes them for the next users of the response
+    """
+
+    __attrs__ = requests.Response.__attrs__ + ['rapic_typedef', 'rapic_extract']
+
+    def __init__(self):
+        super(RapicResponse, self).__init__()
+        self.rapic_typedef = None
+        self.rapic_extract = None
+        self._rapic_views = {}
+
+    @classmethod
+    def from_response(cls, response, typedef=None, extract=None):
+        """
+        Get a RapicResponse sharing the state of a Python-Requests response, the response itself is not changed as
+        it can be kept by the response cache
+        :param typedef: Protobuf typedef the proto view is decoded with
+        :param extract: Dict of name: json path of the extracted view
+        """
+        new = cls.__new__(cls)
+        new.__dict__.update(response.__dict__)
+        new.rapic_typedef = typedef
+        new.rapic_extract = extract
+        new._rapic_views = {}
+        return new
+
+    def __setstate__(self, state):
+        super(RapicResponse, self).__setstate__(state)
+        self.rapic_typedef = state.get('rapic_typedef')
+        self.rapic_extract = state.get('rapic_extract')
+        self._rapic_views = {}
+
+    def get_view(self, name, decode):
+        views = self._rapic_views
+        if name not in views:
+            views[name] = decode()
+        return views[name]
+
+    def json(self, **kwargs):
+        """Parsed json body, kept once parsed. kwargs are passed to json.loads and the result is not kept"""
+        if kwargs:
+            return super(RapicResponse, self).json(**kwargs)
+        return self.get_view('json', self.decode_json)
+
+    def decode_json(self):
+        if self.encoding is None or self.encoding.lower() in JSON_BYTES_ENCODINGS:
+            try:
+                return json_loads(self.content)
+            except ValueError:
+                pass
+        # Python-Requests detects the encoding and raises its own JSONDecodeError
+        return super(RapicResponse, self).json()
+
+    @property
+    def text(self):
+        """Body decoded with the response encoding, kept until the encoding is changed"""
+        return self.get_view(('text', self.encoding), lambda: super(RapicResponse, self).text)
+
+    @property
+    def proto(self):
+        """Protobuf body decoded with the request typedef, None when it is not protobuf or can not be decoded"""
+        return self.get_view('proto', self.decode_proto)
+
+    # Name of the proto view before responses were decoded lazily
+    rapic_proto = proto
+
+    def decode_proto(self):
+        if not is_protobuf_response(self):
+            return None
+        try:
+            return compile_typedef(self.rapic_typedef or EMPTY_TYPEDEF).decode(self.content)
+        except Exception:
+            return None
+
+    @property
+    def extracted(self):
+        """
+        Values at the json paths of the request "extract" dict, from the proto view of protobuf responses.
+        * matches every key or list item, missing values are None like every value of a body that is not json
+        """
+        return self.get_view('extracted', self.extract)
+
+    def extract(self):
+        if not self.rapic_extract:
+            return {}
+        if is_protobuf_response(self):
+            data = self.proto
+        else:
+            try:
+                data = self.json()
+            except ValueError:
+                data = None
+        return {name: extract_json_path(data, path) for name, path in self.rapic_extract.items()}
@@ -0,0 +1,180 @@
+"""Local http server used by tests instead of a live httpbin."""
+import hashlib
+import json
+import os
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qsl
+from rapic.client import APIClient
+
+
+class EchoHandler(BaseHTTPRequestHandler):
+    """Send back the request method, path, query args, headers and body as json like httpbin /anything does"""
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, without it keep-alive requests wait for delayed acks
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle_one(self):
+        parsed = urlparse(self.path)
+        body = self.read_body()
+        self.server.requests_seen.append(parsed.path)
+        args = dict(parse_qsl(parsed.query, keep_blank_values=True))
+        status = 200
+        if parsed.path.startswith('/status/'):
+            status = int(parsed.path.rsplit('/', 1)[-1])
+        # fail_times query arg makes the first requests to the path fail with a 503 for retry tests
+        if args.get('fail_times') and self.server.requests_seen.count(parsed.path) <= int(args['fail_times']):
+            status = 503
+        # etag, cache_control and retry_after query args are sent back as response headers
+        if args.get('etag') and self.headers.get('If-None-Match') == args['etag']:
+            self.send_response(304)
+            self.send_header('ETag', args['etag'])
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        if parsed.path == '/items':
+            self.send_items(args)
+            return
+        if parsed.path == '/proto':
+            # Protobuf request bodies are sent back as they are
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-protobuf')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if parsed.path.startswith('/records/'):
+            self.send_records(int(parsed.path.rsplit('/', 1)[-1]), args.get('format'))
+            return
+        payload = json.dumps({
+            'method': self.command,
+            'path': parsed.path,
+            'args': args,
+            'count': len(self.server.requests_seen),
+            'headers': dict(self.headers.items()),
+            'data': body.decode('utf8', 'replace'),
+            'length': len(body),
+            'sha256': hashlib.sha256(body).hexdigest(),
+        }).encode('utf8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if args.get('etag'):
+            self.send_header('ETag', args['etag'])
+        if args.get('cache_control'):
+            self.send_header('Cache-Control', args['cache_control'])
+        if args.get('retry_after'):
+            self.send_header('Retry-After', args['retry_after'])
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def read_body(self):
+        """Read the request body sent with a Content-Length or with chunked transfer encoding"""
+        if self.headers.get('Transfer-Encoding', '').lower() != 'chunked':
+            length = int(self.headers.get('Content-Length') or 0)
+            return self.rfile.read(length) if length else b''
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b';', 1)[0], 16)
+            if not size:
+                # Trailers end with an empty line
+                while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+
+    def send_items(self, args):
+        """Send a page of total items (25 by default) selected by cursor, offset or page and limit query args"""
+        total = int(args.get('total', 25))
+        limit = int(args.get('limit', 10))
+        if 'page' in args:
+            start = (int(args['page']) - 1) * limit
+        else:
+            start = int(args.get('cursor') or args.get('offset') or 0)
+        end = min(start + limit, total)
+        payload = json.dumps({
+            'data': {'items': [{'id': index} for index in range(start, end)]},
+            'next_cursor': str(end) if end < total else None,
+            'count': total,
+        }).encode('utf8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if end < total:
+            self.send_header('Link', '<http://%s/items?cursor=%s&limit=%s&total=%s>; rel="next"' % (
+                self.headers.get('Host'), end, limit, total))
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def send_records(self, total, format):
+        """Send total records as a json array or ndjson with chunked transfer encoding like a large feed"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson' if format == 'ndjson' else 'application/json')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        for index in range(total):
+            record = json.dumps({'id': index, 'name': 'record %s' % index})
+            if format == 'ndjson':
+                chunk = record + '\n'
+            else:
+                chunk = ('[' if index == 0 else ',') + record + (']' if index == total - 1 else '')
+            self.write_chunk(chunk.encode('utf8'))
+        if not total and format != 'ndjson':
+            self.write_chunk(b'[]')
+        self.wfile.write(b'0\r\n\r\n')
+
+    def write_chunk(self, data):
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+
+    do_GET = do_POST = do_PUT = do_PATCH = do_DELETE = handle_one
+
+
+class LocalServer:
+    """Run EchoHandler on a random local port in a background thread
+
+        with LocalServer() as server:
+            api.client['host'] = server.host
+    """
+
+    def __init__(self, handler=EchoHandler):
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+        self.httpd.daemon_threads = True
+        self.httpd.requests_seen = []
+        self.host = '127.0.0.1:%s' % self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def requests_seen(self):
+        return self.httpd.requests_seen
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class LocalServerTestCase(unittest.TestCase):
+    """Run a LocalServer for every test, clients of the local.json test file are sent to it"""
+
+    client_name = 'local'
+
+    def setUp(self):
+        self.local_file = os.path.join(os.path.dirname(__file__), 'local.json')
+        self.server = LocalServer().__enter__()
+
+    def tearDown(self):
+        self.server.__exit__()
+
+    def get_client(self, client_class=APIClient, client_name=None, request_file=None, **kwargs):
+        api = client_class(client_name or self.client_name, request_file or self.local_file, **kwargs)
+        api.client['host'] = self.server.host
+        return api
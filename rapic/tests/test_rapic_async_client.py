@@ -0,0 +1,75 @@
+"""Tests for rapic asyncio Client."""
+import asyncio
+from rapic.async_client import AsyncAPIClient
+from rapic.hook import APIClientHook
+from rapic.tests.server import LocalServerTestCase
+
+
+class TestRapicAsyncClient(LocalServerTestCase):
+
+    def get_client(self, client_class=AsyncAPIClient, client_name=None, request_file=None, **kwargs):
+        return super(TestRapicAsyncClient, self).get_client(client_class, client_name, request_file, **kwargs)
+
+    def test_async_client_can_do_request(self):
+        """A request is performed through attribute access exactly like the sync client"""
+
+        async def run():
+            async with self.get_client() as api:
+                return await api.get_anything(url_data={'item_id': 5}, url_query={'q': 'rapic'})
+
+        response = asyncio.run(run())
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(body['path'], '/anything/5')
+        self.assertEqual(body['args']['q'], 'rapic')
+        self.assertEqual(body['args']['All-Request-Url'], 'Will_have_value_appended')
+        self.assertEqual(body['headers']['All-Request-Headers'], 'Will_have_this_header')
+
+    def test_async_client_can_run_requests_concurrently(self):
+        """Many requests can be awaited together"""
+
+        async def run():
+            async with self.get_client() as api:
+                return await asyncio.gather(*[api.get_anything(url_data={'item_id': i}) for i in range(20)])
+
+        responses = asyncio.run(run())
+        self.assertEqual([r.json()['path'] for r in responses], ['/anything/%s' % i for i in range(20)])
+
+    def test_async_client_runs_sync_and_async_hooks(self):
+        """Both normal and coroutine functions can be registered as hooks"""
+
+        class MyApiClient(AsyncAPIClient):
+
+            @APIClientHook.hook_client_header(client='local_async', requests=['*'])
+            def set_header(self, data, **kwargs):
+                data['Sync-Hook'] = 'sync'
+                return data
+
+            @APIClientHook.hook_client_body_data(client='local_async', requests=['post_anything'])
+            async def set_body(self, data, **kwargs):
+                await asyncio.sleep(0)
+                data['async_hook'] = 'async'
+                return data
+
+            @APIClientHook.hook_client_response(client='local_async', requests=['*'])
+            async def parse_response(self, response, **kwargs):
+                return response.json()
+
+        async def run():
+            async with self.get_client(MyApiClient, 'local_async') as api:
+                return await api.post_anything()
+
+        body = asyncio.run(run())
+        self.assertEqual(body['headers']['Sync-Hook'], 'sync')
+        self.assertEqual(body['data'], '{"name": "rapic", "async_hook": "async"}')
+
+    def test_async_client_dry_run(self):
+        """dry_run returns the prepared request without sending it"""
+
+        async def run():
+            async with self.get_client() as api:
+                return await api.get_anything(url_data={'item_id': 1}, dry_run=True)
+
+        req = asyncio.run(run())
+        self.assertIn('/anything/1', req.prepared_request.url)
+        self.assertEqual(self.server.requests_seen, [])
@@ -244,6 +244,16 @@ class TestRapicClient(unittest.TestCase):
         self.assertRaises(requests.exceptions.ConnectTimeout, self.httpbin_5.test_requests_delete_method,
                          )
 
+    def test_request_is_compiled_once(self):
+        """A request is compiled to a plan on first use and the plan is reused for other calls"""
+        self.httpbin.get_my_ip(dry_run=True)
+        plan = self.httpbin.get_request_plan('get_my_ip')
+        req = self.httpbin.get_my_ip(dry_run=True, headers={'User-Header': 'user'})
+        self.assertIs(plan, self.httpbin.get_request_plan('get_my_ip'))
+        self.assertEqual(req.prepared_request.headers['User-Header'], 'user')
+        self.assertNotIn('User-Header', plan.headers)
+        self.assertNotIn('User-Header', self.httpbin.get_my_ip(dry_run=True).prepared_request.headers)
+
     def tearDown(self):
         self.httpbin.close()
         self.httpbin_4.close()
@@ -0,0 +1,66 @@
+"""Tests for rapic Client batch requests."""
+import asyncio
+from rapic.async_client import AsyncAPIClient
+from rapic.client import APIClient
+from rapic.exceptions import RapicMissingUrlData
+from rapic.hook import APIClientHook
+from rapic.tests.server import LocalServerTestCase
+
+
+class TestRapicClientBatch(LocalServerTestCase):
+
+    def setUp(self):
+        super(TestRapicClientBatch, self).setUp()
+        self.api = self.get_client()
+
+    def test_perform_many_in_order(self):
+        """Results are returned in the same order as the calls when ordered"""
+        calls = ({'url_data': {'item_id': i}} for i in range(30))
+        results = list(self.api.perform_many('get_anything', calls, concurrency=5))
+        self.assertEqual([index for index, _ in results], list(range(30)))
+        self.assertEqual([r.json()['path'] for _, r in results], ['/anything/%s' % i for i in range(30)])
+
+    def test_perform_many_as_completed(self):
+        """All results are returned when yielded as they complete"""
+        calls = [{'url_data': {'item_id': i}} for i in range(30)]
+        results = dict(self.api.perform_many('get_anything', calls, concurrency=5, ordered=False))
+        self.assertEqual(sorted(results), list(range(30)))
+        self.assertEqual(results[7].json()['path'], '/anything/7')
+
+    def test_perform_many_can_capture_errors(self):
+        """A failing call does not stop the other calls when errors are captured"""
+        calls = [{'url_data': {'item_id': 1}}, {}, {'url_data': {'item_id': 3}}]
+        results = list(self.api.perform_many('get_anything', calls, capture_errors=True))
+        self.assertIsInstance(results[1][1], RapicMissingUrlData)
+        self.assertEqual(results[2][1].status_code, 200)
+        self.assertRaises(RapicMissingUrlData, list, self.api.perform_many('get_anything', calls))
+
+    def test_perform_many_runs_hooks(self):
+        """Every call in a batch goes through client hooks"""
+
+        class MyApiClient(APIClient):
+
+            @APIClientHook.hook_client_response(client='local_batch', requests=['get_anything'])
+            def parse_response(self, response, **kwargs):
+                return response.json()['path']
+
+        api = MyApiClient('local_batch', self.local_file)
+        api.client['host'] = self.server.host
+        results = list(api.perform_many('get_anything', [{'url_data': {'item_id': i}} for i in range(5)]))
+        self.assertEqual([r for _, r in results], ['/anything/%s' % i for i in range(5)])
+
+    def test_async_perform_many(self):
+        """Asyncio clients can also perform batch requests"""
+
+        async def run():
+            async with AsyncAPIClient('local', self.local_file) as api:
+                api.client['host'] = self.server.host
+                calls = [{'url_data': {'item_id': i}} for i in range(30)]
+                return [(i, r) async for i, r in api.perform_many('get_anything', calls, concurrency=4)]
+
+        results = asyncio.run(run())
+        self.assertEqual([r.json()['path'] for _, r in results], ['/anything/%s' % i for i in range(30)])
+
+    def tearDown(self):
+        self.api.close()
+        super(TestRapicClientBatch, self).tearDown()
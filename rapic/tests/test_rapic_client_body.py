@@ -0,0 +1,194 @@
+"""Tests for request bodies sent from files, memory and iterables without being read in memory first."""
+import asyncio
+import email.parser
+import email.policy
+import hashlib
+import io
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import unittest
+from rapic.async_client import AsyncAPIClient
+from rapic.client import APIClient
+from rapic.connection.body import ChunkedBody, MappedBody, MultipartBody, open_body
+from rapic.exceptions import RapicException
+from rapic.tests.server import LocalServerTestCase
+
+CLIENT = {
+    'scheme': 'http',
+    'upload': {'path': '/anything/upload', 'method': 'POST', 'headers': {'Content-Type': 'application/octet-stream'}},
+    'upload_form': {'path': '/anything/form', 'method': 'POST', 'data': 'title=report&year=2024'},
+    'upload_retry': {'path': '/anything/retry', 'method': 'PUT', 'url_query': {'fail_times': '1'},
+                     'retry': {'max_attempts': 2, 'backoff': 0}},
+}
+
+
+def parse_multipart(response):
+    body = response.request.body
+    data = b''.join(bytes(chunk) for chunk in body) if isinstance(body, (MultipartBody, ChunkedBody)) else body
+    head = 'Content-Type: %s\r\n\r\n' % response.request.headers['Content-Type']
+    message = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(head.encode('utf8') + data)
+    return {part.get_param('name', header='content-disposition'): part for part in message.iter_parts()}
+
+
+class TestRapicClientBody(LocalServerTestCase):
+
+    def setUp(self):
+        super(TestRapicClientBody, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.client_file = os.path.join(self.directory, 'client.json')
+        with open(self.client_file, 'w') as f:
+            json.dump({'body': dict(CLIENT, host=self.server.host)}, f)
+        self.content = os.urandom(300 * 1024)
+        self.file_path = os.path.join(self.directory, 'artifact.bin')
+        with open(self.file_path, 'wb') as f:
+            f.write(self.content)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TestRapicClientBody, self).tearDown()
+
+    def assertUploaded(self, response, content=None):
+        content = self.content if content is None else content
+        body = response.json()
+        self.assertEqual(body['length'], len(content))
+        self.assertEqual(body['sha256'], hashlib.sha256(content).hexdigest())
+        return body
+
+    def test_file_bodies(self):
+        api = APIClient('body', self.client_file)
+        for body in (self.file_path, pathlib.Path(self.file_path), memoryview(self.content), io.BytesIO(self.content)):
+            response = api.upload(body=body)
+            self.assertEqual(self.assertUploaded(response)['headers']['Content-Length'], str(len(self.content)))
+        # Memory maps are closed once the call is done
+        self.assertTrue(api.upload(body=self.file_path).request.body.closed)
+        with open(self.file_path, 'rb') as f:
+            f.seek(1024)
+            with api.upload(body=f, dry_run=True) as req:
+                # Files are memory mapped from their position instead of read
+                self.assertIsInstance(req.prepared_request.body, MappedBody)
+                self.assertUploaded(req.run(), self.content[1024:])
+                self.assertUploaded(req.run(), self.content[1024:])
+            self.assertTrue(req.prepared_request.body.closed)
+        with open_body(self.file_path) as body:
+            self.assertEqual(body.map.__class__.__name__, 'mmap')
+            chunks = iter(body)
+            chunk = next(chunks)
+        # Views still used keep the map open instead of raising
+        self.assertEqual(bytes(chunk[:10]), self.content[:10])
+        self.assertFalse(body.closed)
+
+    def test_fifo_path_body(self):
+        """Paths that can not be memory mapped are read while they are sent and closed after"""
+        api = APIClient('body', self.client_file)
+        fifo_path = os.path.join(self.directory, 'artifact.fifo')
+        os.mkfifo(fifo_path)
+
+        def write_fifo():
+            with open(fifo_path, 'wb') as f:
+                f.write(self.content)
+
+        writer = threading.Thread(target=write_fifo)
+        writer.start()
+        response = api.upload(body=fifo_path)
+        writer.join()
+        self.assertEqual(self.assertUploaded(response)['headers']['Transfer-Encoding'], 'chunked')
+        self.assertTrue(response.request.body.body.fp.closed)
+
+    def test_chunked_bodies(self):
+        api = APIClient('body', self.client_file)
+
+        def chunks():
+            for start in range(0, len(self.content), 1000):
+                yield self.content[start:start + 1000]
+
+        body = self.assertUploaded(api.upload(body=chunks()))
+        self.assertEqual(body['headers']['Transfer-Encoding'], 'chunked')
+        self.assertNotIn('Content-Length', body['headers'])
+        body = self.assertUploaded(api.upload(body=self.file_path, chunked=True))
+        self.assertEqual(body['headers']['Transfer-Encoding'], 'chunked')
+        # Chunks are split so frames are never as large as the file
+        req = api.upload(body=memoryview(self.content), chunked=True, dry_run=True)
+        self.assertEqual(max(len(chunk) for chunk in req.prepared_request.body), 64 * 1024)
+        with self.assertRaises(RapicException):
+            api.upload(body=42)
+
+    def test_multipart_files(self):
+        api = APIClient('body', self.client_file)
+        files = {'artifact': pathlib.Path(self.file_path),
+                 'notes': ('notes.txt', 'release notes', 'text/plain', {'X-Part': '1'})}
+        with api.upload_form(files=files, dry_run=True) as req:
+            response = req.run()
+            body = self.assertUploaded(response, b''.join(bytes(chunk) for chunk in response.request.body))
+            parts = parse_multipart(response)
+        self.assertEqual(int(body['headers']['Content-Length']), response.request.body.len)
+        self.assertEqual(list(parts), ['title', 'year', 'artifact', 'notes'])
+        self.assertEqual(parts['title'].get_content(), 'report')
+        self.assertEqual(parts['artifact'].get_filename(), 'artifact.bin')
+        self.assertEqual(parts['artifact'].get_payload(decode=True), self.content)
+        self.assertEqual(parts['notes'].get_content_type(), 'text/plain')
+        self.assertEqual(parts['notes']['X-Part'], '1')
+        self.assertEqual(parts['notes'].get_content(), 'release notes')
+        # Unseekable streams make the length unknown so the body is sent chunked
+        read_end, write_end = os.pipe()
+        with os.fdopen(write_end, 'wb') as f:
+            f.write(b'piped')
+        with os.fdopen(read_end, 'rb') as f:
+            response = api.upload_form(files={'log': ('log.txt', f)})
+        self.assertEqual(response.json()['headers']['Transfer-Encoding'], 'chunked')
+        self.assertIn('piped', response.json()['data'])
+
+    def test_retried_body_is_sent_again(self):
+        api = APIClient('body', self.client_file)
+        with open(self.file_path, 'rb') as f:
+            response = api.upload_retry(body=f)
+        self.assertEqual(response.rapic_retries, 1)
+        self.assertUploaded(response)
+        self.assertEqual(self.server.requests_seen, ['/anything/retry', '/anything/retry'])
+
+    def test_iterator_body_is_not_retried(self):
+        api = APIClient('body', self.client_file)
+        response = api.upload_retry(body=iter([self.content]))
+        # The iterator was read by the first attempt, sending it again would send an empty body
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(hasattr(response, 'rapic_retries'))
+        self.assertEqual(self.server.requests_seen, ['/anything/retry'])
+
+    def test_async_client(self):
+        async def run():
+            async with AsyncAPIClient('body', self.client_file) as api:
+                with await api.upload_form(files={'artifact': pathlib.Path(self.file_path)}, dry_run=True) as req:
+                    form = await req.run()
+                    parts = parse_multipart(form)
+                return parts, form, await asyncio.gather(api.upload(body=self.file_path),
+                                                         api.upload(body=iter([self.content]), chunked=True))
+
+        parts, form, (mapped, chunked) = asyncio.run(run())
+        self.assertUploaded(mapped)
+        self.assertEqual(self.assertUploaded(chunked)['headers']['Transfer-Encoding'], 'chunked')
+        self.assertEqual(parts['artifact'].get_payload(decode=True), self.content)
+        self.assertEqual(form.json()['length'], form.request.body.len)
+
+    def test_async_body_is_read_outside_of_loop(self):
+        """Chunks of streamed bodies are read in the default executor"""
+        threads = []
+
+        def chunks():
+            for start in range(0, len(self.content), 100 * 1024):
+                threads.append(threading.get_ident())
+                yield self.content[start:start + 100 * 1024]
+
+        async def run():
+            async with AsyncAPIClient('body', self.client_file) as api:
+                return await api.upload(body=chunks())
+
+        self.assertUploaded(asyncio.run(run()))
+        self.assertEqual(len(threads), 3)
+        self.assertNotIn(threading.get_ident(), threads)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+"""Tests for rapic Client response cache."""
+import asyncio
+import shutil
+import tempfile
+import threading
+import time
+from unittest import mock
+from rapic.async_client import AsyncAPIClient
+from rapic.client import APIClient
+from rapic.connection.cache import DiskCacheStore, MemoryCacheStore
+from rapic.hook import APIClientHook
+from rapic.tests.server import LocalServerTestCase
+
+
+class TestRapicClientCache(LocalServerTestCase):
+
+    def get_client(self, client_class=APIClient, client_name=None, request_file=None, cache=None, **kwargs):
+        api = super(TestRapicClientCache, self).get_client(client_class, client_name, request_file, **kwargs)
+        api.client['get_anything']['cache'] = cache or {'ttl': 60}
+        return api
+
+    def test_cache_is_opt_in(self):
+        """Responses are not cached unless cache is set for the request"""
+        api = self.get_client()
+        api.get_status(url_data={'status': 200})
+        api.get_status(url_data={'status': 200})
+        self.assertEqual(len(self.server.requests_seen), 2)
+        self.assertEqual(api.get_cache_stats(), {'hits': 0, 'misses': 0, 'revalidated': 0})
+
+    def test_cache_hits_and_misses(self):
+        """A cached response is returned until its ttl expires and the key includes the url"""
+        api = self.get_client()
+        first = api.get_anything(url_data={'item_id': 1})
+        second = api.get_anything(url_data={'item_id': 1})
+        api.get_anything(url_data={'item_id': 2})
+        self.assertEqual(first.json(), second.json())
+        self.assertTrue(second.from_cache)
+        self.assertEqual(len(self.server.requests_seen), 2)
+        self.assertEqual(api.get_cache_stats(), {'hits': 1, 'misses': 2, 'revalidated': 0})
+
+    def test_cache_varies_on_headers(self):
+        """Requests with different values of vary headers are cached separately"""
+        api = self.get_client(cache={'ttl': 60, 'vary_headers': ['X-User']})
+        api.get_anything(url_data={'item_id': 1}, headers={'X-User': 'a'})
+        api.get_anything(url_data={'item_id': 1}, headers={'X-User': 'b'})
+        api.get_anything(url_data={'item_id': 1}, headers={'X-User': 'a'})
+        self.assertEqual(len(self.server.requests_seen), 2)
+
+    def test_cache_revalidates_with_etag(self):
+        """A stale response with an ETag is revalidated with If-None-Match"""
+        api = self.get_client(cache={'ttl': 0})
+        first = api.get_anything(url_data={'item_id': 1}, url_query={'etag': '"v1"'})
+        second = api.get_anything(url_data={'item_id': 1}, url_query={'etag': '"v1"'})
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.json(), second.json())
+        self.assertEqual(len(self.server.requests_seen), 2)
+        self.assertEqual(api.get_cache_stats(), {'hits': 0, 'misses': 1, 'revalidated': 1})
+
+    def test_etag_is_not_kept_in_prepared_call(self):
+        """If-None-Match is sent on a copy so a call run again after eviction gets the full response"""
+        api = self.get_client(cache={'ttl': 0})
+        req = api.get_anything(url_data={'item_id': 1}, url_query={'etag': '"v1"'}, dry_run=True)
+        req.run()
+        self.assertEqual(req.run().status_code, 200)
+        self.assertNotIn('If-None-Match', req.prepared_request.headers)
+        api.request.cache.store.clear()
+        response = req.run()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['path'], '/anything/1')
+        self.assertEqual(api.get_cache_stats(), {'hits': 0, 'misses': 2, 'revalidated': 1})
+
+    def test_cache_honours_no_store(self):
+        """Responses with Cache-Control no-store are never cached"""
+        api = self.get_client()
+        for i in range(2):
+            api.get_anything(url_data={'item_id': 1}, url_query={'cache_control': 'no-store'})
+        self.assertEqual(len(self.server.requests_seen), 2)
+
+    def test_cache_hits_run_response_hooks(self):
+        """Response hooks run for cached responses too"""
+
+        class MyApiClient(APIClient):
+
+            @APIClientHook.hook_client_response(client='local_cache', requests=['get_anything'])
+            def parse_response(self, response, **kwargs):
+                return response.json()['count']
+
+        api = self.get_client(MyApiClient, 'local_cache')
+        self.assertEqual([api.get_anything(url_data={'item_id': 1}) for i in range(3)], [1, 1, 1])
+
+    def test_lru_memory_store_evicts_oldest(self):
+        """The least recently used entry is removed from a full memory store"""
+        api = self.get_client(cache_store=MemoryCacheStore(max_entries=2))
+        for item_id in (1, 2, 1, 3, 1, 2):
+            api.get_anything(url_data={'item_id': item_id})
+        self.assertEqual(self.server.requests_seen, ['/anything/1', '/anything/2', '/anything/3', '/anything/2'])
+
+    def test_disk_store(self):
+        """Responses can be cached on disk and shared by clients"""
+        directory = tempfile.mkdtemp()
+        try:
+            api = self.get_client(cache_store=DiskCacheStore(directory))
+            api.get_anything(url_data={'item_id': 1})
+            api_2 = self.get_client(cache_store=DiskCacheStore(directory))
+            response = api_2.get_anything(url_data={'item_id': 1})
+            self.assertEqual(response.json()['path'], '/anything/1')
+            self.assertEqual(len(self.server.requests_seen), 1)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_async_disk_store_does_not_block_loop(self):
+        """Disk cache files are read and written outside of the event loop thread"""
+        threads = []
+
+        class RecordingStore(DiskCacheStore):
+            def get(self, key):
+                threads.append(threading.get_ident())
+                return super(RecordingStore, self).get(key)
+
+            def set(self, key, entry):
+                threads.append(threading.get_ident())
+                return super(RecordingStore, self).set(key, entry)
+
+        async def run():
+            async with self.get_client(AsyncAPIClient, cache_store=RecordingStore(directory)) as api:
+                await api.get_anything(url_data={'item_id': 1})
+                return await api.get_anything(url_data={'item_id': 1})
+
+        directory = tempfile.mkdtemp()
+        try:
+            response = asyncio.run(run())
+            self.assertTrue(response.from_cache)
+            self.assertEqual(len(self.server.requests_seen), 1)
+            self.assertEqual(len(threads), 3)
+            self.assertNotIn(threading.get_ident(), threads)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_disk_store_entry_evicted_while_read(self):
+        """An entry removed by another client between the read and the access time update is still returned"""
+        directory = tempfile.mkdtemp()
+        try:
+            store = DiskCacheStore(directory)
+            store.set('key', 'entry')
+            with mock.patch('os.utime', side_effect=FileNotFoundError):
+                self.assertEqual(store.get('key'), 'entry')
+        finally:
+            shutil.rmtree(directory)
+
+    def test_cache_expires(self):
+        """Responses are requested again after the ttl"""
+        api = self.get_client(cache={'ttl': 0.05})
+        api.get_anything(url_data={'item_id': 1})
+        time.sleep(0.1)
+        api.get_anything(url_data={'item_id': 1})
+        self.assertEqual(len(self.server.requests_seen), 2)
@@ -0,0 +1,66 @@
+"""Tests for rapic Client compiled client files."""
+import os
+import tempfile
+import unittest
+from rapic.client import APIClient
+from rapic.exceptions import RapicException
+from rapic.tools.compiled import CompiledClient, compile_client_file
+
+
+class TestRapicClientCompiled(unittest.TestCase):
+
+    def setUp(self):
+        curr_dir = os.path.dirname(__file__)
+        self.httpbin_file = os.path.join(curr_dir, 'httpbin.json')
+        self.httpbin_file_3 = os.path.join(curr_dir, 'httpbin_3.json')
+        self.compiled_files = []
+
+    def compile(self, json_file):
+        with tempfile.NamedTemporaryFile('wb', suffix='.rapicc', delete=False) as f:
+            compile_client_file('httpbin', json_file, f)
+        self.compiled_files.append(f.name)
+        return f.name
+
+    def test_compiled_client_is_detected(self):
+        """A compiled client file is loaded by APIClient like a json file"""
+        api = APIClient('httpbin', self.compile(self.httpbin_file))
+        json_api = APIClient('httpbin', self.httpbin_file)
+        self.assertIsInstance(api.client, CompiledClient)
+        self.assertEqual(api.get_request_data('get_my_headers'), json_api.get_request_data('get_my_headers'))
+        self.assertEqual(api.client['default_headers'], json_api.client['default_headers'])
+        req = api.get_my_ip(dry_run=True)
+        self.assertEqual(req.prepared_request.url, json_api.get_my_ip(dry_run=True).prepared_request.url)
+        self.assertEqual(req.prepared_request.body, json_api.get_my_ip(dry_run=True).prepared_request.body)
+        api.close()
+        json_api.close()
+
+    def test_compiled_client_pages(self):
+        """Requests in pages are found in compiled clients"""
+        api = APIClient('httpbin', self.compile(self.httpbin_file_3))
+        self.assertEqual(api.get_pages(), ['homepage', 'second_page'])
+        self.assertEqual(api.get_request_data('test_requests_delete_method')['path'], '/anything/{user_id}')
+        req = api.test_requests_delete_method(url_data={'user_id': 1}, dry_run=True)
+        self.assertEqual(req.prepared_request.url, 'http://httpbin.org/anything/1')
+        self.assertRaises(RapicException, api.get_request_data, 'request_not_in_client_json_file')
+        api.close()
+
+    def test_compiled_client_only_decodes_used_requests(self):
+        """Only the requested entries are decoded"""
+        api = APIClient('httpbin', self.compile(self.httpbin_file_3))
+        loaded = []
+        load = api.client.records.load
+        api.client.records.load = lambda position: loaded.append(position) or load(position)
+        api.test_requests_patch_method(url_data={'anything': 1}, dry_run=True)
+        api.test_requests_patch_method(url_data={'anything': 2}, dry_run=True)
+        self.assertEqual(len(loaded), 1)
+        requests = api.get_requests()
+        self.assertIn('test_requests_patch_method', requests)
+        self.assertEqual(len(requests), api.get_total_requests_number())
+        self.assertEqual(len(loaded), 1)
+        self.assertEqual(len(list(requests.values())), len(requests))
+        self.assertGreater(len(loaded), 1)
+        api.close()
+
+    def tearDown(self):
+        for f in self.compiled_files:
+            os.unlink(f)
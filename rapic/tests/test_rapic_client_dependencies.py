@@ -0,0 +1,130 @@
+"""Tests for rapic requests performed before the requests depending on them."""
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from rapic.async_client import AsyncAPIClient
+from rapic.client import APIClient
+from rapic.exceptions import RapicException
+from rapic.hook import APIClientHook
+from rapic.tests.server import LocalServerTestCase
+
+CLIENT = {
+    'scheme': 'http',
+    'implicit_requests': ['login'],
+    'login': {'path': '/anything/login', 'method': 'GET', 'url_query': {'token': 'secret'},
+              'outputs': {'token': 'json.args.token'}, 'output_ttl': 60},
+    'get_profile': {'path': '/anything/profile', 'method': 'GET', 'url_query': {'user': '42'},
+                    'do_implicit_requests': True, 'outputs': {'user_id': 'json.args.user'},
+                    'inputs': {'headers': {'Authorization': 'Bearer {token}'}}},
+    'get_settings': {'path': '/anything/settings', 'method': 'GET', 'url_query': {'theme': 'dark'},
+                     'outputs': {'theme': 'json.args.theme', 'settings_status': 'status_code'}},
+    'get_orders': {'path': '/anything/users/{user_id}/orders', 'method': 'GET', 'do_implicit_requests': True,
+                   'do_extra_requests': True, 'extra_request_names': ['get_profile', 'get_settings'],
+                   'inputs': {'headers': {'Authorization': 'Bearer {token}', 'X-Theme': '{theme}'},
+                              'url_data': {'user_id': '{user_id}'}, 'url_query': {'status': '{settings_status}'}}},
+    'get_missing': {'path': '/status/404', 'method': 'GET', 'outputs': {'token': 'json.token'}},
+    'get_broken': {'path': '/anything/broken', 'method': 'GET', 'do_extra_requests': True,
+                   'extra_request_names': ['get_missing']},
+    'get_loop': {'path': '/anything/loop', 'method': 'GET', 'do_extra_requests': True,
+                 'extra_request_names': ['get_loop_back']},
+    'get_loop_back': {'path': '/anything/loop_back', 'method': 'GET', 'do_extra_requests': True,
+                      'extra_request_names': ['get_loop']},
+    'get_unknown_input': {'path': '/anything/unknown', 'method': 'GET', 'do_extra_requests': True,
+                          'extra_request_names': ['get_settings'], 'inputs': {'headers': {'X-Token': '{token}'}}},
+}
+
+branches = threading.Barrier(2, timeout=5)
+
+
+@APIClientHook.hook_client_header('dependencies_concurrent', ['get_profile', 'get_settings'])
+def wait_for_other_branch(self, headers, **kwargs):
+    # Both branches must be in flight together for the barrier to open
+    branches.wait()
+    return headers
+
+
+class TestRapicClientDependencies(LocalServerTestCase):
+
+    def setUp(self):
+        super(TestRapicClientDependencies, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.client_file = os.path.join(self.directory, 'client.json')
+        with open(self.client_file, 'w') as f:
+            client = dict(CLIENT, host=self.server.host)
+            json.dump({'dependencies': client, 'dependencies_concurrent': client}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TestRapicClientDependencies, self).tearDown()
+
+    def test_outputs_feed_requests(self):
+        api = APIClient('dependencies', self.client_file)
+        body = api.get_orders().json()
+        self.assertEqual(body['path'], '/anything/users/42/orders')
+        self.assertEqual(body['headers']['Authorization'], 'Bearer secret')
+        self.assertEqual(body['headers']['X-Theme'], 'dark')
+        self.assertEqual(body['args'], {'status': '200'})
+        # Settings do not need the login so they can be requested before it
+        seen = self.server.requests_seen
+        self.assertEqual(sorted(seen[:3]), ['/anything/login', '/anything/profile', '/anything/settings'])
+        self.assertLess(seen.index('/anything/login'), seen.index('/anything/profile'))
+        self.assertEqual(seen[3], '/anything/users/42/orders')
+        # Login outputs are kept for their ttl, arguments given to the call replace inputs
+        body = api.get_orders(headers={'X-Theme': 'light'}).json()
+        self.assertEqual(body['headers']['X-Theme'], 'light')
+        self.assertEqual(self.server.requests_seen.count('/anything/login'), 1)
+        api.clear_outputs('login')
+        api.get_orders()
+        self.assertEqual(self.server.requests_seen.count('/anything/login'), 2)
+        self.assertEqual(len(self.server.requests_seen), 11)
+
+    def test_flags_and_dry_run(self):
+        api = APIClient('dependencies', self.client_file)
+        req = api.get_orders(url_data={'user_id': 7}, dry_run=True)
+        self.assertEqual(req.prepared_request.url.split('?')[0], 'http://%s/anything/users/7/orders' % self.server.host)
+        self.assertEqual(self.server.requests_seen, [])
+        body = api.get_profile(do_implicit_requests=False).json()
+        self.assertNotIn('Authorization', body['headers'])
+        self.assertEqual(self.server.requests_seen, ['/anything/profile'])
+        api.get_settings(do_implicit_requests=True)
+        self.assertEqual(self.server.requests_seen[1:], ['/anything/login', '/anything/settings'])
+        # Implicit requests do not depend on the other implicit requests
+        self.assertEqual(api.get_request_graph('login', do_implicit_requests=True).order, ['login'])
+
+    def test_branches_are_concurrent(self):
+        api = APIClient('dependencies_concurrent', self.client_file)
+        self.assertEqual(api.get_orders().status_code, 200)
+        graph = api.get_request_graph('get_orders')
+        self.assertEqual(graph.dependencies['get_orders'], ('login', 'get_profile', 'get_settings'))
+        self.assertEqual(graph.order, ['login', 'get_profile', 'get_settings', 'get_orders'])
+
+    def test_errors(self):
+        api = APIClient('dependencies', self.client_file)
+        with self.assertRaises(RapicException):
+            api.get_loop()
+        with self.assertRaises(RapicException):
+            api.get_broken()
+        self.assertNotIn('/anything/broken', self.server.requests_seen)
+        with self.assertRaises(RapicException):
+            api.get_unknown_input()
+
+    def test_async_client(self):
+        async def run():
+            async with AsyncAPIClient('dependencies', self.client_file) as api:
+                return await asyncio.gather(*[api.get_orders() for _ in range(5)])
+
+        responses = asyncio.run(run())
+        for response in responses:
+            self.assertEqual(response.json()['headers']['Authorization'], 'Bearer secret')
+            self.assertEqual(response.json()['path'], '/anything/users/42/orders')
+        # Coroutines needing the login together wait for the same request
+        self.assertEqual(self.server.requests_seen.count('/anything/login'), 1)
+        self.assertEqual(self.server.requests_seen.count('/anything/profile'), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
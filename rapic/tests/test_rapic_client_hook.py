@@ -188,3 +188,42 @@ class TestRapicClientHook(unittest.TestCase):
         resp = httpbin.get_my_headers()
         httpbin.close()
         self.assertIsInstance(resp, UserAgentObject)
+
+    def test_hook_cannot_change_saved_request(self):
+        """Hooks get copies of the saved request data so changes are only used for the current call"""
+
+        class MyApiClient(APIClient):
+
+            @APIClientHook.hook_client_body_data(client='httpbin_8', requests=['*'])
+            def change_body_data(self, data, **kwargs):
+                data['nested']['changed'] = True
+                return data
+
+            @APIClientHook.hook_client_request_data(client='httpbin_8', requests=['*'])
+            def change_request_data(self, data, **kwargs):
+                data['headers']['changed'] = 'true'
+                data['extra_request_names'].append('changed')
+                return data
+
+        httpbin = MyApiClient('httpbin_8', self.httpbin_file_5)
+        httpbin.client['default_data'] = {'nested': {'value': 1}}
+        httpbin.client['get_my_ip']['extra_request_names'] = []
+        req = httpbin.get_my_ip(dry_run=True)
+        self.assertEqual(req.prepared_request.headers['changed'], 'true')
+        self.assertEqual(httpbin.client['default_data'], {'nested': {'value': 1}})
+        self.assertEqual(httpbin.client['get_my_ip']['extra_request_names'], [])
+        self.assertNotIn('changed', httpbin.get_request_plan('get_my_ip').headers)
+
+    def test_hooks_registered_later_are_used(self):
+        """Hooks registered after a client performed a request are run for the next requests"""
+        httpbin = APIClient('httpbin_9', self.httpbin_file_5)
+        req = httpbin.get_my_ip(dry_run=True)
+        self.assertNotIn('late', req.prepared_request.headers)
+
+        @APIClientHook.hook_client_header(client='httpbin_9', requests=['*'])
+        def set_late_header(self, data, **kwargs):
+            data['late'] = 'true'
+            return data
+
+        req = httpbin.get_my_ip(dry_run=True)
+        self.assertEqual(req.prepared_request.headers['late'], 'true')
@@ -0,0 +1,77 @@
+"""Tests for rapic Client request index."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from rapic.client import APIClient
+from rapic.exceptions import RapicException
+from rapic.tools.compiled import compile_client_file
+
+CLIENT = {
+    'host': 'localhost',
+    'scheme': 'http',
+    'pages': ['page_1', 'page_2'],
+    'get_top': {'path': '/top', 'method': 'GET'},
+    'shared': {'path': '/top/shared', 'method': 'GET'},
+    'page_1': {'get_one': {'path': '/one', 'method': 'GET'},
+               'shared': {'path': '/one/shared', 'method': 'GET'},
+               'total_requests': 2},
+    'page_2': {'get_two': {'path': '/two', 'method': 'GET'},
+               'shared': {'path': '/two/shared', 'method': 'GET'}},
+}
+
+
+class TestRapicClientIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.client_file = os.path.join(self.directory, 'client.json')
+        with open(self.client_file, 'w') as f:
+            json.dump({'indexed': CLIENT}, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def compile(self):
+        compiled_file = os.path.join(self.directory, 'client.rapicc')
+        with open(compiled_file, 'wb') as f:
+            compile_client_file('indexed', self.client_file, f)
+        return compiled_file
+
+    def test_requests_are_indexed_at_load(self):
+        for client_file in (self.client_file, self.compile()):
+            api = APIClient('indexed', client_file)
+            self.assertEqual(api.get_total_requests_number(), 4)
+            info = api.info()
+            self.assertEqual(info['request_names'], ['get_top', 'shared', 'get_one', 'get_two'])
+            self.assertEqual(info['requests']['get_one']['path'], '/one')
+            self.assertEqual(info['duplicate_requests'], {'shared': [None, 'page_1', 'page_2']})
+            self.assertEqual(api.get_request_data('get_two')['path'], '/two')
+            self.assertEqual(api.get_request_plan('get_two').page, 'page_2')
+            # The first definition in lookup order is used for duplicated names
+            self.assertEqual(api.get_request_data('shared')['path'], '/top/shared')
+            self.assertEqual(sorted(api.get_requests()), ['get_one', 'get_top', 'get_two', 'shared'])
+            api.close()
+
+    def test_missing_requests(self):
+        api = APIClient('indexed', self.client_file)
+        with self.assertRaises(RapicException):
+            api.get_request_data('get_tow')
+        with self.assertRaises(RapicException):
+            api.get_request_data('host')
+        self.assertNotIn('get_tow', api.request_data_list)
+
+    def test_requests_added_after_load(self):
+        api = APIClient('indexed', self.client_file)
+        api.client['get_new'] = {'path': '/new', 'method': 'GET'}
+        self.assertEqual(api.get_request_data('get_new')['path'], '/new')
+        api.client['pages'] = api.client['pages'] + ['page_3']
+        api.client['page_3'] = {'get_three': {'path': '/three', 'method': 'GET'}}
+        self.assertEqual(api.get_request_data('get_three')['path'], '/three')
+        self.assertEqual(api.get_request_plan('get_three').page, 'page_3')
+        self.assertEqual(api.get_total_requests_number(), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
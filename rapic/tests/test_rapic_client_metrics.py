@@ -0,0 +1,183 @@
+"""Tests for rapic Client metrics."""
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+from rapic.async_client import AsyncAPIClient
+from rapic.hook import APIClientHook
+from rapic.metrics import HOOK_METRIC, STAGE_METRIC, InMemorySpanExporter, Metrics, MetricsRegistry, \
+    OTLPSpanExporter, Histogram, Span
+from rapic.tests.server import LocalServerTestCase
+
+
+def add_signature(self, headers, **kwargs):
+    headers['X-Signature'] = 'signed'
+    return headers
+
+
+async def async_response_hook(self, response, **kwargs):
+    return response
+
+
+APIClientHook.register_client_hooks(APIClientHook.HEADER_HOOK_TYPE, ['get_anything'], 'metrics', add_signature)
+APIClientHook.register_client_hooks(APIClientHook.RESPONSE_OBJ_HOOK_TYPE, ['get_anything'], 'metrics_async',
+                                    async_response_hook)
+
+
+class TestRapicClientMetrics(LocalServerTestCase):
+
+    client_name = 'metrics'
+
+    def test_histogram(self):
+        histogram = Histogram(buckets=(0.1, 1))
+        for value in (0.05, 0.5, 0.5, 5):
+            histogram.observe(value)
+        self.assertEqual(histogram.get_buckets(), [(0.1, 1), (1, 3), (float('inf'), 4)])
+        self.assertEqual(histogram.quantile(0.5), 1)
+        self.assertEqual(histogram.as_dict()['count'], 4)
+
+    def test_metrics_disabled(self):
+        api = self.get_client(client_name='local')
+        self.assertIsNone(api.metrics)
+        self.assertEqual(api.get_anything(url_data={'item_id': 1}).status_code, 200)
+
+    def test_stages_and_hooks_are_timed(self):
+        api = self.get_client(client_name='local', metrics=True)
+        api.get_anything(url_data={'item_id': 1})
+        api.get_anything(url_data={'item_id': 2})
+        registry = api.metrics.registry
+        stages = {labels['stage']: histogram.count for _, labels, histogram in registry.collect(STAGE_METRIC)}
+        self.assertEqual(stages, {'build_request_data': 2, 'prepare': 2, 'rate_limit': 2, 'network': 2,
+                                  'response': 2, 'hooks': 2, 'total': 2})
+        total = registry.get(STAGE_METRIC, client='local', request='get_anything', stage='total')
+        network = registry.get(STAGE_METRIC, client='local', request='get_anything', stage='network')
+        self.assertLessEqual(network.sum, total.sum)
+
+    def test_hook_functions_are_timed(self):
+        api = self.get_client(metrics=Metrics())
+        response = api.get_anything(url_data={'item_id': 1})
+        self.assertEqual(response.json()['headers']['X-Signature'], 'signed')
+        hooks = {labels['hook']: (labels['hook_type'], histogram.count)
+                 for _, labels, histogram in api.metrics.registry.collect(HOOK_METRIC)}
+        self.assertEqual(hooks['%s.add_signature' % __name__], ('header', 1))
+
+    def test_prometheus_format(self):
+        registry = MetricsRegistry(buckets=(0.5,))
+        registry.observe(STAGE_METRIC, 0.25, (('client', 'local'), ('stage', 'network')))
+        self.assertEqual(registry.to_prometheus().splitlines(), [
+            '# HELP rapic_stage_seconds Time spent in every stage of rapic requests without the hooks run inside them',
+            '# TYPE rapic_stage_seconds histogram',
+            'rapic_stage_seconds_bucket{client="local",stage="network",le="0.5"} 1',
+            'rapic_stage_seconds_bucket{client="local",stage="network",le="+Inf"} 1',
+            'rapic_stage_seconds_sum{client="local",stage="network"} 0.25',
+            'rapic_stage_seconds_count{client="local",stage="network"} 1',
+        ])
+
+    def test_spans(self):
+        exporter = InMemorySpanExporter()
+        api = self.get_client(metrics=Metrics(exporter=exporter))
+        api.get_anything(url_data={'item_id': 1})
+        root = exporter.spans[0]
+        self.assertEqual(root.name, 'rapic.request')
+        self.assertIsNone(root.parent_id)
+        names = [span.name for span in exporter.spans[1:]]
+        self.assertIn('rapic.network', names)
+        self.assertIn('rapic.hook', names)
+        for span in exporter.spans[1:]:
+            self.assertEqual(span.parent_id, root.span_id)
+            self.assertEqual(span.trace_id, root.trace_id)
+            self.assertGreaterEqual(span.start_ns, root.start_ns)
+            self.assertLessEqual(span.end_ns, root.end_ns)
+
+    def test_failed_requests_are_traced(self):
+        exporter = InMemorySpanExporter()
+        api = self.get_client(metrics=Metrics(exporter=exporter))
+        api.client['host'] = '127.0.0.1:1'
+        with self.assertRaises(Exception):
+            api.get_anything(url_data={'item_id': 1})
+        self.assertIn('ConnectionError', exporter.spans[0].error)
+        self.assertIsNone(api.metrics.get_trace())
+
+    def test_otlp_exporter(self):
+        """Spans are posted to the collector as OTLP json and failures only count dropped spans"""
+        exporter = OTLPSpanExporter(endpoint='http://%s/v1/traces' % self.server.host, batch_size=100)
+        api = self.get_client(metrics=Metrics(exporter=exporter))
+        api.get_anything(url_data={'item_id': 1})
+        self.assertEqual(self.server.requests_seen, ['/anything/1'])
+        exporter.close()
+        self.assertEqual(self.server.requests_seen, ['/anything/1', '/v1/traces'])
+        self.assertEqual(exporter.dropped, 0)
+        exporter = OTLPSpanExporter(endpoint='http://127.0.0.1:1/v1/traces', batch_size=1)
+        api = self.get_client(metrics=Metrics(exporter=exporter))
+        api.get_anything(url_data={'item_id': 1})
+        exporter.flush()
+        self.assertGreater(exporter.dropped, 0)
+        exporter.close()
+
+    def test_otlp_exporter_queue(self):
+        """Requests do not wait for a slow collector, spans that do not fit in the queue are dropped"""
+        collector = threading.Event()
+        exporter = OTLPSpanExporter(endpoint='http://%s/v1/traces' % self.server.host, batch_size=1,
+                                    max_queue_size=4)
+        with mock.patch.object(exporter, 'send', side_effect=lambda spans: collector.wait(5)) as send:
+            api = self.get_client(metrics=Metrics(exporter=exporter))
+            for _ in range(3):
+                api.get_anything(url_data={'item_id': 1})
+            self.assertGreater(exporter.dropped, 0)
+            collector.set()
+            exporter.close()
+        self.assertGreater(send.call_count, 0)
+        self.assertTrue(exporter.queue.empty())
+
+    def test_otlp_exporter_schedule_delay(self):
+        """Batches are sent schedule_delay after their first span even when spans keep coming"""
+        sent = []
+        exporter = OTLPSpanExporter(endpoint='http://%s/v1/traces' % self.server.host, batch_size=1000,
+                                    schedule_delay=0.2)
+        with mock.patch.object(exporter, 'send', side_effect=lambda spans: sent.append(time.monotonic())):
+            started = time.monotonic()
+            while time.monotonic() - started < 0.6:
+                exporter.export([Span('rapic.request', 'trace', None, 0, 1)])
+                time.sleep(0.02)
+            self.assertTrue(sent)
+            self.assertLess(sent[0] - started, 0.4)
+            exporter.close()
+
+    def test_otlp_exporter_errors(self):
+        """Any error sending a batch drops its spans and the exporter keeps running"""
+        exporter = OTLPSpanExporter(endpoint='http://%s/v1/traces' % self.server.host, batch_size=1)
+        with mock.patch.object(exporter.session, 'post', side_effect=ValueError('bad span')):
+            exporter.export([Span('rapic.request', 'trace', None, 0, 1)])
+            exporter.flush()
+            self.assertEqual(exporter.dropped, 1)
+        exporter.export([Span('rapic.request', 'trace', None, 0, 1)])
+        exporter.close()
+        self.assertEqual(exporter.dropped, 1)
+        self.assertEqual(self.server.requests_seen, ['/v1/traces'])
+
+    def test_dry_run(self):
+        api = self.get_client(metrics=True)
+        request = api.get_anything(url_data={'item_id': 1}, dry_run=True)
+        self.assertIs(request.metrics, api.metrics)
+        stages = {labels['stage'] for _, labels, _ in api.metrics.registry.collect(STAGE_METRIC)}
+        self.assertNotIn('network', stages)
+
+    def test_async_metrics(self):
+        api = self.get_client(client_class=AsyncAPIClient, client_name='metrics_async', metrics=True)
+
+        async def run():
+            async with api:
+                return await asyncio.gather(*[api.get_anything(url_data={'item_id': i}) for i in range(3)])
+
+        asyncio.run(run())
+        registry = api.metrics.registry
+        network = registry.get(STAGE_METRIC, client='metrics_async', request='get_anything', stage='network')
+        self.assertEqual(network.count, 3)
+        hook = registry.get(HOOK_METRIC, client='metrics_async', request='get_anything', hook_type='response',
+                            hook='%s.async_response_hook' % __name__)
+        self.assertEqual(hook.count, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+"""Tests for rapic nested json loading."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from rapic.client import APIClient
+from rapic.tools import json_loads_nested, load_json_nested_file
+
+DOCUMENT = {
+    'nested': {
+        'host': 'localhost',
+        'scheme': 'http',
+        'pages': ['page_1'],
+        'get_user': {'path': '/users', 'method': 'POST', 'data': json.dumps({'user': json.dumps({'id': 1}),
+                                                                            'count': '2'}),
+                     'headers': {'X-Id': '42', 'X-Flag': ' true ', 'X-Text': 'nothing', 'X-Empty': ''},
+                     'url_query': {'filter': '["a", "b"]', 'bad': '{not json'}},
+        'page_1': {'request_1': {'path': '/items', 'method': 'POST', 'data': '{"item": "{\\"id\\": 2}"}',
+                                 'note': '[1, 2]'}},
+    }
+}
+
+
+def flatten_hook_reference(obj):
+    """Expansion of every string value, the behaviour of auto mode"""
+    for key, value in obj.items():
+        if isinstance(value, str):
+            try:
+                obj[key] = json.loads(value, object_hook=flatten_hook_reference)
+            except ValueError:
+                pass
+    return obj
+
+
+class TestRapicClientNested(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.client_file = os.path.join(self.directory, 'client.json')
+        with open(self.client_file, 'w') as f:
+            json.dump(DOCUMENT, f)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_auto_mode_expands_every_string(self):
+        data = json.dumps(DOCUMENT)
+        expected = json.loads(data, object_hook=flatten_hook_reference)
+        self.assertEqual(json_loads_nested(data), expected)
+        request = expected['nested']['get_user']
+        self.assertEqual(request['data'], {'user': {'id': 1}, 'count': 2})
+        self.assertEqual(request['headers'], {'X-Id': 42, 'X-Flag': True, 'X-Text': 'nothing', 'X-Empty': ''})
+
+    def test_declared_fields(self):
+        data = json.dumps(DOCUMENT)
+        client = json_loads_nested(data, ['data'])['nested']
+        self.assertEqual(client['get_user']['data'], {'user': '{"id": 1}', 'count': '2'})
+        self.assertEqual(client['page_1']['request_1']['data'], {'item': '{"id": 2}'})
+        self.assertEqual(client['get_user']['headers']['X-Id'], '42')
+        self.assertEqual(client['page_1']['request_1']['note'], '[1, 2]')
+        client = json_loads_nested(data, ['data', 'item', 'user'])['nested']
+        self.assertEqual(client['get_user']['data'], {'user': {'id': 1}, 'count': '2'})
+        self.assertEqual(client['page_1']['request_1']['data'], {'item': {'id': 2}})
+
+    def test_json_paths(self):
+        data = json.dumps(DOCUMENT)
+        client = json_loads_nested(data, ['nested.*.url_query.filter', 'nested.page_1.*.note'])['nested']
+        self.assertEqual(client['get_user']['url_query'], {'filter': ['a', 'b'], 'bad': '{not json'})
+        self.assertEqual(client['page_1']['request_1']['note'], [1, 2])
+        self.assertIsInstance(client['get_user']['data'], str)
+
+    def test_expanded_file_is_cached(self):
+        cache_dir = os.path.join(self.directory, 'cache')
+        expected = json_loads_nested(json.dumps(DOCUMENT), ['data'])
+        self.assertEqual(load_json_nested_file(self.client_file, ['data'], cache_dir), expected)
+        cache_files = os.listdir(cache_dir)
+        self.assertEqual(len(cache_files), 1)
+        # Later loads read the cached document instead of expanding the file again
+        with open(os.path.join(cache_dir, cache_files[0]), 'w') as f:
+            json.dump({'cached': True}, f)
+        self.assertEqual(load_json_nested_file(self.client_file, ['data'], cache_dir), {'cached': True})
+        # Other fields or a changed file are cached separately
+        self.assertEqual(load_json_nested_file(self.client_file, None, cache_dir), json_loads_nested(json.dumps(DOCUMENT)))
+        with open(self.client_file, 'w') as f:
+            json.dump(DOCUMENT, f, indent=1)
+        self.assertEqual(load_json_nested_file(self.client_file, ['data'], cache_dir), expected)
+        self.assertEqual(len(os.listdir(cache_dir)), 3)
+
+    def test_client_loads_nested_fields(self):
+        cache_dir = os.path.join(self.directory, 'cache')
+        api = APIClient('nested', self.client_file, loads_nested=['data', 'user'], nested_cache=cache_dir)
+        self.assertEqual(api.get_request_data('get_user')['data'], {'user': {'id': 1}, 'count': '2'})
+        self.assertEqual(len(os.listdir(cache_dir)), 1)
+        api = APIClient('nested', self.client_file, loads_nested=True)
+        self.assertEqual(api.get_request_data('request_1')['data'], {'item': {'id': 2}})
+
+
+if __name__ == '__main__':
+    unittest.main()
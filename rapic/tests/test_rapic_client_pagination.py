@@ -0,0 +1,115 @@
+"""Tests for rapic Client pagination."""
+import asyncio
+import threading
+import unittest
+from rapic.async_client import AsyncAPIClient
+from rapic.exceptions import RapicException
+from rapic.pagination import LinkPaginator, Paginator
+from rapic.tests.server import LocalServerTestCase
+
+OFFSET = {'type': 'offset', 'items': 'data.items', 'limit': 10, 'total': 'count'}
+PAGE = {'type': 'page', 'items': 'data.items', 'limit_param': 'limit', 'limit': 10, 'total': 'count'}
+LINK = {'type': 'link', 'items': 'data.items'}
+CURSOR = {'type': 'cursor', 'items': 'data.items', 'next': 'next_cursor', 'total': None}
+
+
+class TestRapicClientPagination(LocalServerTestCase):
+
+    def get_ids(self, items):
+        return [item['id'] for item in items]
+
+    def test_cursor_pagination(self):
+        api = self.get_client()
+        self.assertEqual(self.get_ids(api.iterate('list_items')), list(range(25)))
+        self.assertEqual(len(self.server.requests_seen), 3)
+
+    def test_call_arguments_are_kept(self):
+        api = self.get_client()
+        items = api.iterate('list_items', url_query={'total': 7, 'limit': 3})
+        self.assertEqual(self.get_ids(items), list(range(7)))
+
+    def test_offset_and_page_pagination(self):
+        api = self.get_client()
+        for pagination in (OFFSET, PAGE, LINK):
+            self.assertEqual(self.get_ids(api.iterate('list_items', pagination=pagination)), list(range(25)))
+        self.assertEqual(self.get_ids(api.iterate('list_items', pagination=OFFSET, url_query={'total': 20})),
+                         list(range(20)))
+
+    def test_max_pages(self):
+        api = self.get_client()
+        self.assertEqual(self.get_ids(api.iterate('list_items', max_pages=2)), list(range(20)))
+        self.assertEqual(self.get_ids(api.iterate('list_items', pagination=PAGE, max_pages=1, prefetch=3)),
+                         list(range(10)))
+        self.assertEqual(len(self.server.requests_seen), 3)
+
+    def test_pages_are_lazy(self):
+        """Without prefetch the next page is requested when the caller asks for it"""
+        api = self.get_client()
+        items = api.iterate('list_items', prefetch=0)
+        self.assertEqual(next(items)['id'], 0)
+        self.assertEqual(len(self.server.requests_seen), 1)
+        items.close()
+
+    def test_prefetch_is_capped(self):
+        api = self.get_client()
+        pages = api.iterate_pages('list_items', pagination=PAGE, prefetch=2, url_query={'total': 100})
+        response, items = next(pages)
+        self.assertEqual(self.get_ids(items), list(range(10)))
+        # The current page and 2 pages ahead
+        self.assertLessEqual(len(self.server.requests_seen), 3)
+        pages.close()
+
+    def test_prefetch_stops_at_the_last_page(self):
+        """Pages are only requested ahead when the total shows that they exist, no page after the last is requested"""
+        api = self.get_client()
+        for pagination in (OFFSET, PAGE, dict(PAGE, total=None), CURSOR):
+            del self.server.requests_seen[:]
+            self.assertEqual(self.get_ids(api.iterate('list_items', pagination=pagination, prefetch=5)),
+                             list(range(25)))
+            self.assertEqual(len(self.server.requests_seen), 3)
+
+    def test_paginators_are_abstract(self):
+        with self.assertRaises(TypeError):
+            Paginator({})
+        self.assertIsNone(LinkPaginator({}).predict_call({}, None))
+
+    def test_prefetch_runs_while_consuming(self):
+        """The next cursor page is requested in another thread while the current page is consumed"""
+        api = self.get_client()
+        threads = set()
+
+        def record_thread(self, response, **kwargs):
+            threads.add(threading.current_thread().name)
+            return response
+
+        api.register_client_hooks(api.RESPONSE_OBJ_HOOK_TYPE, ['list_items'], 'local', record_thread)
+        try:
+            list(api.iterate('list_items'))
+        finally:
+            api.HOOK_STORE[api.RESPONSE_OBJ_HOOK_TYPE]['local'].pop('list_items')
+            api.hook_dispatch.clear()
+        self.assertNotIn(threading.current_thread().name, threads)
+
+    def test_missing_pagination(self):
+        api = self.get_client()
+        with self.assertRaises(RapicException):
+            list(api.iterate('get_status'))
+        with self.assertRaises(RapicException):
+            list(api.iterate('list_items', pagination={'type': 'unknown'}))
+
+    def test_async_iterate(self):
+        api = self.get_client(client_class=AsyncAPIClient)
+
+        async def run():
+            async with api:
+                cursor_items = [item async for item in api.iterate('list_items')]
+                offset_items = [item async for item in api.iterate('list_items', pagination=OFFSET, prefetch=2)]
+                lazy_items = [item async for item in api.iterate('list_items', pagination=LINK, prefetch=0)]
+                return cursor_items, offset_items, lazy_items
+
+        for items in asyncio.run(run()):
+            self.assertEqual(self.get_ids(items), list(range(25)))
+
+
+if __name__ == '__main__':
+    unittest.main()
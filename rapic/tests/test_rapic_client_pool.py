@@ -0,0 +1,48 @@
+"""Tests for rapic Client connection pools."""
+import json
+import os
+import tempfile
+from rapic.tests.server import LocalServerTestCase
+
+
+class TestRapicClientPool(LocalServerTestCase):
+
+    def test_pool_can_be_configured_in_json_file(self):
+        """connection_pool in the client json file configures the session adapters"""
+        with open(self.local_file) as f:
+            client = json.load(f)
+        client['connection_pool'] = {'max_per_host': 50, 'max_hosts': 3}
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as f:
+            json.dump(client, f)
+        api = self.get_client(request_file=f.name, connection_pool={'block': True})
+        os.unlink(f.name)
+        adapter = api.request.session.get_adapter('https://example.com')
+        self.assertEqual(adapter._pool_maxsize, 50)
+        self.assertEqual(adapter._pool_connections, 3)
+        self.assertTrue(adapter._pool_block)
+        api.close()
+
+    def test_pool_stats_count_reused_connections(self):
+        """Connections are kept alive and reused between requests"""
+        api = self.get_client()
+        for i in range(5):
+            self.assertEqual(api.get_anything(url_data={'item_id': i}).status_code, 200)
+        self.assertEqual(api.get_pool_stats(), {'opened': 1, 'reused': 4, 'discarded': 0})
+        api.close()
+
+    def test_pool_stats_count_discarded_connections(self):
+        """Connections are discarded when more requests run together than the pool can keep"""
+        api = self.get_client(connection_pool={'max_per_host': 1})
+        calls = [{'url_data': {'item_id': i}} for i in range(40)]
+        list(api.perform_many('get_anything', calls, concurrency=8))
+        stats = api.get_pool_stats()
+        self.assertGreater(stats['opened'], 1)
+        self.assertGreater(stats['discarded'], 0)
+        api.close()
+
+    def test_keep_alive_can_be_disabled(self):
+        """Connection: close is sent when keep_alive is disabled"""
+        api = self.get_client(connection_pool={'keep_alive': False})
+        response = api.get_anything(url_data={'item_id': 1})
+        self.assertEqual(response.json()['headers']['Connection'], 'close')
+        api.close()
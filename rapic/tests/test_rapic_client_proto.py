@@ -0,0 +1,98 @@
+"""Tests for rapic compiled protobuf typedefs."""
+import asyncio
+import unittest
+import blackboxprotobuf
+from rapic.async_client import AsyncAPIClient
+from rapic.tests.server import LocalServerTestCase
+from rapic.tools.proto import CompiledTypedef, compile_typedef
+
+TYPEDEF = {
+    '1': {'type': 'int', 'name': 'id'},
+    '2': {'type': 'bytes', 'name': ''},
+    '3': {'type': 'message', 'name': 'user', 'message_typedef': {
+        '1': {'type': 'bytes', 'name': ''},
+        '2': {'type': 'packed_int', 'name': ''},
+    }},
+    '4': {'type': 'fixed32', 'name': ''},
+    '5': {'type': 'double', 'name': 'score'},
+    '6': {'type': 'sint', 'name': ''},
+    '7': {'type': 'group', 'name': '', 'group_typedef': {'1': {'type': 'int', 'name': ''}}},
+}
+DATA = {'id': 150, '2': 'hello', 'user': [{'1': 'a', '2': [1, 2, 300]}, {'1': 'b', '2': [5]}],
+        '4': 7, 'score': 1.5, '6': [-3, 4]}
+
+
+class TestCompiledTypedef(unittest.TestCase):
+
+    def test_encode_same_as_blackboxprotobuf(self):
+        compiled = CompiledTypedef(TYPEDEF)
+        self.assertEqual(compiled.encode(DATA), blackboxprotobuf.encode_message(DATA, TYPEDEF))
+        self.assertEqual(compiled.encode({1: 5}), blackboxprotobuf.encode_message({1: 5}, TYPEDEF))
+
+    def test_encode_group(self):
+        self.assertEqual(CompiledTypedef(TYPEDEF).encode({'7': {'1': 3}}), b'\x3b\x08\x03\x3c')
+
+    def test_decode(self):
+        message = bytes(blackboxprotobuf.encode_message(DATA, TYPEDEF))
+        decoded = CompiledTypedef(TYPEDEF).decode(message)
+        self.assertEqual(decoded, {'id': 150, '2': b'hello', 'user': [{'1': b'a', '2': [1, 2, 300]}, {'1': b'b', '2': [5]}],
+                                   '4': 7, 'score': 1.5, '6': [-3, 4]})
+
+    def test_decode_unknown_fields_like_blackboxprotobuf(self):
+        message = bytes(blackboxprotobuf.encode_message(DATA, TYPEDEF))
+        expected, typedef = blackboxprotobuf.decode_message(message)
+        self.assertEqual(CompiledTypedef({}).decode(message), expected)
+        self.assertEqual(CompiledTypedef({'1': {'type': 'int', 'name': ''}}).decode(message), expected)
+        self.assertEqual(CompiledTypedef(typedef).decode(message), expected)
+
+    def test_invalid_fields(self):
+        compiled = CompiledTypedef(TYPEDEF)
+        with self.assertRaises(ValueError):
+            compiled.encode({'missing': 1})
+        with self.assertRaises(ValueError) as context:
+            compiled.encode({'id': 'not a number'})
+        self.assertEqual(len(context.exception.args), 1)
+        self.assertIsNotNone(context.exception.__cause__)
+        with self.assertRaises(ValueError):
+            CompiledTypedef({'1': {'name': ''}}).encode({'1': 1})
+
+    def test_typedefs_are_compiled_once(self):
+        self.assertIs(compile_typedef(TYPEDEF), compile_typedef(TYPEDEF))
+        self.assertIsNot(compile_typedef(TYPEDEF), compile_typedef(dict(TYPEDEF)))
+
+
+class TestRapicClientProto(LocalServerTestCase):
+
+    def test_request_is_encoded_and_response_decoded(self):
+        api = self.get_client()
+        typedef = api.client['post_proto']['typedef']
+        response = api.post_proto()
+        self.assertEqual(response.content, bytes(blackboxprotobuf.encode_message(api.client['post_proto']['data'], typedef)))
+        self.assertEqual(response.rapic_proto, {'id': 150, 'name': b'rapic', '3': {'1': b'nested'}})
+        response = api.post_proto(data={'id': 1})
+        self.assertEqual(response.rapic_proto['id'], 1)
+        # Every call uses the typedef compiled for the request
+        self.assertIs(api.get_request_plan('post_proto').new_request_data()['typedef'], typedef)
+
+    def test_response_typedef(self):
+        api = self.get_client()
+        api.client['post_proto']['response_typedef'] = {'1': {'type': 'int', 'name': 'code'}}
+        self.assertEqual(api.post_proto().rapic_proto['code'], 150)
+
+    def test_other_responses_are_not_decoded(self):
+        api = self.get_client()
+        self.assertIsNone(api.get_anything(url_data={'item_id': 1}).rapic_proto)
+
+    def test_async_client(self):
+        api = self.get_client(client_class=AsyncAPIClient)
+
+        async def run():
+            async with api:
+                return await api.post_proto()
+
+        response = asyncio.run(run())
+        self.assertEqual(response.rapic_proto['id'], 150)
+
+
+if __name__ == '__main__':
+    unittest.main()
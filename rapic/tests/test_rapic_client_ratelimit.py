@@ -0,0 +1,114 @@
+"""Tests for rapic Client rate limits."""
+import asyncio
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from rapic.async_client import AsyncAPIClient
+from rapic.connection.ratelimit import TokenBucket
+from rapic.tests.server import LocalServerTestCase
+
+
+class TestRapicClientRateLimit(LocalServerTestCase):
+
+    def test_token_bucket(self):
+        """Burst requests are sent at once and the next ones wait for a token"""
+        bucket = TokenBucket(10, burst=2)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertEqual(bucket.reserve(), 0)
+        self.assertAlmostEqual(bucket.reserve(), 0.1, places=2)
+        self.assertAlmostEqual(bucket.reserve(), 0.2, places=2)
+
+    def test_no_rate_limit(self):
+        api = self.get_client()
+        self.assertEqual(api.get_request_plan('get_anything').rate_limit_buckets, ())
+        self.assertEqual(api.get_anything(url_data={'item_id': 1}).status_code, 200)
+
+    def test_request_rate_limit_across_threads(self):
+        """Requests sent from many threads share the request bucket"""
+        api = self.get_client()
+        api.client['get_anything']['rate_limit'] = {'rps': 20, 'burst': 1}
+        start = time.monotonic()
+        with ThreadPoolExecutor(max_workers=5) as executor:
+            list(executor.map(lambda i: api.get_anything(url_data={'item_id': i}), range(6)))
+        self.assertGreaterEqual(time.monotonic() - start, 0.24)
+        # Other requests are not limited by it
+        self.assertEqual(api.get_request_plan('get_status').rate_limit_buckets, ())
+
+    def test_dry_run_waits_for_rate_limit(self):
+        """Prepared calls are sent with the rate limits of their request"""
+        api = self.get_client()
+        api.client['get_anything']['rate_limit'] = {'rps': 10, 'burst': 1}
+        calls = [api.get_anything(url_data={'item_id': i}, dry_run=True) for i in range(3)]
+        start = time.monotonic()
+        for call in calls:
+            call.run()
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_async_dry_run_waits_for_rate_limit(self):
+        api = self.get_client(client_class=AsyncAPIClient)
+        api.client['get_anything']['rate_limit'] = {'rps': 10, 'burst': 1}
+
+        async def run():
+            async with api:
+                calls = [await api.get_anything(url_data={'item_id': i}, dry_run=True) for i in range(3)]
+                return await asyncio.gather(*[call.run() for call in calls])
+
+        start = time.monotonic()
+        asyncio.run(run())
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+
+    def test_client_and_page_rate_limits(self):
+        """Client limit from the constructor applies to every request and page limits to their requests"""
+        api = self.get_client(rate_limit={'rps': 1000, 'burst': 5})
+        buckets = api.get_request_plan('get_status').rate_limit_buckets
+        self.assertEqual(len(buckets), 1)
+        self.assertEqual(buckets[0].max_rate, 1000)
+        api.client['pages'] = ['page_1']
+        api.client['page_1'] = {'paged_request': {'path': '/anything', 'method': 'GET'},
+                                'rate_limit': {'rps': 10}}
+        paged = api.get_request_plan('paged_request')
+        self.assertEqual(paged.page, 'page_1')
+        self.assertEqual([bucket.max_rate for bucket in paged.rate_limit_buckets], [1000, 10])
+        self.assertIs(paged.rate_limit_buckets[0], buckets[0])
+
+    def test_cached_responses_are_not_limited(self):
+        api = self.get_client()
+        api.client['get_anything']['rate_limit'] = {'rps': 1, 'burst': 1}
+        api.client['get_anything']['cache'] = {'ttl': 60}
+        start = time.monotonic()
+        for _ in range(3):
+            api.get_anything(url_data={'item_id': 1})
+        self.assertLess(time.monotonic() - start, 0.9)
+
+    def test_retry_after(self):
+        """A 429 response pauses the host for Retry-After seconds and slows down the request bucket"""
+        api = self.get_client()
+        api.client['get_status']['rate_limit'] = {'rps': 100}
+        response = api.get_status(url_data={'status': 429}, url_query={'retry_after': '0.3'})
+        self.assertEqual(response.status_code, 429)
+        bucket = api.get_request_plan('get_status').rate_limit_buckets[0]
+        self.assertEqual(bucket.rate, 50)
+        start = time.monotonic()
+        api.get_anything(url_data={'item_id': 1})
+        self.assertGreaterEqual(time.monotonic() - start, 0.2)
+        # Successful responses bring the rate back to the configured one
+        for _ in range(10):
+            api.get_status(url_data={'status': 200})
+        self.assertEqual(bucket.rate, 100)
+
+    def test_async_rate_limit(self):
+        api = self.get_client(client_class=AsyncAPIClient)
+        api.client['get_anything']['rate_limit'] = {'rps': 20, 'burst': 1}
+
+        async def run():
+            async with api:
+                return await asyncio.gather(*[api.get_anything(url_data={'item_id': i}) for i in range(5)])
+
+        start = time.monotonic()
+        responses = asyncio.run(run())
+        self.assertGreaterEqual(time.monotonic() - start, 0.19)
+        self.assertEqual([response.status_code for response in responses], [200] * 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+"""Tests for rapic responses decoding their body views once when first used."""
+import asyncio
+import json
+import os
+import pickle
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import requests
+from rapic import response as rapic_response
+from rapic.async_client import AsyncAPIClient
+from rapic.client import APIClient
+from rapic.hook import APIClientHook
+from rapic.response import RapicResponse
+from rapic.tests.server import LocalServerTestCase
+from rapic.tools import extract_json_path
+
+CLIENT = {
+    'scheme': 'http',
+    'get_items': {'path': '/items', 'method': 'GET', 'url_query': {'limit': '3', 'total': '5'},
+                  'extract': {'ids': 'data.items[*].id', 'first': 'data.items[0].id', 'next': 'next_cursor',
+                              'missing': 'meta.total'}},
+    'get_cached': {'path': '/anything/cached', 'method': 'GET', 'url_query': {'cache_control': 'max-age=60'},
+                   'cache': {'ttl': 60}},
+    'get_status': {'path': '/status/500', 'method': 'GET', 'extract': {'path': 'path'}},
+}
+
+hooked_bodies = []
+
+
+@APIClientHook.hook_client_response('response_hooks', ['get_items'])
+def log_body(self, response, **kwargs):
+    hooked_bodies.append(response.json())
+    return response
+
+
+@APIClientHook.hook_client_response('response_hooks', ['get_items'])
+def map_errors(self, response, **kwargs):
+    hooked_bodies.append(response.json())
+    return response
+
+
+class TestRapicResponse(LocalServerTestCase):
+
+    def setUp(self):
+        super(TestRapicResponse, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.client_file = os.path.join(self.directory, 'client.json')
+        with open(self.client_file, 'w') as f:
+            client = dict(CLIENT, host=self.server.host)
+            json.dump({'response': client, 'response_hooks': client}, f)
+        del hooked_bodies[:]
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TestRapicResponse, self).tearDown()
+
+    def test_json_is_parsed_once(self):
+        api = APIClient('response_hooks', self.client_file)
+        with mock.patch.object(rapic_response, 'json_loads', wraps=rapic_response.json_loads) as json_loads:
+            response = api.get_items()
+            body = response.json()
+        self.assertIsInstance(response, RapicResponse)
+        self.assertEqual(json_loads.call_count, 1)
+        self.assertIs(hooked_bodies[0], body)
+        self.assertIs(hooked_bodies[1], body)
+        self.assertEqual(response.json(parse_float=str)['count'], 5)
+        self.assertIs(response.text, response.text)
+
+    def test_extracted(self):
+        api = APIClient('response', self.client_file)
+        response = api.get_items()
+        self.assertEqual(response.extracted, {'ids': [0, 1, 2], 'first': 0, 'next': '3', 'missing': None})
+        self.assertIs(response.extracted, response.extracted)
+        self.assertEqual(api.get_status().extracted, {'path': '/status/500'})
+        self.assertEqual(api.get_cached().extracted, {})
+        # Bodies that are not json extract nothing
+        response = requests.Response()
+        response._content = b'<html>'
+        response = RapicResponse.from_response(response, extract={'path': 'path'})
+        self.assertEqual(response.extracted, {'path': None})
+        with self.assertRaises(ValueError):
+            response.json()
+
+    def test_text_follows_encoding(self):
+        response = requests.Response()
+        response._content = 'café'.encode('utf8')
+        response.encoding = 'utf-8'
+        response = RapicResponse.from_response(response)
+        self.assertEqual(response.text, 'café')
+        response.encoding = 'latin-1'
+        self.assertEqual(response.text, 'cafÃ©')
+        response._content = json.dumps({'name': 'café'}).encode('utf-16')
+        response.encoding = 'utf-16'
+        self.assertEqual(response.json(), {'name': 'café'})
+
+    def test_cached_responses(self):
+        api = APIClient('response', self.client_file)
+        first = api.get_cached()
+        second = api.get_cached()
+        self.assertTrue(second.from_cache)
+        self.assertEqual(first.json(), second.json())
+        self.assertIsNot(first.json(), second.json())
+        # Responses kept by the cache are not wrapped
+        entry = next(iter(api.request.cache.store.entries.values()))
+        self.assertIs(type(entry.response), requests.Response)
+        copied = pickle.loads(pickle.dumps(second))
+        self.assertEqual(copied.json(), second.json())
+        self.assertEqual(copied.rapic_extract, None)
+
+    def test_async_client(self):
+        async def run():
+            async with AsyncAPIClient('response', self.client_file) as api:
+                return await api.get_items()
+
+        response = asyncio.run(run())
+        self.assertIsInstance(response, RapicResponse)
+        self.assertEqual(response.extracted['ids'], [0, 1, 2])
+
+    def test_extract_json_path(self):
+        data = {'pages': [{'items': [{'id': 1}, {'id': 2}]}, {'items': [{'id': 3}]}], 'meta': {'a': 1, 'b': 2}}
+        self.assertEqual(extract_json_path(data, 'pages[*].items[*].id'), [1, 2, 3])
+        self.assertEqual(extract_json_path(data, 'meta.*'), [1, 2])
+        self.assertEqual(extract_json_path(data, 'pages[1].items[0].id'), 3)
+        self.assertEqual(extract_json_path(data, 'pages[*].name'), [])
+        self.assertIsNone(extract_json_path(data, 'meta.c'))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,123 @@
+"""Tests for rapic Client retry policy."""
+import asyncio
+import unittest
+import requests
+from rapic.async_client import AsyncAPIClient
+from rapic.connection.retry import RetryPolicy
+from rapic.exceptions import RapicException
+from rapic.hook import APIClientHook
+from rapic.tests.server import LocalServerTestCase
+
+FAST_RETRY = {'max_attempts': 3, 'backoff': 0.01, 'jitter': False}
+
+
+class TestRapicClientRetry(LocalServerTestCase):
+
+    def test_retry_policy(self):
+        policy = RetryPolicy(max_attempts=4, backoff=1, max_backoff=3, jitter=False)
+        self.assertEqual([policy.get_delay(attempt) for attempt in (1, 2, 3)], [1, 2, 3])
+        response = requests.Response()
+        response.status_code = 503
+        self.assertEqual(policy.next_delay(1, 'GET', response), 1)
+        self.assertIsNone(policy.next_delay(4, 'GET', response))
+        self.assertIsNone(policy.next_delay(1, 'POST', response))
+        self.assertEqual(policy.next_delay(1, 'GET', exception=requests.exceptions.ConnectTimeout()), 1)
+        self.assertIsNone(policy.next_delay(1, 'GET', exception=ValueError()))
+        response.status_code = 404
+        self.assertIsNone(policy.next_delay(1, 'GET', response))
+        response.status_code = 429
+        response.headers['Retry-After'] = '2.5'
+        self.assertEqual(policy.next_delay(1, 'GET', response), 2.5)
+        self.assertIsNone(RetryPolicy(methods='*').next_delay(3, 'POST', response))
+        self.assertIsNotNone(RetryPolicy(methods='*').next_delay(1, 'POST', response))
+
+    def test_no_retry_by_default(self):
+        api = self.get_client()
+        response = api.get_anything(url_data={'item_id': 1}, url_query={'fail_times': 1})
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(hasattr(response, 'rapic_retries'))
+
+    def test_retry_until_success(self):
+        api = self.get_client(retry=FAST_RETRY)
+        response = api.get_anything(url_data={'item_id': 1}, url_query={'fail_times': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.rapic_retries, 2)
+        self.assertEqual(response.rapic_retry_delays, [0.01, 0.02])
+        self.assertEqual(len(self.server.requests_seen), 3)
+
+    def test_retry_gives_up(self):
+        api = self.get_client(retry=FAST_RETRY)
+        response = api.get_anything(url_data={'item_id': 1}, url_query={'fail_times': 5})
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.rapic_retries, 2)
+
+    def test_non_idempotent_methods_are_not_retried(self):
+        api = self.get_client(retry=FAST_RETRY)
+        api.client['post_anything']['path'] = '/status/503'
+        response = api.post_anything()
+        self.assertEqual(response.rapic_retries, 0)
+        self.assertEqual(len(self.server.requests_seen), 1)
+
+    def test_request_retry_overrides_client(self):
+        """Request retry is merged over the client one and false disables it"""
+        api = self.get_client(retry=FAST_RETRY)
+        api.client['get_anything']['retry'] = {'max_attempts': 5}
+        api.client['get_status']['retry'] = False
+        policy = api.get_request_plan('get_anything').retry_policy
+        self.assertEqual((policy.max_attempts, policy.backoff), (5, 0.01))
+        self.assertIsNone(api.get_request_plan('get_status').retry_policy)
+
+    def test_retry_true_uses_defaults(self):
+        policy = self.get_client(retry=True).retry_policy
+        self.assertEqual((policy.max_attempts, policy.backoff), (3, 0.5))
+        api = self.get_client(retry=FAST_RETRY)
+        api.client['get_anything']['retry'] = True
+        self.assertIs(api.get_request_plan('get_anything').retry_policy, api.retry_policy)
+        with self.assertRaises(RapicException):
+            self.get_client(retry=3)
+
+    def test_connection_errors(self):
+        api = self.get_client(retry=FAST_RETRY)
+        api.client['host'] = '127.0.0.1:1'
+        with self.assertRaises(requests.exceptions.ConnectionError) as error:
+            api.get_anything(url_data={'item_id': 1})
+        self.assertEqual(error.exception.rapic_retries, 2)
+
+    def test_prepared_request_hooks_run_for_every_attempt(self):
+        """Hooks get a fresh copy of the prepared request for every attempt and response hooks run once"""
+        attempts = []
+        responses = []
+
+        def sign(self, prepared_request, **kwargs):
+            attempts.append(prepared_request.headers.get('X-Signature'))
+            prepared_request.headers['X-Signature'] = 'signed-%s' % len(attempts)
+            return prepared_request
+
+        def record(self, response, **kwargs):
+            responses.append(response.status_code)
+            return response
+
+        APIClientHook.register_client_hooks(APIClientHook.REQUESTS_OBJ_HOOK_TYPE, ['get_anything'], 'retry_hooks',
+                                            sign)
+        APIClientHook.register_client_hooks(APIClientHook.RESPONSE_OBJ_HOOK_TYPE, ['get_anything'], 'retry_hooks',
+                                            record)
+        api = self.get_client(client_name='retry_hooks', retry=FAST_RETRY)
+        response = api.get_anything(url_data={'item_id': 1}, url_query={'fail_times': 2})
+        self.assertEqual(attempts, [None, None, None])
+        self.assertEqual(response.json()['headers']['X-Signature'], 'signed-3')
+        self.assertEqual(responses, [200])
+
+    def test_async_retry(self):
+        api = self.get_client(client_class=AsyncAPIClient, retry=FAST_RETRY)
+
+        async def run():
+            async with api:
+                return await api.get_anything(url_data={'item_id': 1}, url_query={'fail_times': 1})
+
+        response = asyncio.run(run())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.rapic_retries, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,128 @@
+"""Tests for rapic Client streamed responses."""
+import asyncio
+import json
+import unittest
+from rapic.async_client import AsyncAPIClient
+from rapic.hook import APIClientHook
+from rapic.tests.server import LocalServerTestCase
+from rapic.tools.stream import RecordParser, RecordStream, iter_json_array, iter_ndjson, iter_records
+
+
+@APIClientHook.hook_client_stream_record('stream_hooks', ['get_records'])
+def keep_even_records(self, record, **kwargs):
+    if record['id'] % 2:
+        return None
+    record['hooked'] = True
+    return record
+
+
+@APIClientHook.hook_client_stream_record('stream_hooks_async', ['get_records'])
+async def async_stream_record_hook(self, record, **kwargs):
+    record['hooked'] = True
+    return record
+
+
+def split(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+class TestRecordParser(unittest.TestCase):
+
+    def test_json_array_split_anywhere(self):
+        records = [{'id': i, 'text': 'é' * i, 'nested': [1, {'a': None}]} for i in range(20)] + [12345, 1.5, 'x', True]
+        data = json.dumps(records, ensure_ascii=False).encode('utf8')
+        for size in (1, 2, 5, 64, len(data)):
+            self.assertEqual(list(iter_json_array(split(data, size))), records)
+
+    def test_ndjson(self):
+        data = b'{"id": 1}\n\n{"id": 2}\r\n{"id": 3}'
+        self.assertEqual(list(iter_ndjson(split(data, 3))), [{'id': 1}, {'id': 2}, {'id': 3}])
+
+    def test_long_ndjson_line_is_searched_once(self):
+        parser = RecordParser(format='ndjson')
+        self.assertEqual(parser.feed(b'{"text": "' + b'a' * 100), [])
+        self.assertEqual(parser.searched_length, 110)
+        self.assertEqual(parser.feed(b'a' * 100 + b'"}\n{"id"'), [{'text': 'a' * 200}])
+        self.assertEqual(parser.searched_length, 5)
+        self.assertEqual(parser.feed(b': 1}'), [])
+        self.assertEqual(parser.close(), [{'id': 1}])
+
+    def test_auto_format(self):
+        self.assertEqual(list(iter_records([b'  [1, 2]'])), [1, 2])
+        self.assertEqual(list(iter_records([b'{"id": 1}\n{"id": 2}\n'])), [{'id': 1}, {'id': 2}])
+        self.assertEqual(list(iter_records([b'[]'])), [])
+        self.assertEqual(list(iter_records([])), [])
+
+    def test_records_are_decoded_incrementally(self):
+        parser = RecordParser()
+        self.assertEqual(parser.feed(b'[{"id": 1}, {"id"'), [{'id': 1}])
+        self.assertEqual(parser.feed(b': 2}, 3'), [{'id': 2}])
+        self.assertEqual(parser.feed(b'4]'), [34])
+        self.assertEqual(parser.close(), [])
+
+    def test_invalid_bodies(self):
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[{"id": 1}, {"id": 2}']))
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'{"id": 1}']))
+        with self.assertRaises(ValueError):
+            list(iter_json_array([b'[1 2]']))
+
+
+class TestRapicClientStream(LocalServerTestCase):
+
+    def test_stream_json_array(self):
+        api = self.get_client()
+        records = api.get_records(url_data={'total': 1000})
+        self.assertIsInstance(records, RecordStream)
+        self.assertEqual(records.status_code, 200)
+        self.assertEqual([record['id'] for record in records], list(range(1000)))
+
+    def test_stream_ndjson_from_call(self):
+        """stream given to the call replaces the request one"""
+        api = self.get_client()
+        records = api.get_anything(url_data={'item_id': 1}, stream={'format': 'ndjson', 'chunk_size': 16})
+        self.assertEqual(len(list(records)), 1)
+        records = api.get_records(url_data={'total': 5}, url_query={'format': 'ndjson'}, stream={'chunk_size': 8})
+        self.assertEqual([record['id'] for record in records], [0, 1, 2, 3, 4])
+        response = api.get_records(url_data={'total': 2}, stream=False)
+        self.assertEqual(len(response.json()), 2)
+
+    def test_stream_is_not_cached(self):
+        api = self.get_client()
+        api.client['get_records']['cache'] = {'ttl': 60}
+        list(api.get_records(url_data={'total': 2}))
+        list(api.get_records(url_data={'total': 2}))
+        self.assertEqual(len(self.server.requests_seen), 2)
+
+    def test_stream_record_hooks(self):
+        api = self.get_client(client_name='stream_hooks')
+        with api.get_records(url_data={'total': 6}) as records:
+            self.assertEqual(list(records), [{'id': i, 'name': 'record %s' % i, 'hooked': True} for i in (0, 2, 4)])
+
+    def test_connection_is_reused_after_stream(self):
+        api = self.get_client(connection_pool={'max_per_host': 1})
+        list(api.get_records(url_data={'total': 10}))
+        list(api.get_records(url_data={'total': 10}))
+        self.assertEqual(api.get_pool_stats()['opened'], 1)
+
+    def test_async_stream(self):
+        api = self.get_client(client_class=AsyncAPIClient, client_name='stream_hooks_async')
+
+        async def run():
+            async with api:
+                ids = []
+                async with await api.get_records(url_data={'total': 100}) as records:
+                    async for record in records:
+                        self.assertTrue(record['hooked'])
+                        ids.append(record['id'])
+                response = await api.get_anything(url_data={'item_id': 1})
+                return ids, response.json()
+
+        ids, data = asyncio.run(run())
+        self.assertEqual(ids, list(range(100)))
+        self.assertEqual(data['path'], '/anything/1')
+
+
+if __name__ == '__main__':
+    unittest.main()
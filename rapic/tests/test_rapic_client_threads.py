@@ -0,0 +1,87 @@
+"""Tests for rapic Client shared by threads."""
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from rapic.hook import APIClientHook
+from rapic.tests.server import LocalServerTestCase
+
+THREADS = 16
+CALLS = 25
+
+
+@APIClientHook.hook_client_header('threads', ['get_anything'])
+def add_thread_header(self, headers, **kwargs):
+    headers['X-Thread'] = threading.current_thread().name
+    return headers
+
+
+class TestRapicClientThreads(LocalServerTestCase):
+
+    client_name = 'threads'
+
+    def test_shared_client_stress(self):
+        """Calls from many threads over one client only see their own data and reuse the pooled connections"""
+        api = self.get_client(connection_pool={'max_per_host': THREADS})
+        start = threading.Barrier(THREADS)
+
+        def worker(thread):
+            start.wait()
+            for call in range(CALLS):
+                item = '%s-%s' % (thread, call)
+                if call % 5 == 0:
+                    req = api.get_anything(url_data={'item_id': item}, headers={'X-Item': item}, dry_run=True,
+                                           timeout=10)
+                    self.assertEqual(req.request_kwargs['timeout'], 10)
+                    body = req.run().json()
+                else:
+                    body = api.get_anything(url_data={'item_id': item}, url_query={'item': item},
+                                            headers={'X-Item': item}).json()
+                    self.assertEqual(body['args']['item'], item)
+                self.assertEqual(body['path'], '/anything/%s' % item)
+                self.assertEqual(body['headers']['X-Item'], item)
+                self.assertEqual(body['headers']['X-Thread'], threading.current_thread().name)
+                response = api.post_anything(json={'item': item})
+                self.assertEqual(response.json()['data'], '{"name": "rapic", "item": "%s"}' % item)
+            return thread
+
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            self.assertEqual(list(executor.map(worker, range(THREADS))), list(range(THREADS)))
+        self.assertEqual(len(self.server.requests_seen), THREADS * CALLS * 2)
+        self.assertLessEqual(api.get_pool_stats()['opened'], THREADS)
+        # Calls never change the stored requests or the request client
+        self.assertEqual(api.client['post_anything']['data'], {'name': 'rapic'})
+        self.assertEqual(api.request.request_kwargs, {})
+        self.assertIsNone(api.request.prepared_request)
+
+    def test_plans_are_compiled_once(self):
+        api = self.get_client()
+        start = threading.Barrier(THREADS)
+
+        def get_plan(_):
+            start.wait()
+            return api.get_request_plan('get_anything')
+
+        with ThreadPoolExecutor(max_workers=THREADS) as executor:
+            plans = set(executor.map(get_plan, range(THREADS)))
+        self.assertEqual(plans, {api.get_request_plan('get_anything')})
+
+    def test_dry_run_shares_session(self):
+        api = self.get_client()
+        req = api.get_anything(url_data={'item_id': 1}, dry_run=True, timeout=5)
+        self.assertIs(req.session, api.request.session)
+        self.assertIsNot(req.prepared_request, api.get_anything(url_data={'item_id': 1}, dry_run=True).prepared_request)
+        self.assertEqual(req.run().json()['path'], '/anything/1')
+        self.assertEqual(api.request.request_kwargs, {})
+
+    def test_set_prepared_request(self):
+        """kwargs given with a prepared request are not used by later calls"""
+        api = self.get_client()
+        req = api.get_anything(url_data={'item_id': 2}, dry_run=True)
+        api.request.set_prepared_request(req.prepared_request, timeout=5)
+        self.assertEqual(api.request.run().json()['path'], '/anything/2')
+        self.assertEqual(api.request.request_kwargs, {})
+        self.assertEqual(api.get_anything(url_data={'item_id': 3}).json()['path'], '/anything/3')
+
+
+if __name__ == '__main__':
+    unittest.main()
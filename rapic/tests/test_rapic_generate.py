@@ -0,0 +1,219 @@
+"""Tests for rapic client generator."""
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from rapic.client import APIClient
+from rapic.tools import generate
+from rapic.tools.har import JsonDocumentReader, iter_har_items
+from rapic.tools.normalize import RequestDeduplicator, normalize_path
+from rapic.tools.openapi import yaml
+
+
+class TestRapicGenerate(unittest.TestCase):
+
+    def setUp(self):
+        curr_dir = os.path.dirname(__file__)
+        self.burp_file = os.path.join(curr_dir, 'burp.xml')
+        self.har_file = os.path.join(curr_dir, 'example.har')
+        self.openapi_file = os.path.join(curr_dir, 'openapi.json')
+
+    def test_burp_items_are_parsed(self):
+        """Burp items are converted to rapic requests with their url query, headers and body"""
+        client = generate.burp_request_files('example', [self.burp_file])['example']
+        self.assertEqual(client['pages'], ['burp'])
+        self.assertEqual(client['total_client_requests'], 3)
+        page = client['burp']
+        self.assertEqual(page['request_1']['path'], '/api/users/42')
+        self.assertEqual(page['request_1']['url_query'], {'fields': 'name', 'verbose': '1'})
+        self.assertEqual(page['request_2']['data'], {'username': 'rapic', 'password': 'abc'})
+        self.assertEqual(page['request_3']['data'], '{"note": "hello"}')
+        self.assertTrue(page['request_3']['is_json'])
+        self.assertEqual(page['request_3']['headers']['Authorization'], 'Bearer abc')
+
+    def test_streaming_writer_output(self):
+        """Client file written incrementally is the same as the client built in memory"""
+        output = io.StringIO()
+        generate.write_burp_request_files('example', [self.burp_file, self.burp_file], output)
+        self.assertEqual(json.loads(output.getvalue()),
+                         generate.burp_request_files('example', [self.burp_file, self.burp_file]))
+
+    def test_parallel_generation_is_deterministic(self):
+        """Generating with many processes writes the same client file as a single process"""
+        output = io.StringIO()
+        generate.write_burp_request_files('example', [self.burp_file] * 3, output)
+        parallel_output = io.StringIO()
+        pages = []
+        generate.write_burp_request_files('example', [self.burp_file] * 3, parallel_output, jobs=2, chunk_size=1,
+                                          progress=lambda page, total, seconds: pages.append((page, total)))
+        self.assertEqual(output.getvalue(), parallel_output.getvalue())
+        self.assertEqual(pages, [('burp', 3)] * 3)
+
+    def test_burp_item_ranges(self):
+        """Workers are sent byte ranges of whole items, <item> inside CDATA sections does not start an item"""
+        directory = tempfile.mkdtemp()
+        try:
+            burp_file = os.path.join(directory, 'page.xml')
+            with open(self.burp_file) as f:
+                content = f.read().replace('<![CDATA[{}]]>', '<![CDATA[<items><item>]]>')
+            with open(burp_file, 'w') as f:
+                f.write(content)
+            ranges = list(generate.iter_burp_item_ranges(burp_file, 2))
+            self.assertEqual(len(ranges), 2)
+            self.assertEqual(ranges[0][2], ranges[1][1])
+            requests = [request for file_range in ranges for request in generate.create_burp_range_requests(file_range)]
+            self.assertEqual(requests, [generate.create_request(item) for item in generate.iter_burp_items(burp_file)])
+            self.assertEqual(len(requests), 3)
+        finally:
+            shutil.rmtree(directory)
+
+    def test_empty_burp_file(self):
+        """A burp file without items is written as an empty page"""
+        burp_file = io.BytesIO(b'<?xml version="1.0"?><items burpVersion="2022.1"></items>')
+        output = io.StringIO()
+        writer = generate.ClientFileWriter(output, 'example')
+        writer.start_page('empty')
+        for item in generate.iter_burp_items(burp_file):
+            writer.add_request('request', item)
+        writer.end_page()
+        writer.close()
+        client = json.loads(output.getvalue())['example']
+        self.assertEqual(client['empty'], {'total_requests': 0, 'implicit_requests': []})
+        self.assertEqual(client['total_client_requests'], 0)
+
+    def test_normalize_path(self):
+        """Numeric, uuid and hash like path segments are replaced with url data placeholders"""
+        self.assertEqual(normalize_path('/api/users/42/notes/7'),
+                         ('/api/users/{users_id}/notes/{notes_id}', {'users_id': '42', 'notes_id': '7'}))
+        self.assertEqual(normalize_path('/files/0f8fad5b-d9cb-469f-a165-70867728950e/d41d8cd98f00b204e9800998ecf8427e'),
+                         ('/files/{files_uuid}/{files_hash}', {'files_uuid': '0f8fad5b-d9cb-469f-a165-70867728950e',
+                                                              'files_hash': 'd41d8cd98f00b204e9800998ecf8427e'}))
+        self.assertEqual(normalize_path('/1/2'), ('/{id}/{id_2}', {'id': '1', 'id_2': '2'}))
+        self.assertEqual(normalize_path('/api/v2/users/me'), ('/api/v2/users/me', {}))
+        self.assertEqual(normalize_path('/tokens/aB3dE5fG7hJ9kL1mN3pQ5r'), ('/tokens/{tokens_hash}',
+                                                                        {'tokens_hash': 'aB3dE5fG7hJ9kL1mN3pQ5r'}))
+        self.assertEqual(normalize_path('/keys/8x2k4m9q1z7w3v5n0p6r'), ('/keys/{keys_hash}',
+                                                                     {'keys_hash': '8x2k4m9q1z7w3v5n0p6r'}))
+        # Versioned slugs and resource names are kept
+        for path in ('/docs/release-notes-2024-v2', '/images/ubuntu2204ltsserver', '/models/resnet50-imagenet-v1',
+                     '/packages/python3_requests_2_31_0', '/builds/FirmwareUpdate2024Release'):
+            self.assertEqual(normalize_path(path), (path, {}))
+
+    def test_requests_are_deduplicated(self):
+        """Requests with the same method and path shape are merged with the union of their keys"""
+        dedup = RequestDeduplicator()
+        for user_id in range(10):
+            dedup.add({'method': 'GET', 'host': 'example.com', 'scheme': 'https', 'path': '/users/%s' % user_id,
+                       'url_query': {'page': str(user_id)} if user_id == 3 else {'fields': 'name'},
+                       'headers': {'X-Request-Id': str(user_id)}})
+        dedup.add({'method': 'DELETE', 'host': 'example.com', 'scheme': 'https', 'path': '/users/1',
+                   'url_query': {}, 'headers': {}})
+        requests = dedup.get_requests()
+        self.assertEqual(len(requests), 2)
+        self.assertEqual(requests[0]['path'], '/users/{users_id}')
+        self.assertEqual(requests[0]['url_query'], {'fields': 'name', 'page': '3'})
+        self.assertEqual(requests[0]['headers'], {'X-Request-Id': '0'})
+        # Ids of the first request are the default url data of the group
+        self.assertEqual(requests[0]['url_data'], {'users_id': '0'})
+        self.assertEqual(requests[1]['method'], 'DELETE')
+        self.assertEqual(dedup.get_compression_ratio(), 5.5)
+
+    def test_generator_writes_templated_requests(self):
+        """Generator can merge requests of a page into templated requests"""
+        output = io.StringIO()
+        writer = generate.write_burp_request_files('example', [self.burp_file], output, dedup=True)
+        self.assertEqual(writer.total_source_requests, 3)
+        client = json.loads(output.getvalue())['example']
+        self.assertEqual(client['burp']['request_3']['path'], '/api/users/{users_id}/notes')
+        self.assertEqual(client['burp']['request_3']['url_data'], {'users_id': '42'})
+        # Templated requests are called with the observed ids unless url data is given
+        directory = tempfile.mkdtemp()
+        try:
+            client_file = os.path.join(directory, 'client.json')
+            with open(client_file, 'w') as f:
+                f.write(output.getvalue())
+            api = APIClient('example', client_file)
+            self.assertEqual(api.request_3(dry_run=True).prepared_request.url,
+                             'https://example.com/api/users/42/notes')
+            self.assertEqual(api.request_3(url_data={'users_id': 7}, dry_run=True).prepared_request.url,
+                             'https://example.com/api/users/7/notes')
+        finally:
+            shutil.rmtree(directory)
+
+    def test_har_entries_are_read_incrementally(self):
+        """Entries are decoded one at a time whatever the chunk boundaries"""
+        with open(self.har_file) as f:
+            entries = json.load(f)['log']['entries']
+        for chunk_size in (1, 7, 4096):
+            with open(self.har_file) as f:
+                reader = JsonDocumentReader(f, chunk_size=chunk_size)
+                reader.find(('log', 'entries'))
+                self.assertEqual(list(reader.iter_array()), entries)
+                self.assertLess(len(reader.buffer), 8 * 1024)
+        self.assertEqual([item['method'] for item in iter_har_items(self.har_file)], ['GET', 'POST', 'POST', 'GET'])
+        with self.assertRaises(ValueError):
+            list(iter_har_items(io.StringIO('{"log": {"version": "1.2"}}')))
+
+    def test_har_items_are_converted(self):
+        """HAR requests have the same fields as burp requests, pages are files and ids can be merged"""
+        output = io.StringIO()
+        generate.write_har_request_files('example', [self.har_file], output)
+        page = json.loads(output.getvalue())['example']['example']
+        self.assertEqual(page['total_requests'], 4)
+        self.assertEqual(set(page['request_1']), set(generate.create_request(
+            {'url': 'https://example.com/', 'method': 'GET', 'request': {'#text': 'GET / HTTP/1.1\n', '@base64': 'false'}})))
+        self.assertEqual(page['request_1']['url_query'], {'fields': 'name', 'verbose': '1'})
+        self.assertEqual(page['request_1']['headers'], {'accept': 'application/json', 'cookie': 'a=1; b=2'})
+        self.assertEqual(page['request_2']['data'], {'username': 'rapic', 'password': 'a&c'})
+        self.assertEqual(page['request_3']['data'], '{"note": "hello"}')
+        self.assertTrue(page['request_3']['is_json'])
+        parallel_output = io.StringIO()
+        generate.write_har_request_files('example', [self.har_file], parallel_output, jobs=2, chunk_size=1)
+        self.assertEqual(output.getvalue(), parallel_output.getvalue())
+        output = io.StringIO()
+        writer = generate.write_har_request_files('example', [self.har_file], output, dedup=True)
+        self.assertEqual((writer.total_source_requests, writer.total_client_requests), (4, 3))
+        page = json.loads(output.getvalue())['example']['example']
+        self.assertEqual(page['request_1']['path'], '/api/users/{users_id}')
+        self.assertEqual(page['request_1']['url_query'], {'fields': 'name', 'verbose': '1', 'page': '2'})
+
+    def test_openapi_operations_are_converted(self):
+        """Operations are named by operationId in pages of their tag with values from examples and defaults"""
+        output = io.StringIO()
+        generate.write_openapi_request_files('example', [self.openapi_file, self.openapi_file], output)
+        client = json.loads(output.getvalue())['example']
+        self.assertEqual(client['pages'], ['users', 'notes', 'default'])
+        users = client['users']
+        self.assertEqual(list(users), ['getUser', 'delete_users_user_id', 'getUser_2', 'delete_users_user_id_2',
+                                       'total_requests', 'implicit_requests'])
+        get_user = users['getUser']
+        self.assertEqual((get_user['scheme'], get_user['host'], get_user['path']),
+                         ('https', 'eu.example.com', '/v1/users/{user_id}'))
+        self.assertEqual(get_user['url_query'], {'fields': 'name'})
+        self.assertEqual(get_user['headers'], {'Authorization': 'Bearer ', 'X-Trace': 'abc'})
+        self.assertEqual(users['delete_users_user_id']['headers'], {})
+        note = client['notes']['createNote']
+        self.assertTrue(note['is_json'])
+        self.assertEqual(json.loads(note['data']), {'text': 'hello', 'tags': ['work'], 'parent': None})
+        self.assertEqual(client['default']['login']['data'], {'username': '', 'remember': 'true'})
+        output = io.StringIO()
+        writer = generate.write_openapi_request_files('example', [self.openapi_file, self.openapi_file], output,
+                                                      dedup=True)
+        self.assertEqual((writer.total_source_requests, writer.total_client_requests), (8, 4))
+        self.assertIn('getUser', json.loads(output.getvalue())['example']['users'])
+
+    @unittest.skipIf(yaml is None, 'PyYAML is not installed')
+    def test_openapi_yaml(self):
+        directory = tempfile.mkdtemp()
+        try:
+            yaml_file = os.path.join(directory, 'openapi.yaml')
+            with open(self.openapi_file) as f, open(yaml_file, 'w') as y:
+                yaml.safe_dump(json.load(f), y, sort_keys=False)
+            output, yaml_output = io.StringIO(), io.StringIO()
+            generate.write_openapi_request_files('example', [self.openapi_file], output)
+            generate.write_openapi_request_files('example', [yaml_file], yaml_output)
+            self.assertEqual(json.loads(output.getvalue()), json.loads(yaml_output.getvalue()))
+        finally:
+            shutil.rmtree(directory)
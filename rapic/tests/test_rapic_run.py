@@ -0,0 +1,98 @@
+"""Tests for rapic run worker pool."""
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from rapic.tests.server import LocalServerTestCase
+from rapic.tools.run import iter_calls, read_done_indexes, run_requests
+
+HOOKS = """
+from rapic.hook import APIClientHook
+
+
+@APIClientHook.hook_client_header('run_local', ['get_anything'])
+def add_worker_header(api, headers, **kwargs):
+    headers['X-Rapic-Run'] = 'yes'
+    return headers
+"""
+
+
+class TestRapicRun(LocalServerTestCase):
+
+    def setUp(self):
+        super(TestRapicRun, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        with open(self.local_file) as f:
+            client = json.load(f)
+        client['host'] = self.server.host
+        self.client_file = self.path('client.json')
+        with open(self.client_file, 'w') as f:
+            json.dump({'run_local': client}, f)
+        self.input_file = self.path('calls.jsonl')
+        self.output_file = self.path('calls.results.jsonl')
+        with open(self.input_file, 'w') as f:
+            for index in range(30):
+                f.write(json.dumps({'url_data': {'item_id': index}}) + '\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+        super(TestRapicRun, self).tearDown()
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def read_output(self):
+        with open(self.output_file) as f:
+            return [json.loads(line) for line in f]
+
+    def test_run_with_processes(self):
+        hooks_file = self.path('run_hooks.py')
+        with open(hooks_file, 'w') as f:
+            f.write(HOOKS)
+        summary = run_requests('run_local', self.client_file, 'get_anything', self.input_file, self.output_file,
+                               hooks=hooks_file, jobs=2, concurrency=3, chunk_size=4, save_body=True)
+        records = sorted(self.read_output(), key=lambda record: record['index'])
+        self.assertEqual([record['index'] for record in records], list(range(30)))
+        for record in records:
+            self.assertEqual(record['status_code'], 200)
+            self.assertEqual(record['body']['path'], '/anything/%s' % record['index'])
+            self.assertEqual(record['body']['headers']['X-Rapic-Run'], 'yes')
+        result = summary.as_dict()
+        self.assertEqual((result['total'], result['succeeded'], result['failed']), (30, 30, 0))
+        self.assertEqual(result['status_codes'], {'200': 30})
+        self.assertIsNotNone(result['latency_ms']['p99'])
+
+    def test_resume(self):
+        """Calls already written are skipped and a line left incomplete by a crash is removed"""
+        with open(self.output_file, 'w') as f:
+            f.write(json.dumps({'index': 0, 'status_code': 200, 'elapsed_ms': 1, 'error': None}) + '\n')
+            f.write(json.dumps({'index': 1, 'status_code': None, 'elapsed_ms': 1, 'error': 'ConnectionError: x'}) + '\n')
+            f.write('{"index": 2, "status_')
+        self.assertEqual(read_done_indexes(self.output_file, retry_errors=True), {0})
+        summary = run_requests('run_local', self.client_file, 'get_anything', self.input_file, self.output_file,
+                               retry_errors=True, chunk_size=7)
+        self.assertEqual((summary.total, summary.skipped), (29, 1))
+        records = self.read_output()
+        self.assertEqual(len(records), 31)
+        self.assertEqual(sorted(set(record['index'] for record in records)), list(range(30)))
+        summary = run_requests('run_local', self.client_file, 'get_anything', self.input_file, self.output_file)
+        self.assertEqual((summary.total, summary.skipped), (0, 30))
+
+    def test_errors_and_csv_input(self):
+        input_file = self.path('calls.csv')
+        with open(input_file, 'w') as f:
+            f.write('status,url_query.note\n200,a\n404,b\n')
+        self.assertEqual(list(iter_calls(input_file)), [(0, {'url_data': {'status': '200'}, 'url_query': {'note': 'a'}}),
+                                                        (1, {'url_data': {'status': '404'}, 'url_query': {'note': 'b'}})])
+        summary = run_requests('run_local', self.client_file, 'get_status', input_file, self.output_file).as_dict()
+        self.assertEqual((summary['succeeded'], summary['failed']), (1, 1))
+        self.assertEqual(summary['status_codes'], {'200': 1, '404': 1})
+        summary = run_requests('run_local', self.client_file, 'missing_request', input_file, self.output_file,
+                               resume=False).as_dict()
+        self.assertEqual(summary['errors'], {'RapicException': 2})
+        self.assertTrue(all(record['error'] for record in self.read_output()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,17 +1,212 @@
+import functools
+import hashlib
 import json
+import os
+import re
+
+JSON_PATH_TOKEN = re.compile(r'\[(-?\d+)\]|([^.\[\]]+)')
+# First characters of the json values json.loads accepts, other strings are never decoded
+JSON_VALUE_START = frozenset('{["-0123456789tfnNI')
+JSON_WHITESPACE = ' \t\n\r'
+
+
+def loads_json_string(value, object_hook=None):
+    """Decode a string holding a json value, strings that do not are returned as they are"""
+    first = value[:1]
+    if first in JSON_WHITESPACE:
+        first = value.lstrip(JSON_WHITESPACE)[:1]
+    if not first or first not in JSON_VALUE_START:
+        return value
+    try:
+        return json.loads(value, object_hook=object_hook)
+    except ValueError:
+        return value
+
 
 def flatten_hook(obj):
     for key, value in obj.items():
         if isinstance(value, str):
+            obj[key] = loads_json_string(value, flatten_hook)
+    return obj
+
+
+def get_fields_hook(fields):
+    """object_hook decoding only the string values of the given keys"""
+    fields = tuple(fields)
+
+    def fields_hook(obj):
+        for key in fields:
+            value = obj.get(key)
+            if isinstance(value, str):
+                obj[key] = loads_json_string(value, fields_hook)
+        return obj
+    return fields_hook
+
+
+def is_json_path(field):
+    return field.startswith('$') or '.' in field or '[' in field
+
+
+def expand_json_path(data, path, object_hook=None):
+    """Decode the json strings found at a json path, * matches every key or list item"""
+    keys = parse_json_path(path)
+    if not keys:
+        return
+    parents = [data]
+    for key in keys[:-1]:
+        children = []
+        for parent in parents:
+            if key == '*':
+                children.extend(parent.values() if isinstance(parent, dict) else parent)
+                continue
             try:
-                obj[key] = json.loads(value, object_hook=flatten_hook)
-            except ValueError:
+                children.append(parent[key])
+            except (KeyError, IndexError, TypeError):
                 pass
-    return obj
+        parents = [child for child in children if isinstance(child, (dict, list))]
+    last = keys[-1]
+    for parent in parents:
+        if last == '*':
+            indexes = list(parent) if isinstance(parent, dict) else range(len(parent))
+        elif isinstance(parent, dict) == isinstance(last, str):
+            indexes = [last]
+        else:
+            continue
+        for index in indexes:
+            try:
+                value = parent[index]
+            except (KeyError, IndexError):
+                continue
+            if isinstance(value, str):
+                parent[index] = loads_json_string(value, object_hook)
+
+
+def json_loads_nested(data, fields=None):
+    """
+    Load json where string values can hold json themselves, like burp exports of json bodies
+    :param fields: Only decode these fields instead of every string value. Names like "data" are decoded wherever they
+                   are, json paths like "httpbin.*.*.data" from the document root, * matches every key
+    """
+    if fields is None:
+        return json.loads(data, object_hook=flatten_hook)
+    keys = [field for field in fields if not is_json_path(field)]
+    object_hook = get_fields_hook(keys) if keys else None
+    document = json.loads(data, object_hook=object_hook)
+    for field in fields:
+        if is_json_path(field):
+            expand_json_path(document, field, object_hook)
+    return document
+
+
+def get_nested_fields(loads_nested):
+    """Fields of a loads_nested option, True or 'auto' decodes every string value, a list only the fields given"""
+    if loads_nested is True or loads_nested == 'auto':
+        return None
+    if isinstance(loads_nested, str):
+        return [field.strip() for field in loads_nested.split(',') if field.strip()]
+    return list(loads_nested)
+
 
+def get_nested_cache_dir(cache):
+    """Directory of the nested json cache, cache is a directory or True for the user cache directory"""
+    if cache is True:
+        return os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                            'rapic')
+    return cache
 
-def json_loads_nested(data):
-    return json.loads(data, object_hook=flatten_hook)
+
+def load_json_nested_file(file_location, fields=None, cache=None):
+    """
+    Load a json file with json_loads_nested.
+    :param cache: Directory (or True for ~/.cache/rapic) where the expanded document is saved, keyed by the hash of
+                  the file and the fields, so loading the same file again only reads plain json
+    """
+    with open(file_location, 'rb') as f:
+        data = f.read()
+    cache_dir = get_nested_cache_dir(cache)
+    if not cache_dir:
+        return json_loads_nested(data, fields)
+    key = hashlib.sha256(data)
+    key.update(json.dumps(fields).encode('utf8'))
+    cache_file = os.path.join(cache_dir, 'nested-%s.json' % key.hexdigest())
+    try:
+        with open(cache_file, 'rb') as f:
+            return json.loads(f.read())
+    except (OSError, ValueError):
+        pass
+    document = json_loads_nested(data, fields)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        temp_file = '%s.%s.tmp' % (cache_file, os.getpid())
+        with open(temp_file, 'w') as f:
+            json.dump(document, f)
+        os.replace(temp_file, cache_file)
+    except OSError:
+        # The expanded document is still returned when the cache can not be written
+        pass
+    return document
+
+
+def is_request_data(value):
+    """Check if a value from a client or page in a rapic json file is a request definition"""
+    return isinstance(value, dict) and 'method' in value
+
+
+@functools.lru_cache(maxsize=1024)
+def parse_json_path(path):
+    """
+    Split a json path into keys and list indexes, paths are compiled once
+        'data.items[0].id' -> ('data', 'items', 0, 'id'), '$' or '' is the whole document
+    """
+    if path.startswith('$'):
+        path = path[1:]
+    return tuple(int(index) if index else key for index, key in JSON_PATH_TOKEN.findall(path))
+
+
+def get_json_path(data, path, default=None):
+    """Get the value at a json path e.g get_json_path(response.json(), 'meta.next_cursor'), default when missing"""
+    for key in parse_json_path(path):
+        try:
+            data = data[key]
+        except (KeyError, IndexError, TypeError):
+            return default
+    return data
+
+
+def extract_json_path(data, path, default=None):
+    """
+    Like get_json_path, * matches every key or list item and the list of values found is returned
+        extract_json_path({'items': [{'id': 1}, {'id': 2}]}, 'items[*].id') -> [1, 2]
+    """
+    keys = parse_json_path(path)
+    if '*' not in keys:
+        return get_json_path(data, path, default)
+    values = [data]
+    for key in keys:
+        found = []
+        for value in values:
+            if key == '*':
+                if isinstance(value, dict):
+                    found.extend(value.values())
+                elif isinstance(value, list):
+                    found.extend(value)
+                continue
+            try:
+                found.append(value[key])
+            except (KeyError, IndexError, TypeError):
+                pass
+        values = found
+    return values
+
+
+def shutdown_executor(executor, futures=(), wait=True):
+    """
+    Cancel the futures that did not start then shut an executor down, like shutdown(cancel_futures=True) which
+    needs Python 3.9
+    """
+    for future in futures:
+        future.cancel()
+    executor.shutdown(wait=wait)
 
 
 class DotDict(dict):
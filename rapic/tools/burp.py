@@ -76,71 +76,83 @@ def get_header(header):
     return head
 
 
+def get_content_type(head):
+    """Media type of the Content-Type header in lower case without its parameters, None when there is none"""
+    for key, value in head.items():
+        if key.lower() == 'content-type':
+            return value.split(';', 1)[0].strip().lower()
+    return None
+
+
+def create_request(item):
+    """Create a rapic request from a burp item, item must be in the format returned by xmltodict"""
+    url = item['url']
+    method = item['method']
+    request_body = item['request']['#text']  # get request body
+    if item['request']['@base64'] == 'true':
+        request_body = base64.b64decode(request_body)
+        request_body_lst = request_body.split(b"\r\n\r\n")
+        header_text = request_body_lst[0].decode("utf-8")
+        body_data_text = request_body_lst[1:]
+    else:
+        request_body_lst = request_body.split("\n\n")
+        header_text = request_body_lst[0]
+        body_data_text = request_body_lst[1:]
+
+    head = get_header(header_text)
+    body = body_data_text[0] if body_data_text else None
+    return build_request(url, method, head, body)
+
+
+def build_request(url, method, head, body=None):
+    """
+    Create a rapic request from its url, method, headers dict and body (str, bytes or None when the request has
+    no body), every importer builds its requests with it so they all have the same fields
+    """
+    parsed = urlparse(url)
+    url_data = get_url_data(url)
+    post_data = {}
+    content_type = get_content_type(head)
+    typedef = {}
+    is_file_upload = content_type == 'multipart/form-data'
+    is_json = content_type == 'application/json'
+    if body is not None:
+        bd = body
+        if content_type == 'application/x-protobuf':
+            if isinstance(bd, str):
+                bd = bd.encode('utf-8')
+            post_data, typedef = get_body_proto(bd)
+        else:
+            if isinstance(bd, bytes):
+                bd = bd.decode("utf-8")
+            post_data = bd if is_json else get_body_data(bd)
+    d = dict()
+    d['path'] = parsed.path
+    d['host'] = parsed.netloc
+    d['scheme'] = parsed.scheme
+    d['method'] = method
+    d['data'] = post_data
+    d['is_file'] = is_file_upload
+    d['typedef'] = typedef
+    d['is_json'] = is_json
+    #d['url'] = unquote(url)
+    d['url_query'] = url_data
+    d['url_params'] = parsed.params
+    d['url_fragment'] = parsed.fragment
+    d['headers'] = head
+    d['do_extra_requests'] = False
+    d['do_implicit_requests'] = False
+    d['extra_request_names'] = []
+    return d
+
+
 def create_endpoint(request_item):
     endpoint = {}
     if not isinstance(request_item, list):
         request_item = [request_item]
     request_num = 1
     for item in request_item:
-
-        url = item['url']
-        location = urlparse(url).netloc
-        scheme = urlparse(url).scheme
-        path = urlparse(url).path
-        url_data = get_url_data(url)
-        method = item['method']
-        request_body = item['request']['#text']  # get request body
-        if item['request']['@base64'] == 'true':
-            request_body = base64.b64decode(request_body)
-            request_body_lst = request_body.split(b"\r\n\r\n")
-            header_text = request_body_lst[0].decode("utf-8")
-            body_data_text = request_body_lst[1:]
-        else:
-            request_body_lst = request_body.split("\n\n")
-            header_text = request_body_lst[0]
-            body_data_text = request_body_lst[1:]
-
-
-        head = get_header(header_text)
-        post_data = {}
-        content_type = head.get('Content-Type')
-        typedef = {}
-        is_file_upload = False
-        is_json = False
-        if content_type and 'multipart/form-data' in content_type:
-            is_file_upload = True
-        if content_type and content_type.lower().strip() == 'application/json':
-            is_json = True
-        if body_data_text and len(body_data_text) > 0:
-            bd = body_data_text[0]
-            if content_type and content_type.lower().strip() == 'application/x-protobuf':
-                 post_data, typedef = get_body_proto(bd)
-            elif content_type and content_type.lower().strip() == 'application/json':
-                if item['request']['@base64'] == 'true':
-                    bd = bd.decode("utf-8")
-                post_data = bd
-            else:
-                if item['request']['@base64'] == 'true':
-                    bd = bd.decode("utf-8")
-                post_data = get_body_data(bd)
-        d = dict()
-        d['path'] = path
-        d['host'] = location
-        d['scheme'] = scheme
-        d['method'] = method
-        d['data'] = post_data
-        d['is_file'] = is_file_upload
-        d['typedef'] = typedef
-        d['is_json'] = is_json
-        #d['url'] = unquote(url)
-        d['url_query'] = url_data
-        d['url_params'] = urlparse(url).params
-        d['url_fragment'] = urlparse(url).fragment
-        d['headers'] = head
-        d['do_extra_requests'] = False
-        d['do_implicit_requests'] = False
-        d['extra_request_names'] = []
-        endpoint['request_%s' % request_num] = d
+        endpoint['request_%s' % request_num] = create_request(item)
         request_num += 1
 
     endpoint['total_requests'] = request_num - 1
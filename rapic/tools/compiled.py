@@ -0,0 +1,164 @@
+"""
+Compiled rapic client files: every request is serialized on its own and an index of request name to
+position is stored in front of them, so a client only decodes the requests it performs.
+
+    MAGIC | header length (8 bytes little endian) | json header | request records
+
+The header holds the client and page values that are not requests and the index
+{page name or '' for client requests: {request name: [offset, length]}}, offsets start after the header.
+"""
+import json
+import mmap
+import struct
+from collections.abc import MutableMapping
+from rapic.tools import get_nested_fields, is_request_data, load_json_nested_file
+
+MAGIC = b'RAPICC1\n'
+HEADER_LENGTH = struct.Struct('<Q')
+CLIENT_INDEX = ''
+
+
+def is_compiled_client_file(file_location):
+    with open(file_location, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def compile_client(client, fp):
+    """
+    Write a client loaded from a rapic json file to fp (opened in binary mode) in compiled format
+    :param client: The client dict, client_file.get(client_name) or client_file
+    """
+    records = []
+    offset = 0
+    index = {}
+    values = {}
+
+    def add_records(index_name, container):
+        nonlocal offset
+        container_values = {}
+        container_index = index.setdefault(index_name, {})
+        for key, value in container.items():
+            if not is_request_data(value):
+                container_values[key] = value
+                continue
+            record = json.dumps(value, separators=(',', ':')).encode('utf8')
+            container_index[key] = [offset, len(record)]
+            records.append(record)
+            offset += len(record)
+        return container_values
+
+    pages = client.get('pages', [])
+    page_values = {}
+    for page in pages:
+        page_values[page] = add_records(page, client.get(page, {}))
+    values.update(add_records(CLIENT_INDEX, {k: v for k, v in client.items() if k not in pages}))
+    header = json.dumps({'client': values, 'pages': page_values, 'index': index}).encode('utf8')
+    fp.write(MAGIC)
+    fp.write(HEADER_LENGTH.pack(len(header)))
+    fp.write(header)
+    for record in records:
+        fp.write(record)
+
+
+def compile_client_file(client_name, json_file_location, fp, loads_nested=False):
+    """
+    Compile a rapic json file to fp, loads_nested expands json strings once at compile time,
+    it is True or the fields holding json like APIClient loads_nested
+    """
+    if loads_nested:
+        client_file = load_json_nested_file(json_file_location, get_nested_fields(loads_nested))
+    else:
+        with open(json_file_location, 'r') as j:
+            client_file = json.loads(j.read())
+    client = client_file.get(client_name) or client_file
+    compile_client(client, fp)
+    return client
+
+
+class CompiledRecords:
+    """Memory mapped request records of a compiled client file"""
+
+    def __init__(self, file_location):
+        self.file = open(file_location, 'rb')
+        self.mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        start = len(MAGIC) + HEADER_LENGTH.size
+        header_length = HEADER_LENGTH.unpack(self.mmap[len(MAGIC):start])[0]
+        self.header = json.loads(self.mmap[start:start + header_length])
+        self.records_start = start + header_length
+
+    def load(self, position):
+        offset, length = position
+        start = self.records_start + offset
+        return json.loads(self.mmap[start:start + length])
+
+    def close(self):
+        self.mmap.close()
+        self.file.close()
+
+
+class CompiledContainer(MutableMapping):
+    """View of a client or page of a compiled file, requests are decoded when they are accessed.
+        Values set on it are only kept in memory
+    """
+
+    def __init__(self, records, values, index):
+        self.records = records
+        self.values = values
+        self.index = index
+
+    def __getitem__(self, key):
+        if key in self.index:
+            return self.records.load(self.index[key])
+        return self.values[key]
+
+    def __setitem__(self, key, value):
+        self.index.pop(key, None)
+        self.values[key] = value
+
+    def __delitem__(self, key):
+        if key in self.index:
+            del self.index[key]
+        else:
+            del self.values[key]
+
+    def __contains__(self, key):
+        return key in self.index or key in self.values
+
+    def __iter__(self):
+        yield from self.values
+        yield from self.index
+
+    def __len__(self):
+        return len(self.values) + len(self.index)
+
+
+class CompiledClient(CompiledContainer):
+    """
+    Client loaded from a compiled file, it is used by APIClient like the dict loaded from a json file
+    client['pages'], client['host'], client['get_my_ip'], client['homepage']['request_1']
+    """
+
+    def __init__(self, file_location):
+        records = CompiledRecords(file_location)
+        header = records.header
+        super(CompiledClient, self).__init__(records, header['client'], header['index'].get(CLIENT_INDEX, {}))
+        self.pages = {page: CompiledContainer(records, values, header['index'].get(page, {}))
+                      for page, values in header['pages'].items()}
+
+    def __getitem__(self, key):
+        if key in self.pages:
+            return self.pages[key]
+        return super(CompiledClient, self).__getitem__(key)
+
+    def __contains__(self, key):
+        return key in self.pages or super(CompiledClient, self).__contains__(key)
+
+    def __iter__(self):
+        yield from super(CompiledClient, self).__iter__()
+        yield from self.pages
+
+    def __len__(self):
+        return super(CompiledClient, self).__len__() + len(self.pages)
+
+    def close(self):
+        self.records.close()
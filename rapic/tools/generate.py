@@ -1,6 +1,305 @@
+import itertools
+import json
+import mmap
 import os
-import xmltodict
-from .burp import create_endpoint
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from xml.etree import ElementTree
+from . import shutdown_executor
+from .burp import create_endpoint, create_request
+from .har import create_har_requests, iter_har_items
+from .normalize import RequestDeduplicator
+from .openapi import iter_openapi_requests, load_openapi_spec
+
+
+def element_to_item(element):
+    """Convert a burp <item> element to the dict xmltodict would create for it"""
+    item = {}
+    for child in element:
+        if child.attrib:
+            value = {'@%s' % key: val for key, val in child.attrib.items()}
+            value['#text'] = child.text or ''
+        else:
+            value = child.text
+        item[child.tag] = value
+    return item
+
+
+ITEM_START = b'<item>'
+ITEMS_END = b'</items>'
+CDATA_START = b'<![CDATA['
+CDATA_END = b']]>'
+
+
+def iter_burp_items(burp_xml_file):
+    """
+    Parse a burp xml file incrementally and yield its items one at a time, each item element is released
+    once it has been converted so memory does not grow with the size of the file
+    """
+    root = None
+    for event, element in ElementTree.iterparse(burp_xml_file, events=('start', 'end')):
+        if event == 'start':
+            if root is None:
+                root = element
+            continue
+        if element.tag == 'item':
+            yield element_to_item(element)
+            element.clear()
+            root.clear()
+
+
+def iter_burp_item_ranges(burp_xml_file, chunk_size):
+    """
+    Yield (file, start, end) byte ranges of a burp xml file holding chunk_size <item> elements each. The memory
+    mapped file is only scanned for <item> tags outside of CDATA sections, items are parsed by
+    create_burp_range_requests so worker processes do the parsing and only the ranges are sent to them
+    """
+    with open(burp_xml_file, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            position, count, range_start = 0, 0, None
+            while True:
+                cdata = data.find(CDATA_START, position)
+                item = data.find(ITEM_START, position, len(data) if cdata == -1 else cdata)
+                if item != -1:
+                    if range_start is None:
+                        range_start = item
+                    elif count % chunk_size == 0:
+                        yield burp_xml_file, range_start, item
+                        range_start = item
+                    count += 1
+                    position = item + len(ITEM_START)
+                elif cdata != -1:
+                    # Request and response bodies are in CDATA sections and can contain anything
+                    cdata_end = data.find(CDATA_END, cdata + len(CDATA_START))
+                    position = len(data) if cdata_end == -1 else cdata_end + len(CDATA_END)
+                else:
+                    break
+            if range_start is not None:
+                end = data.find(ITEMS_END, position)
+                yield burp_xml_file, range_start, len(data) if end == -1 else end
+
+
+def create_burp_range_requests(file_range):
+    """Parse the burp items of a (file, start, end) byte range and create their rapic requests"""
+    burp_xml_file, start, end = file_range
+    with open(burp_xml_file, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    root = ElementTree.fromstring(b'<items>' + data + b'</items>')
+    return [create_request(element_to_item(element)) for element in root.findall('item')]
+
+
+def get_page_name(file):
+    return os.path.splitext(os.path.basename(file))[0]
+
+
+class ClientFileWriter:
+    """
+    Write a rapic client json file one request at a time instead of building the whole client in memory
+
+        with open('client.json', 'w') as f:
+            writer = ClientFileWriter(f, 'client_name')
+            writer.start_page('homepage')
+            writer.add_request('request_1', request)
+            writer.end_page()
+            writer.close()
+    """
+
+    def __init__(self, fp, client_name):
+        self.fp = fp
+        self.pages = []
+        self.total_client_requests = 0
+        self.page_requests = 0
+        self.fp.write('{%s: {' % json.dumps(client_name))
+
+    def start_page(self, page):
+        if self.pages:
+            self.fp.write(', ')
+        self.pages.append(page)
+        self.page_requests = 0
+        self.fp.write('%s: {' % json.dumps(page))
+
+    def add_request(self, request_name, request):
+        self.add_encoded_request(request_name, json.dumps(request))
+
+    def add_encoded_request(self, request_name, encoded_request):
+        """Add a request already encoded to json, worker processes encode the requests they create"""
+        if self.page_requests:
+            self.fp.write(', ')
+        self.fp.write('%s: %s' % (json.dumps(request_name), encoded_request))
+        self.page_requests += 1
+
+    def end_page(self):
+        if self.page_requests:
+            self.fp.write(', ')
+        self.fp.write('"total_requests": %s, "implicit_requests": []}' % self.page_requests)
+        self.total_client_requests += self.page_requests
+
+    def close(self):
+        if self.pages:
+            self.fp.write(', ')
+        self.fp.write('"total_client_requests": %s, "pages": %s}}' % (self.total_client_requests,
+                                                                      json.dumps(self.pages)))
+
+
+def create_requests(items):
+    """Create rapic requests from a chunk of burp items"""
+    return [create_request(item) for item in items]
+
+
+def iter_item_chunks(items, chunk_size):
+    """Yield lists of chunk_size items"""
+    while True:
+        chunk = list(itertools.islice(items, chunk_size))
+        if not chunk:
+            break
+        yield chunk
+
+
+def iter_har_chunks(har_file, chunk_size):
+    return iter_item_chunks(iter_har_items(har_file), chunk_size)
+
+
+def create_encoded_requests(create_items_requests, chunk):
+    """Create the requests of a chunk encoded to json so the main process only writes them"""
+    return [json.dumps(request) for request in create_items_requests(chunk)]
+
+
+def run_inline(func, *args):
+    future = Future()
+    future.set_result(func(*args))
+    return future
+
+
+def iter_file_tasks(files, iter_chunks, chunk_size):
+    """Yield ('start', page), ('items', chunk) and ('end', page) for every file in order"""
+    for file in files:
+        page = get_page_name(file)
+        yield 'start', page
+        for chunk in iter_chunks(file, chunk_size):
+            yield 'items', chunk
+        yield 'end', page
+
+
+def write_request_files(client_name, files, fp, iter_chunks, create_items_requests, jobs=1, chunk_size=200,
+                        progress=None, dedup=False):
+    """
+    Convert saved requests files to a rapic client json file written to fp, every file is a page of the client.
+    Files are parsed and written incrementally so memory stays constant whatever the size of the files
+
+    :param iter_chunks: Function yielding the chunks of chunk_size items of a file, a chunk is what is sent to
+                        create_items_requests: the items themselves or a byte range of the file to parse
+    :param create_items_requests: Function creating the rapic requests of a chunk, it must be importable by worker
+                                  processes
+    :param jobs: Number of processes used to decode items, files are read in order and their chunks are sent
+                to the processes so pages and request numbers are the same whatever the number of jobs
+    :param chunk_size: Number of items sent to a process at once
+    :param progress: Function called with (page, number of requests, seconds taken) when a page is written
+    :param dedup: Merge requests of a page that only differ by ids in their path into one templated request
+    :return: ClientFileWriter, total_source_requests is the number of requests read from the files
+    """
+    writer = ClientFileWriter(fp, client_name)
+    writer.total_source_requests = 0
+    page_dedup = None
+    executor = ProcessPoolExecutor(max_workers=jobs) if jobs > 1 else None
+    submit = executor.submit if executor else run_inline
+    # Chunks are written in the order they were read, a bounded number of them is decoded ahead
+    pending = deque()
+    window = jobs * 4
+
+    def write_task(task, value, started):
+        nonlocal page_dedup
+        if task == 'start':
+            writer.start_page(value)
+            page_dedup = RequestDeduplicator() if dedup else None
+        elif task == 'items':
+            for request in value.result():
+                writer.total_source_requests += 1
+                if page_dedup is not None:
+                    page_dedup.add(request)
+                else:
+                    writer.add_encoded_request('request_%s' % (writer.page_requests + 1), request)
+        else:
+            if page_dedup is not None:
+                for request in page_dedup.get_requests():
+                    writer.add_request('request_%s' % (writer.page_requests + 1), request)
+            writer.end_page()
+            if progress:
+                progress(value, writer.page_requests, time.time() - started)
+
+    try:
+        page_started = time.time()
+        for task, value in iter_file_tasks(files, iter_chunks, chunk_size):
+            if task == 'start':
+                page_started = time.time()
+            elif task == 'items':
+                # Requests merged by dedup are needed as dicts, others are encoded by the workers
+                if dedup:
+                    value = submit(create_items_requests, value)
+                else:
+                    value = submit(create_encoded_requests, create_items_requests, value)
+            pending.append((task, value, page_started))
+            while len(pending) > window:
+                write_task(*pending.popleft())
+        while pending:
+            write_task(*pending.popleft())
+    finally:
+        if executor:
+            shutdown_executor(executor, [value for task, value, _ in pending if task == 'items'])
+    writer.close()
+    return writer
+
+
+def write_burp_request_files(client_name, burp_xml_files_loc, fp, jobs=1, chunk_size=200, progress=None,
+                             dedup=False):
+    """Convert burp xml files to a rapic client json file written to fp, same arguments as write_request_files"""
+    return write_request_files(client_name, burp_xml_files_loc, fp, iter_burp_item_ranges,
+                               create_burp_range_requests, jobs=jobs, chunk_size=chunk_size, progress=progress,
+                               dedup=dedup)
+
+
+def write_har_request_files(client_name, har_files, fp, jobs=1, chunk_size=200, progress=None, dedup=False):
+    """Convert HAR files to a rapic client json file written to fp, same arguments as write_request_files"""
+    return write_request_files(client_name, har_files, fp, iter_har_chunks, create_har_requests, jobs=jobs,
+                               chunk_size=chunk_size, progress=progress, dedup=dedup)
+
+
+def write_openapi_request_files(client_name, openapi_files, fp, progress=None, dedup=False):
+    """
+    Convert OpenAPI documents to a rapic client json file written to fp, operations are grouped in pages by their
+    first tag and named by their operationId, a name already used gets a number suffix
+    """
+    pages = OrderedDict()
+    names = set()
+    for file in openapi_files:
+        for page, request_name, request in iter_openapi_requests(load_openapi_spec(file)):
+            name, count = request_name, 1
+            while name in names:
+                count += 1
+                name = '%s_%s' % (request_name, count)
+            names.add(name)
+            pages.setdefault(page, []).append((name, request))
+    writer = ClientFileWriter(fp, client_name)
+    writer.total_source_requests = 0
+    for page, requests in pages.items():
+        started = time.time()
+        writer.start_page(page)
+        writer.total_source_requests += len(requests)
+        if dedup:
+            page_dedup = RequestDeduplicator()
+            for request_name, request in requests:
+                page_dedup.add(request, request_name)
+            requests = page_dedup.get_named_requests()
+        for request_name, request in requests:
+            writer.add_request(request_name, request)
+        writer.end_page()
+        if progress:
+            progress(page, writer.page_requests, time.time() - started)
+    writer.close()
+    return writer
 
 
 def burp_request_files(client_name, burp_xml_files_loc):
@@ -8,17 +307,12 @@ def burp_request_files(client_name, burp_xml_files_loc):
     request_load = {}
     pages = []
     for file in burp_xml_files_loc:
-        with open(file) as e:
-            page = os.path.splitext(os.path.basename(file))[0]
-            pages.append(page)
-            request_items = xmltodict.parse(e.read())['items']
-            if 'item' not in request_items:
-                continue
-            if not isinstance(request_items, list):
-                request_items = request_items['item']
-            endpoint = create_endpoint(request_items)
-            total_page_reqs = total_page_reqs + endpoint['total_requests']
-            request_load[page] = endpoint
+        page = get_page_name(file)
+        pages.append(page)
+        request_items = list(iter_burp_items(file))
+        endpoint = create_endpoint(request_items)
+        total_page_reqs = total_page_reqs + endpoint['total_requests']
+        request_load[page] = endpoint
     request_load['total_client_requests'] =  total_page_reqs
     request_load['pages'] =  pages
     return {client_name: request_load}
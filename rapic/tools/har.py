@@ -0,0 +1,171 @@
+"""
+Import of HAR files saved from browser devtools, mitmproxy or other proxies. Entries are read from the file one at a
+time so HAR files of hundreds of MB are converted in constant memory, responses are dropped as soon as their entry
+is decoded.
+
+    rapic-client-generator har website_name session.har --dedup
+"""
+import base64
+import json
+from urllib.parse import urlencode
+from .stream import DEFAULT_CHUNK_SIZE, RecordParser
+from .burp import build_request
+
+# Like burp imports Content-Length is left to the request, HTTP/2 pseudo headers (:authority, :path...) are dropped
+SKIPPED_HEADERS = ('content-length',)
+HEADER_SEPARATORS = {'cookie': '; '}
+
+
+class JsonDocumentReader:
+    """
+    Walk a JSON document read in chunks from a text file: move to the value at a path of object keys, skipping
+    every value before it, then decode the items of the array found there one at a time
+
+        reader = JsonDocumentReader(f)
+        reader.find(('log', 'entries'))
+        for entry in reader.iter_array():
+            ...
+    """
+
+    def __init__(self, fp, chunk_size=DEFAULT_CHUNK_SIZE):
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+        self.json_decoder = json.JSONDecoder()
+
+    def read(self):
+        """Add the next chunk of the file to the buffer, False at the end of the file"""
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def read_more(self):
+        """Read until the unread part of the buffer doubled so a value split between chunks stays linear to decode"""
+        target = max(len(self.buffer) - self.position, self.chunk_size) * 2
+        if not self.read():
+            return False
+        while len(self.buffer) - self.position < target and self.read():
+            pass
+        return True
+
+    def peek(self):
+        """Next character that is not whitespace, '' at the end of the file"""
+        while True:
+            self.position = RecordParser.skip_whitespace(self.buffer, self.position)
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if not self.read():
+                return ''
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError('Invalid json document, expected %s but found %r' % (' or '.join(chars), char))
+        self.position += 1
+        return char
+
+    def decode(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.json_decoder.raw_decode(self.buffer, self.position)
+            except json.JSONDecodeError:
+                if self.read_more():
+                    continue
+                raise
+            # A value ending with the buffer may be a number continuing in the next chunk
+            if end == len(self.buffer) and self.read_more():
+                continue
+            self.position = end
+            return value
+
+    def find(self, path):
+        """Move to the value at path, a tuple of object keys from the top of the document"""
+        for key in path:
+            self.expect('{')
+            if self.peek() == '}':
+                raise ValueError('Invalid json document, %s is missing' % key)
+            while True:
+                name = self.decode()
+                self.expect(':')
+                if name == key:
+                    break
+                self.decode()
+                if self.expect(',}') == '}':
+                    raise ValueError('Invalid json document, %s is missing' % key)
+
+    def iter_array(self):
+        self.expect('[')
+        if self.peek() == ']':
+            self.position += 1
+            return
+        while True:
+            yield self.decode()
+            if self.expect(',]') == ']':
+                return
+
+
+def iter_har_items(har_file):
+    """
+    Yield the request of every http entry of a HAR file (a path or a text file object) in order, the file is read
+    incrementally and responses are not kept
+    """
+    if not hasattr(har_file, 'read'):
+        with open(har_file, 'r', encoding='utf-8-sig') as f:
+            yield from iter_har_items(f)
+        return
+    reader = JsonDocumentReader(har_file)
+    reader.find(('log', 'entries'))
+    for entry in reader.iter_array():
+        request = entry.get('request') or {}
+        if request.get('url', '').startswith(('http://', 'https://')):
+            yield request
+
+
+def get_har_headers(headers):
+    """Convert HAR headers [{"name": ..., "value": ...}] to a dict, repeated headers are joined"""
+    head = {}
+    for header in headers:
+        name = header['name']
+        if name.startswith(':') or name.lower() in SKIPPED_HEADERS:
+            continue
+        if name in head:
+            head[name] = HEADER_SEPARATORS.get(name.lower(), ', ').join((head[name], header['value']))
+        else:
+            head[name] = header['value']
+    return head
+
+
+def get_har_body(post_data):
+    """Body of a HAR request from its postData text, or its params when the text was not saved"""
+    text = post_data.get('text')
+    if text is None:
+        return urlencode([(param['name'], param.get('value', '')) for param in post_data.get('params', [])])
+    if post_data.get('encoding') == 'base64':
+        return base64.b64decode(text)
+    return text
+
+
+def create_har_request(request):
+    """Create a rapic request from the request of a HAR entry"""
+    head = get_har_headers(request.get('headers', []))
+    post_data = request.get('postData')
+    body = None
+    if post_data:
+        body = get_har_body(post_data)
+        if post_data.get('mimeType') and not any(key.lower() == 'content-type' for key in head):
+            head['Content-Type'] = post_data['mimeType']
+    return build_request(request['url'], request['method'], head, body)
+
+
+def create_har_requests(items):
+    """Create rapic requests from a chunk of HAR entry requests, run in worker processes when generating with many jobs"""
+    return [create_har_request(item) for item in items]
@@ -0,0 +1,134 @@
+import copy
+import re
+from collections import OrderedDict
+
+NUMERIC_SEGMENT = re.compile(r'^\d+$')
+UUID_SEGMENT = re.compile(r'^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$')
+HEX_HASH_SEGMENT = re.compile(r'^[0-9a-fA-F]{16,}$')
+TOKEN_SEGMENT = re.compile(r'^[A-Za-z0-9_-]{20,}$')
+# Word separators of slugs, random base64url tokens hold about one every 32 characters
+TOKEN_SEPARATOR = re.compile(r'[_-]')
+PLACEHOLDER_NAME = re.compile(r'[^A-Za-z0-9_]')
+
+
+def get_char_class(char):
+    if char.isdigit():
+        return 'digit'
+    if char.islower():
+        return 'lower'
+    if char.isupper():
+        return 'upper'
+    return 'separator'
+
+
+def is_token_segment(segment):
+    """
+    Check if a segment looks like a random base64 or base62 id: 20 characters or more with digits and almost no word
+    separators, where at least a third of the neighbour characters change between digits, lower and upper case.
+    Random ids change about every other character, slugs such as release-notes-2024-v2, ubuntu2204ltsserver or
+    FirmwareUpdate2024Release only between words and are not tokens
+    """
+    if not TOKEN_SEGMENT.match(segment) or len(TOKEN_SEPARATOR.findall(segment)) > len(segment) // 16:
+        return False
+    if not any(char.isdigit() for char in segment):
+        return False
+    classes = [get_char_class(char) for char in segment]
+    changes = sum(previous != current for previous, current in zip(classes, classes[1:]))
+    return changes * 3 >= len(segment) - 1
+
+
+def get_segment_type(segment):
+    """Get the kind of id a path segment holds or None when it is a normal path segment"""
+    if NUMERIC_SEGMENT.match(segment):
+        return 'id'
+    if UUID_SEGMENT.match(segment):
+        return 'uuid'
+    if HEX_HASH_SEGMENT.match(segment) or is_token_segment(segment):
+        return 'hash'
+    return None
+
+
+def normalize_path(path):
+    """
+    Replace ids in a path with url data placeholders that build_url formats with url_data
+        /api/users/42/notes/9f1c... -> /api/users/{users_id}/notes/{notes_hash}
+    :return: (templated path, {placeholder: value found in path})
+    """
+    segments = path.split('/')
+    url_data = {}
+    previous = ''
+    for index, segment in enumerate(segments):
+        segment_type = get_segment_type(segment)
+        if segment_type is None:
+            if segment:
+                previous = PLACEHOLDER_NAME.sub('_', segment)
+            continue
+        name = '%s_%s' % (previous, segment_type) if previous else segment_type
+        placeholder, count = name, 1
+        while placeholder in url_data:
+            count += 1
+            placeholder = '%s_%s' % (name, count)
+        url_data[placeholder] = segment
+        segments[index] = '{%s}' % placeholder
+    return '/'.join(segments), url_data
+
+
+def merge_dict_keys(base, other):
+    """Add keys of other missing in base, values already in base are kept"""
+    if not isinstance(base, dict) or not isinstance(other, dict):
+        return base
+    for key, value in other.items():
+        if key not in base:
+            base[key] = value
+    return base
+
+
+class RequestDeduplicator:
+    """
+    Group requests with the same method, host and path once ids are replaced with placeholders, every group
+    becomes one templated request with all the url query, header and body keys seen in the group
+
+        dedup = RequestDeduplicator()
+        for request in requests:
+            dedup.add(request)
+        templated_requests = dedup.get_requests()
+
+    Requests added with a name keep the name of the first request of their group in get_named_requests. Ids found in
+    the path of the first request are kept as the default url_data of the group so it can be called without url_data.
+    """
+
+    def __init__(self):
+        self.clusters = OrderedDict()
+        self.names = {}
+        self.total_requests = 0
+
+    def add(self, request, name=None):
+        self.total_requests += 1
+        path, url_data = normalize_path(request.get('path', ''))
+        key = (request.get('method'), request.get('scheme'), request.get('host'), path)
+        cluster = self.clusters.get(key)
+        if cluster is None:
+            cluster = copy.deepcopy(request)
+            cluster['path'] = path
+            if url_data:
+                cluster['url_data'] = url_data
+            self.clusters[key] = cluster
+            self.names[key] = name
+            return cluster
+        for field in ('url_query', 'headers', 'data'):
+            if field in request:
+                cluster[field] = merge_dict_keys(cluster.get(field, {}), request[field])
+        return cluster
+
+    def get_requests(self):
+        return list(self.clusters.values())
+
+    def get_named_requests(self):
+        """(name, templated request) of every group"""
+        return [(self.names[key], request) for key, request in self.clusters.items()]
+
+    def get_compression_ratio(self):
+        """Number of requests added for every templated request"""
+        if not self.clusters:
+            return 1.0
+        return self.total_requests / len(self.clusters)
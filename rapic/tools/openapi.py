@@ -0,0 +1,237 @@
+"""
+Import of OpenAPI 3 and Swagger 2 documents (json, or yaml when PyYAML is installed). Every operation becomes a
+request named by its operationId in the page of its first tag, path parameters stay url data placeholders and
+query, header and body values are filled from the examples and defaults of the document.
+
+    rapic-client-generator openapi website_name openapi.yaml
+"""
+import json
+import re
+from collections import OrderedDict
+from urllib.parse import urlencode, urlparse
+from rapic.exceptions import RapicException
+from .burp import build_request
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover
+    yaml = None
+
+HTTP_METHODS = ('get', 'put', 'post', 'delete', 'options', 'head', 'patch', 'trace')
+BODY_CONTENT_TYPES = ('application/json', 'application/x-www-form-urlencoded', 'multipart/form-data')
+DEFAULT_PAGE = 'default'
+# Schemas are only expanded this deep in examples, a schema is not expanded again inside itself
+MAX_SCHEMA_DEPTH = 8
+REQUEST_NAME_SEPARATOR = re.compile(r'[^A-Za-z0-9]+')
+SERVER_VARIABLE = re.compile(r'\{([^}]+)\}')
+
+
+def load_openapi_spec(file_location):
+    with open(file_location, 'r', encoding='utf-8-sig') as f:
+        text = f.read()
+    if text.lstrip().startswith('{'):
+        return json.loads(text)
+    if yaml is None:
+        raise RapicException('PyYAML is required to import yaml OpenAPI documents, install it with pip install '
+                             'rapic[openapi]')
+    return yaml.safe_load(text)
+
+
+def resolve_ref(spec, value):
+    """Follow the local $ref of a value e.g {"$ref": "#/components/schemas/User"}, unknown refs resolve to {}"""
+    seen = set()
+    while isinstance(value, dict) and '$ref' in value:
+        ref = value['$ref']
+        if ref in seen or not ref.startswith('#/'):
+            return {}
+        seen.add(ref)
+        value = spec
+        for key in ref[2:].split('/'):
+            key = key.replace('~1', '/').replace('~0', '~')
+            value = value.get(key, {}) if isinstance(value, dict) else {}
+    return value
+
+
+def get_schema_example(spec, schema, depth=0, refs=frozenset()):
+    """Example value of a schema from its example, default or enum, objects and arrays are built from their parts"""
+    if isinstance(schema, dict) and '$ref' in schema:
+        if schema['$ref'] in refs:
+            return None
+        refs = refs | {schema['$ref']}
+    schema = resolve_ref(spec, schema)
+    if not isinstance(schema, dict) or depth > MAX_SCHEMA_DEPTH:
+        return None
+    for key in ('example', 'default'):
+        if key in schema:
+            return schema[key]
+    if isinstance(schema.get('examples'), list) and schema['examples']:
+        return schema['examples'][0]
+    if schema.get('enum'):
+        return schema['enum'][0]
+    if schema.get('allOf'):
+        example = {}
+        for part in schema['allOf']:
+            part_example = get_schema_example(spec, part, depth + 1, refs)
+            if isinstance(part_example, dict):
+                example.update(part_example)
+        return example
+    for key in ('oneOf', 'anyOf'):
+        if schema.get(key):
+            return get_schema_example(spec, schema[key][0], depth + 1, refs)
+    schema_type = schema.get('type')
+    if isinstance(schema_type, list):
+        schema_type = next((item for item in schema_type if item != 'null'), None)
+    if schema_type == 'object' or 'properties' in schema:
+        return {name: get_schema_example(spec, value, depth + 1, refs)
+                for name, value in schema.get('properties', {}).items()}
+    if schema_type == 'array':
+        item = get_schema_example(spec, schema.get('items', {}), depth + 1, refs)
+        return [] if item is None else [item]
+    return None
+
+
+def get_parameter_example(spec, parameter):
+    if 'example' in parameter:
+        return parameter['example']
+    examples = parameter.get('examples')
+    if isinstance(examples, dict) and examples:
+        return resolve_ref(spec, next(iter(examples.values()))).get('value')
+    # Swagger 2 parameters hold their schema fields themselves
+    return get_schema_example(spec, parameter.get('schema', parameter))
+
+
+def get_media_example(spec, media):
+    media = resolve_ref(spec, media)
+    if 'example' in media:
+        return media['example']
+    examples = media.get('examples')
+    if isinstance(examples, dict) and examples:
+        return resolve_ref(spec, next(iter(examples.values()))).get('value')
+    return get_schema_example(spec, media.get('schema', {}))
+
+
+def to_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, (bool, dict, list)):
+        return json.dumps(value)
+    return str(value)
+
+
+def get_server(spec):
+    """(scheme, host, base path) of the first server of an OpenAPI 3 document or of a Swagger 2 document"""
+    if spec.get('servers'):
+        server = spec['servers'][0]
+        variables = server.get('variables', {})
+        url = SERVER_VARIABLE.sub(lambda match: str(variables.get(match.group(1), {}).get('default', '')),
+                                  server.get('url', ''))
+        parsed = urlparse(url)
+        return parsed.scheme or 'https', parsed.netloc, parsed.path
+    schemes = spec.get('schemes') or ['https']
+    return schemes[0], spec.get('host', ''), spec.get('basePath', '')
+
+
+def get_request_name(operation, method, path):
+    name = operation.get('operationId') or '%s_%s' % (method, path)
+    return '_'.join(part for part in REQUEST_NAME_SEPARATOR.split(name) if part)
+
+
+def get_parameters(spec, path_item, operation):
+    """Parameters of an operation, operation parameters replace path parameters with the same name and location"""
+    parameters = OrderedDict()
+    for parameter in path_item.get('parameters', []) + operation.get('parameters', []):
+        parameter = resolve_ref(spec, parameter)
+        if 'name' in parameter:
+            parameters[(parameter['name'], parameter.get('in'))] = parameter
+    return list(parameters.values())
+
+
+def get_security_headers(spec, operation, url_query):
+    """Headers (and query values) of the first security requirement of an operation with empty values to fill"""
+    head = {}
+    requirements = operation.get('security', spec.get('security')) or []
+    schemes = spec.get('components', {}).get('securitySchemes') or spec.get('securityDefinitions') or {}
+    for name in (requirements[0] if requirements else {}):
+        scheme = resolve_ref(spec, schemes.get(name, {}))
+        if scheme.get('type') == 'apiKey' and scheme.get('in') == 'header':
+            head[scheme['name']] = ''
+        elif scheme.get('type') == 'apiKey' and scheme.get('in') == 'query':
+            url_query[scheme['name']] = ''
+        elif scheme.get('type') in ('http', 'basic', 'oauth2', 'openIdConnect'):
+            prefix = 'Basic' if scheme.get('type') == 'basic' or scheme.get('scheme') == 'basic' else 'Bearer'
+            head['Authorization'] = '%s ' % prefix
+    return head
+
+
+def get_body(spec, operation, parameters):
+    """(content type, body text) of an operation, (None, None) when it has no body"""
+    request_body = resolve_ref(spec, operation.get('requestBody'))
+    if request_body:
+        content = request_body.get('content', {})
+        if not content:
+            return None, None
+        content_type = next((item for item in BODY_CONTENT_TYPES if item in content), next(iter(content)))
+        return content_type, get_body_text(content_type, get_media_example(spec, content[content_type]))
+    # Swagger 2 body and form parameters
+    consumes = operation.get('consumes') or spec.get('consumes') or []
+    for parameter in parameters:
+        if parameter.get('in') == 'body':
+            content_type = next((item for item in consumes if 'json' in item), 'application/json')
+            return content_type, get_body_text(content_type, get_schema_example(spec, parameter.get('schema', {})))
+    form = OrderedDict((parameter['name'], get_parameter_example(spec, parameter))
+                       for parameter in parameters if parameter.get('in') == 'formData')
+    if form:
+        content_type = 'multipart/form-data' if 'multipart/form-data' in consumes else \
+            'application/x-www-form-urlencoded'
+        return content_type, get_body_text(content_type, form)
+    return None, None
+
+
+def get_body_text(content_type, example):
+    if 'json' in content_type:
+        return json.dumps({} if example is None else example)
+    if isinstance(example, dict):
+        # Form and multipart bodies become a dict of their fields
+        return urlencode([(key, to_text(value)) for key, value in example.items()])
+    return to_text(example)
+
+
+def create_openapi_request(spec, server, path, method, path_item, operation):
+    """Create a rapic request from an operation of an OpenAPI document"""
+    scheme, host, base_path = server
+    parameters = get_parameters(spec, path_item, operation)
+    url_query = OrderedDict()
+    head = get_security_headers(spec, operation, url_query)
+    cookies = []
+    for parameter in parameters:
+        location = parameter.get('in')
+        value = to_text(get_parameter_example(spec, parameter))
+        if location == 'query':
+            url_query[parameter['name']] = value
+        elif location == 'header':
+            head[parameter['name']] = value
+        elif location == 'cookie':
+            cookies.append('%s=%s' % (parameter['name'], value))
+    if cookies:
+        head['Cookie'] = '; '.join(cookies)
+    content_type, body = get_body(spec, operation, parameters)
+    if content_type:
+        head['Content-Type'] = content_type
+    url = '%s://%s%s%s' % (scheme, host, base_path.rstrip('/'), path)
+    if url_query:
+        url = '%s?%s' % (url, urlencode(url_query))
+    return build_request(url, method.upper(), head, body)
+
+
+def iter_openapi_requests(spec):
+    """Yield (page, request name, request) for every operation of an OpenAPI document in order"""
+    server = get_server(spec)
+    for path, path_item in spec.get('paths', {}).items():
+        path_item = resolve_ref(spec, path_item)
+        for method in HTTP_METHODS:
+            operation = path_item.get(method)
+            if not isinstance(operation, dict):
+                continue
+            page = (operation.get('tags') or [DEFAULT_PAGE])[0]
+            yield page, get_request_name(operation, method, path), create_openapi_request(
+                spec, server, path, method, path_item, operation)
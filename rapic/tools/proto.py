@@ -0,0 +1,198 @@
+"""
+Protobuf messages encoded and decoded with blackboxprotobuf typedefs compiled once.
+
+blackboxprotobuf interprets the typedef dict again for every message: field names are searched in the whole
+typedef, tags are built and the typedef is deep copied before decoding. A CompiledTypedef resolves every field
+once, on first use, to its tag bytes and encoder or decoder function and produces the same bytes and values.
+Messages the compiled decoder can not handle (unknown fields, groups or wire types not matching the typedef)
+are decoded by blackboxprotobuf which guesses the missing types.
+
+    proto = compile_typedef(request_data['typedef'])
+    body = proto.encode({'1': 'rapic', 'name': 'value'})
+    message = proto.decode(response.content)
+"""
+import threading
+import blackboxprotobuf
+from google.protobuf.internal import encoder, decoder, wire_format
+from blackboxprotobuf.lib.types import encoders, decoders, wiretypes
+from blackboxprotobuf.lib.types.varint import encode_varint
+
+PROTOBUF_CONTENT_TYPES = ('application/x-protobuf', 'application/protobuf', 'application/vnd.google.protobuf')
+MAX_COMPILED_TYPEDEFS = 1024
+# Typedef of responses without a typedef, it is never changed so its compiled typedef is cached
+EMPTY_TYPEDEF = {}
+
+_compiled_typedefs = {}
+_compiled_typedefs_lock = threading.Lock()
+
+
+class FallbackDecode(Exception):
+    """The message can not be decoded with the compiled typedef only"""
+
+
+def is_protobuf_response(response):
+    content_type = response.headers.get('Content-Type', '')
+    return content_type.split(';', 1)[0].strip().lower() in PROTOBUF_CONTENT_TYPES
+
+
+def compile_typedef(typedef):
+    """
+    Get the CompiledTypedef of a typedef, typedefs are compiled once and must not be changed after their first use.
+    A request uses the same typedef object for every call so the compiled typedef is found by the typedef id
+    """
+    entry = _compiled_typedefs.get(id(typedef))
+    if entry is not None and entry[0] is typedef:
+        return entry[1]
+    compiled = CompiledTypedef(typedef)
+    with _compiled_typedefs_lock:
+        if len(_compiled_typedefs) >= MAX_COMPILED_TYPEDEFS:
+            _compiled_typedefs.clear()
+        # The typedef is kept in the entry so its id can not be reused by another object
+        _compiled_typedefs[id(typedef)] = (typedef, compiled)
+    return compiled
+
+
+class CompiledTypedef:
+    """
+    Encoder and decoder of the messages of a blackboxprotobuf typedef
+    :param typedef: Typedef from blackboxprotobuf.decode_message or the typedef of a request in the rapic json file
+    """
+
+    def __init__(self, typedef):
+        self.typedef = typedef
+        # Data key -> (tag bytes, value encoder, packed)
+        self.encode_fields = {}
+        # Field number -> (wire type, output key, value decoder)
+        self.decode_fields = None
+        self.names = {info.get('name'): number for number, info in typedef.items() if info.get('name')}
+
+    def encode(self, data):
+        """Encode a message dict keyed by field numbers or names, same output as blackboxprotobuf.encode_message"""
+        output = bytearray()
+        encode_fields = self.encode_fields
+        for key, value in data.items():
+            field = encode_fields.get(key)
+            if field is None:
+                field = self.compile_encode_field(key)
+            tag, encode_value, packed = field
+            try:
+                if isinstance(value, list) and not packed:
+                    for repeated in value:
+                        output += tag
+                        output += encode_value(repeated)
+                else:
+                    output += tag
+                    output += encode_value(value)
+            except Exception as exc:
+                raise ValueError('Error attempting to encode "%s" as %s: %s' % (value, key, exc)) from exc
+        return output
+
+    def encode_lendelim(self, data):
+        message = self.encode(data)
+        return encode_varint(len(message)) + message
+
+    def compile_encode_field(self, key):
+        """Resolve a data key to the tag and encoder of its field, keys are resolved once"""
+        alt_number = None
+        number = key
+        if isinstance(key, str):
+            if '-' in key:
+                number, alt_number = key.split('-', 1)
+            number = self.names.get(number, number)
+        else:
+            number = str(key)
+        if number not in self.typedef:
+            raise ValueError('Provided field name/number %s is not valid' % number)
+        field_typedef = self.typedef[number]
+        if 'type' not in field_typedef:
+            raise ValueError('Field %s does not have a defined type' % number)
+        field_type = field_typedef['type']
+
+        if field_type == 'message':
+            if alt_number is not None:
+                if alt_number not in field_typedef.get('alt_typedefs', {}):
+                    raise ValueError('Provided alt field name/number %s is not valid for field_number %s'
+                                     % (alt_number, number))
+                inner_typedef = field_typedef['alt_typedefs'][alt_number]
+            elif 'message_typedef' in field_typedef:
+                inner_typedef = field_typedef['message_typedef']
+            else:
+                if field_typedef.get('message_type_name') not in blackboxprotobuf.lib.known_messages:
+                    raise ValueError('Message type (%s) has not been defined' % field_typedef.get('message_type_name'))
+                inner_typedef = blackboxprotobuf.lib.known_messages[field_typedef['message_type_name']]
+            encode_value = compile_typedef(inner_typedef).encode_lendelim
+        elif field_type == 'group':
+            if 'group_typedef' not in field_typedef:
+                raise ValueError('Could not find type definition for group field: %s' % number)
+            encode_group = compile_typedef(field_typedef['group_typedef']).encode
+            end_tag = encoder.TagBytes(int(number), wire_format.WIRETYPE_END_GROUP)
+
+            def encode_value(value):
+                return encode_group(value) + end_tag
+        else:
+            encode_value = encoders.get(field_type)
+            if encode_value is None:
+                raise ValueError('Unknown type: %s' % field_type)
+
+        field = (encoder.TagBytes(int(number), wiretypes[field_type]), encode_value, field_type.startswith('packed_'))
+        self.encode_fields[key] = field
+        return field
+
+    def decode(self, buf):
+        """Decode a message to a dict keyed by field names or numbers, same values as blackboxprotobuf.decode_message"""
+        try:
+            return self.decode_message(buf, 0, len(buf))
+        except FallbackDecode:
+            return blackboxprotobuf.decode_message(buf, self.typedef)[0]
+
+    def decode_lendelim(self, buf, pos):
+        length, pos = decoder._DecodeVarint(buf, pos)
+        end = pos + length
+        return self.decode_message(buf, pos, end), end
+
+    def decode_message(self, buf, pos, end):
+        decode_fields = self.decode_fields
+        if decode_fields is None:
+            decode_fields = self.compile_decode_fields()
+        output = {}
+        while pos < end:
+            tag, pos = decoder._DecodeVarint(buf, pos)
+            field = decode_fields.get(tag >> 3)
+            if field is None or field[0] != tag & 7:
+                raise FallbackDecode
+            try:
+                value, pos = field[2](buf, pos)
+            except FallbackDecode:
+                raise
+            except Exception:
+                raise FallbackDecode
+            key = field[1]
+            if key not in output:
+                output[key] = value
+            else:
+                existing = output[key]
+                if isinstance(value, list):
+                    output[key] = (existing if isinstance(existing, list) else [existing]) + value
+                elif isinstance(existing, list):
+                    existing.append(value)
+                else:
+                    output[key] = [existing, value]
+        if pos != end:
+            raise FallbackDecode
+        return output
+
+    def compile_decode_fields(self):
+        """Decoders of the fields with a known type, other fields make the message decoded by blackboxprotobuf"""
+        decode_fields = {}
+        for number, field_typedef in self.typedef.items():
+            field_type = field_typedef.get('type')
+            if field_type == 'message' and 'message_typedef' in field_typedef:
+                decode_value = compile_typedef(field_typedef['message_typedef']).decode_lendelim
+            elif field_type in decoders:
+                decode_value = decoders[field_type]
+            else:
+                continue
+            key = field_typedef.get('name') or number
+            decode_fields[int(number)] = (wiretypes[field_type], key, decode_value)
+        self.decode_fields = decode_fields
+        return decode_fields
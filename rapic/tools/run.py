@@ -0,0 +1,260 @@
+"""
+Run a request of a rapic client for every line of an input file over a pool of processes, each process has its own
+client and connection pool and sends calls with many threads. Results are appended to a JSONL output file as they
+complete so a run stopped at any time continues where it stopped when it is started again with the same output.
+
+    summary = run_requests('httpbin', 'httpbin.json', 'get_user', 'users.jsonl', 'users.results.jsonl',
+                           hooks='myapp.hooks', jobs=4)
+
+Input lines are perform_request kwargs, {"url_data": {"user_id": 1}, "url_query": {"verbose": "1"}} in JSONL files.
+CSV columns are named section.key e.g url_data.user_id or url_query.verbose, columns without a section are url data.
+Output lines are {"index": 0, "status_code": 200, "elapsed_ms": 12.5, "error": null} with the response body in
+"body" when save_body is set, index is the number of the input record starting from 0.
+"""
+import csv
+import importlib
+import importlib.util
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from rapic.client import APIClient
+from rapic.metrics import Histogram
+from rapic.tools import shutdown_executor
+from rapic.tools.generate import run_inline
+
+LATENCY_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 60.0)
+
+# Worker of the current process, created by init_worker in every process of the pool
+_worker = None
+
+
+def load_hooks(hooks):
+    """Import hooks modules so their hooks are registered, hooks is a comma separated list of module names or files"""
+    for hook in (hooks or '').split(','):
+        hook = hook.strip()
+        if not hook:
+            continue
+        if not hook.endswith('.py'):
+            importlib.import_module(hook)
+            continue
+        module_name = 'rapic_run_hooks_%s' % os.path.splitext(os.path.basename(hook))[0]
+        if module_name in sys.modules:
+            # Forked workers already have the hooks registered by the parent process
+            continue
+        spec = importlib.util.spec_from_file_location(module_name, hook)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[module_name] = module
+        spec.loader.exec_module(module)
+
+
+def row_to_kwargs(row):
+    """perform_request kwargs of a CSV row, url_query.page column -> {'url_query': {'page': value}}"""
+    kwargs = {}
+    for column, value in row.items():
+        if column is None or value is None:
+            continue
+        section, _, key = column.rpartition('.')
+        kwargs.setdefault(section or 'url_data', {})[key] = value
+    return kwargs
+
+
+def iter_calls(input_file):
+    """Yield (index, perform_request kwargs) of every record of a JSONL or CSV input file"""
+    with open(input_file, newline='') as f:
+        if input_file.lower().endswith('.csv'):
+            for index, row in enumerate(csv.DictReader(f)):
+                yield index, row_to_kwargs(row)
+            return
+        index = 0
+        for line in f:
+            if not line.strip():
+                continue
+            yield index, json.loads(line)
+            index += 1
+
+
+def read_done_indexes(output_file, retry_errors=False):
+    """
+    Indexes of the calls already in the output file of a previous run, a line left incomplete by a crash is removed.
+    :param retry_errors: Calls which raised an exception are run again, their new result is appended
+    """
+    done = set()
+    if not os.path.exists(output_file):
+        return done
+    valid_size = 0
+    with open(output_file, 'rb+') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid_size += len(line)
+            if not (retry_errors and record.get('error')):
+                done.add(record['index'])
+        f.truncate(valid_size)
+    return done
+
+
+class RunWorker:
+    """
+    Client of a worker process sending calls with a pool of threads
+    :param concurrency: Number of calls sent at the same time by the process
+    :param client_kwargs: APIClient kwargs, the connection pool keeps a connection per thread by default
+    """
+
+    def __init__(self, client_name, client_file, hooks=None, concurrency=10, save_body=False, client_kwargs=None):
+        load_hooks(hooks)
+        client_kwargs = dict(client_kwargs or {})
+        client_kwargs.setdefault('connection_pool', {'max_per_host': concurrency})
+        self.api = APIClient(client_name, client_file, **client_kwargs)
+        self.save_body = save_body
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def call(self, request_name, index, call_kwargs):
+        record = {'index': index, 'status_code': None, 'elapsed_ms': None, 'error': None}
+        started = time.perf_counter()
+        try:
+            response = self.api.perform_request(request_name, **call_kwargs)
+            record['status_code'] = response.status_code
+            if self.save_body:
+                try:
+                    record['body'] = response.json()
+                except ValueError:
+                    record['body'] = response.text
+        except Exception as e:
+            record['error'] = '%s: %s' % (type(e).__name__, e)
+        record['elapsed_ms'] = round((time.perf_counter() - started) * 1e3, 3)
+        return record
+
+    def run_chunk(self, request_name, chunk):
+        return list(self.executor.map(lambda call: self.call(request_name, *call), chunk))
+
+
+def init_worker(*args):
+    global _worker
+    _worker = RunWorker(*args)
+
+
+def run_chunk(request_name, chunk):
+    return _worker.run_chunk(request_name, chunk)
+
+
+class RunSummary:
+    """
+    Throughput, errors and latency of the calls of a run, memory does not grow with the number of calls so
+    latency percentiles are the upper bound of the LATENCY_BUCKETS bucket they fall in
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.total = 0
+        self.failed = 0
+        self.skipped = 0
+        self.status_codes = {}
+        self.errors = {}
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.max_latency = 0.0
+
+    def add(self, record):
+        self.total += 1
+        elapsed = record['elapsed_ms'] / 1e3
+        self.latency.observe(elapsed)
+        self.max_latency = max(self.max_latency, elapsed)
+        if record['error']:
+            self.failed += 1
+            error_type = record['error'].split(':', 1)[0]
+            self.errors[error_type] = self.errors.get(error_type, 0) + 1
+            return
+        status = str(record['status_code'])
+        self.status_codes[status] = self.status_codes.get(status, 0) + 1
+        if record['status_code'] >= 400:
+            self.failed += 1
+
+    def as_dict(self):
+        seconds = time.time() - self.started
+        latency = self.latency
+
+        def to_ms(value):
+            return round(value * 1e3, 3) if value is not None else None
+
+        return {
+            'total': self.total, 'succeeded': self.total - self.failed, 'failed': self.failed, 'skipped': self.skipped,
+            'seconds': round(seconds, 3), 'rps': round(self.total / seconds, 1) if seconds else 0.0,
+            'status_codes': self.status_codes, 'errors': self.errors,
+            'latency_ms': {'mean': to_ms(latency.sum / latency.count) if latency.count else None,
+                           'p50': to_ms(latency.quantile(0.5)), 'p90': to_ms(latency.quantile(0.9)),
+                           'p99': to_ms(latency.quantile(0.99)), 'max': to_ms(self.max_latency)},
+        }
+
+
+def iter_chunks(calls, chunk_size, done):
+    chunk = []
+    for index, call_kwargs in calls:
+        if index in done:
+            continue
+        chunk.append((index, call_kwargs))
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def run_requests(client_name, client_file, request_name, input_file, output_file, hooks=None, jobs=1, concurrency=10,
+                 chunk_size=100, resume=True, retry_errors=False, save_body=False, client_kwargs=None, progress=None):
+    """
+    Perform request_name for every record of input_file and append the results to output_file
+
+    :param hooks: Comma separated hooks modules or python files imported in every process
+    :param jobs: Number of processes, calls are run in the current process when it is 1
+    :param concurrency: Number of calls sent at the same time by every process
+    :param chunk_size: Number of calls sent to a process at once
+    :param resume: Skip calls already in output_file, the output file is started again when it is False
+    :param retry_errors: On resume run again calls which raised an exception
+    :param save_body: Save response bodies, json decoded when possible
+    :param progress: Function called with the RunSummary when results of a chunk are written
+    :return: RunSummary
+    """
+    done = read_done_indexes(output_file, retry_errors) if resume else set()
+    summary = RunSummary()
+    summary.skipped = len(done)
+    worker_args = (client_name, client_file, hooks, concurrency, save_body, client_kwargs)
+    if jobs > 1:
+        executor = ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=worker_args)
+        submit = executor.submit
+    else:
+        executor = None
+        init_worker(*worker_args)
+        submit = run_inline
+    chunks = iter_chunks(iter_calls(input_file), chunk_size, done)
+    # A bounded number of chunks is sent ahead so the input file is read lazily
+    window = jobs * 2
+    pending = set()
+    try:
+        with open(output_file, 'a' if resume else 'w') as output:
+            while True:
+                for chunk in chunks:
+                    pending.add(submit(run_chunk, request_name, chunk))
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    break
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    for record in future.result():
+                        output.write(json.dumps(record) + '\n')
+                        summary.add(record)
+                output.flush()
+                if progress:
+                    progress(summary)
+    finally:
+        if executor:
+            shutdown_executor(executor, pending)
+        else:
+            _worker.executor.shutdown()
+            _worker.api.close()
+    return summary
@@ -0,0 +1,254 @@
+"""
+Incremental decoding of large JSON array and NDJSON responses, records are decoded as chunks arrive so
+memory only holds the current chunk and the record being decoded whatever the size of the response.
+
+    for record in api.get_events(stream=True):
+        ...
+"""
+import codecs
+import json
+from rapic.exceptions import RapicException
+
+JSON_ARRAY = 'json_array'
+NDJSON = 'ndjson'
+AUTO = 'auto'
+DEFAULT_CHUNK_SIZE = 64 * 1024
+WHITESPACE = ' \t\n\r'
+
+
+def get_stream_options(stream):
+    """
+    Get (format, chunk size) from the stream value of a request, True or {'format': 'ndjson', 'chunk_size': 65536}
+    format is json_array, ndjson or auto which uses json_array when the body starts with [
+    """
+    if isinstance(stream, dict):
+        return stream.get('format', AUTO), stream.get('chunk_size', DEFAULT_CHUNK_SIZE)
+    return AUTO, DEFAULT_CHUNK_SIZE
+
+
+class RecordParser:
+    """
+    Decode records of a JSON array or NDJSON body fed in bytes chunks
+
+        parser = RecordParser()
+        for chunk in chunks:
+            for record in parser.feed(chunk):
+                ...
+        remaining_records = parser.close()
+    """
+
+    def __init__(self, format=AUTO):
+        if format not in (AUTO, JSON_ARRAY, NDJSON):
+            raise RapicException('Unknown stream format %s' % format)
+        self.format = format
+        self.buffer = ''
+        self.text_decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json_decoder = json.JSONDecoder()
+        # json array state: before [, expecting a value, expecting , or ] and after ]
+        self.state = 'start'
+        # A record split between chunks is decoded again once the buffer doubled so large records stay linear
+        self.retry_length = 0
+        # Length of the buffer start already searched for a newline, a long ndjson line is only scanned once
+        self.searched_length = 0
+
+    def feed(self, chunk):
+        self.buffer += self.text_decoder.decode(chunk)
+        if len(self.buffer) < self.retry_length:
+            return []
+        return self.parse(final=False)
+
+    def close(self):
+        """Decode the records left once the body is read, an incomplete body raises ValueError"""
+        self.buffer += self.text_decoder.decode(b'', final=True)
+        records = self.parse(final=True)
+        if self.format == JSON_ARRAY and self.state != 'end':
+            raise ValueError('Incomplete json array in streamed response')
+        return records
+
+    def parse(self, final):
+        if self.format == AUTO:
+            start = self.skip_whitespace(self.buffer, 0)
+            if start == len(self.buffer):
+                return []
+            self.format = JSON_ARRAY if self.buffer[start] == '[' else NDJSON
+        if self.format == NDJSON:
+            return self.parse_ndjson(final)
+        return self.parse_json_array(final)
+
+    @staticmethod
+    def skip_whitespace(buffer, position):
+        length = len(buffer)
+        while position < length and buffer[position] in WHITESPACE:
+            position += 1
+        return position
+
+    def parse_ndjson(self, final):
+        records = []
+        buffer = self.buffer
+        position = 0
+        while True:
+            end = buffer.find('\n', max(position, self.searched_length))
+            if end == -1:
+                if final and buffer[position:].strip():
+                    records.append(json.loads(buffer[position:]))
+                    position = len(buffer)
+                break
+            line = buffer[position:end]
+            position = end + 1
+            if line.strip():
+                records.append(json.loads(line))
+        self.buffer = buffer[position:]
+        self.searched_length = len(self.buffer)
+        return records
+
+    def parse_json_array(self, final):
+        records = []
+        buffer = self.buffer
+        length = len(buffer)
+        position = 0
+        retry_length = 0
+        while True:
+            position = self.skip_whitespace(buffer, position)
+            if position == length:
+                break
+            char = buffer[position]
+            if self.state == 'end':
+                raise ValueError('Unexpected data after json array in streamed response')
+            if self.state == 'start':
+                if char != '[':
+                    raise ValueError('Streamed response is not a json array')
+                self.state = 'first_value'
+                position += 1
+            elif self.state == 'separator' or (self.state == 'first_value' and char == ']'):
+                if char == ']':
+                    self.state = 'end'
+                elif char == ',' and self.state == 'separator':
+                    self.state = 'value'
+                else:
+                    raise ValueError('Invalid json array in streamed response at %r' % char)
+                position += 1
+            else:
+                try:
+                    record, end = self.json_decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    if final:
+                        raise
+                    retry_length = (length - position) * 2
+                    break
+                # A number at the end of the buffer may continue in the next chunk
+                if end == length and not final and char not in '{["':
+                    break
+                records.append(record)
+                self.state = 'separator'
+                position = end
+        self.buffer = buffer[position:]
+        self.retry_length = retry_length
+        return records
+
+
+def iter_records(chunks, format=AUTO):
+    """Yield records decoded from an iterable of bytes chunks"""
+    parser = RecordParser(format)
+    for chunk in chunks:
+        yield from parser.feed(chunk)
+    yield from parser.close()
+
+
+def iter_json_array(chunks):
+    return iter_records(chunks, JSON_ARRAY)
+
+
+def iter_ndjson(chunks):
+    return iter_records(chunks, NDJSON)
+
+
+class RecordStream:
+    """
+    Records of a streamed response, the body is read from the connection while iterating.
+    Records can be read only once, the connection is released when all records are read or the stream is closed
+
+        with api.get_events(stream=True) as records:
+            for record in records:
+                ...
+
+    :param response: Python-Requests response sent with stream=True
+    :param transform: Function called with every record, returning None drops the record
+    """
+
+    def __init__(self, response, format=AUTO, chunk_size=DEFAULT_CHUNK_SIZE, transform=None):
+        self.response = response
+        self.format = format
+        self.chunk_size = chunk_size
+        self.transform = transform
+
+    def __iter__(self):
+        try:
+            for record in iter_records(self.response.iter_content(self.chunk_size), self.format):
+                if self.transform is not None:
+                    record = self.transform(record)
+                    if record is None:
+                        continue
+                yield record
+        finally:
+            self.close()
+
+    @property
+    def status_code(self):
+        return self.response.status_code
+
+    @property
+    def headers(self):
+        return self.response.headers
+
+    def close(self):
+        self.response.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class AsyncRecordStream(RecordStream):
+    """
+    Records of a response streamed by an asyncio client, same as RecordStream with async iteration
+
+        async with await api.get_events(stream=True) as records:
+            async for record in records:
+                ...
+
+    :param transform: Function or coroutine function called with every record
+    """
+
+    def __iter__(self):
+        raise TypeError('Use async for to read records of an asyncio client stream')
+
+    async def __aiter__(self):
+        parser = RecordParser(self.format)
+        try:
+            async for chunk in self.response.raw.content.iter_chunked(self.chunk_size):
+                for record in parser.feed(chunk):
+                    record = await self.transform_record(record)
+                    if record is not None:
+                        yield record
+            for record in parser.close():
+                record = await self.transform_record(record)
+                if record is not None:
+                    yield record
+        finally:
+            self.close()
+
+    async def transform_record(self, record):
+        if self.transform is None:
+            return record
+        return await self.transform(record)
+
+    def close(self):
+        self.response.raw.release()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.close()
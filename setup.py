@@ -32,8 +32,12 @@ setup(name=about['__title__'],
       include_package_data=True,
       install_requires=[
           'requests',
-            'xmltodict',
           'blackboxprotobuf'
       ],
-      scripts=['bin/rapic-client-generator'],
+      extras_require={
+          'async': ['aiohttp'],
+          'openapi': ['PyYAML'],
+          'fast': ['orjson'],
+      },
+      scripts=['bin/rapic-client-generator', 'bin/rapic-run'],
       zip_safe=False)